@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Batch reconciliation of many monthly order exports.
+
+Each export is folded into one record per order (order_folding) and
+aggregated per (month, location) in its own worker process; the partial
+aggregates are then added together into a single report.
+Workers only return the small aggregate frames, so the merge is cheap and
+wall-clock time scales with the number of cores.
+"""
+
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from order_aggregation import aggregate_folded, combine_aggregates, location_metrics, totals
+from order_folding import fold_orders
+from order_reader import is_export, load_orders
+from pipeline_profile import enable_from_argv, stage
+
+
+def find_exports(patterns):
+    """Expand directories and glob patterns into a sorted list of export files
+
+    A directory contributes every CSV and Excel export in it
+    (order_reader.EXPORT_SUFFIXES).
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(path for path in glob.glob(os.path.join(pattern, '*')) if is_export(path))
+        else:
+            paths.update(glob.glob(pattern))
+    return sorted(paths)
+
+
+def assign_months(folded):
+    """Month (YYYY-MM) of each folded order
+
+    An order takes its parent row's Paid Date (refund rows have none);
+    orders with only refund rows fall back to the file's most common month.
+    """
+    months = folded['Paid Date'].dt.strftime('%Y-%m')
+    if months.notna().any():
+        months = months.fillna(months.mode().iloc[0])
+    return months
+
+
+def export_aggregates(path):
+    """Per (Month, Location) aggregates for one export (runs in a worker)"""
+    df = load_orders(path)
+    folded = fold_orders(df)
+    folded['Month'] = assign_months(folded)
+    return path, len(df), aggregate_folded(folded, by=['Month'])
+
+
+def reconcile_exports(paths, workers=None):
+    """Aggregate every export in a process pool and merge the partials"""
+    partials = []
+    rows = 0
+    with stage('worker_pool') as timed, ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, file_rows, aggregates in pool.map(export_aggregates, paths):
+            rows += file_rows
+            partials.append(aggregates)
+        timed.rows = rows
+    with stage('combine_aggregates'):
+        return rows, combine_aggregates(*partials)
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Reconcile many monthly exports in parallel')
+    parser.add_argument('exports', nargs='+', help='export files (CSV or .xlsx), directories or glob patterns')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--output', help='write the per-month, per-location report to this CSV')
+    args = parser.parse_args()
+
+    paths = find_exports(args.exports)
+    if not paths:
+        parser.error('no export files matched')
+
+    start = time.perf_counter()
+    rows, aggregates = reconcile_exports(paths, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    report = location_metrics(aggregates).sort_index()
+    by_location = location_metrics(aggregates.groupby(level='Location').sum())
+
+    print(f"=== BATCH RECONCILIATION: {len(paths)} files, {rows} rows in {elapsed:.2f}s ===")
+    for path in paths:
+        print(f"  {Path(path).name}")
+    print()
+    print("PER MONTH AND LOCATION:")
+    print(report.to_string(float_format='%.2f'))
+    print()
+    print("PER LOCATION (ALL MONTHS):")
+    print(by_location.to_string(float_format='%.2f'))
+    print()
+    overall = totals(by_location)
+    print(f"Processing Sales: ${overall['processing_sales']:.2f}")
+    print(f"Processing Orders: {int(overall['processing_orders'])}")
+    print(f"Refunds: ${overall['refunds']:.2f}")
+    print(f"Refunded Orders: {int(overall['refunded_orders'])}")
+
+    if args.output:
+        report.to_csv(args.output)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
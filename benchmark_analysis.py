@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the order analysis paths.
+
+Generates synthetic exports (see generate_orders.py) at each requested
+size and runs every analysis path against them in a fresh process, so
+peak RSS is measured per path. For each run it records per-stage wall
+time, total throughput (export rows per second) and peak RSS, prints a
+table and optionally writes everything to JSON for comparison between
+commits.
+
+--smoke runs every path once on a small export and exits non-zero if any
+of them fails, as a quick check that the suite still runs.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from generate_orders import generate_export
+from pipeline_profile import peak_rss_mb
+
+DEFAULT_ROWS = [10_000, 100_000]
+SMOKE_ROWS = 2_000
+
+
+class StageTimer:
+    """Collects wall-clock time per named stage"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def __call__(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+
+def bench_cleaned_analysis(path, timer):
+    """analyze_cleaned_csv(): typed load, location canonicalization, folded aggregation"""
+    from cleaned_csv_analysis import clean_locations, cleaned_metrics
+    from order_reader import load_orders
+
+    df = timer('load', load_orders, path)
+    df = timer('canonicalize', clean_locations, df)
+    timer('aggregate', cleaned_metrics, df)
+    return len(df)
+
+
+def bench_comprehensive(path, timer):
+    """comprehensive_analysis.py: cold and warm Arrow cache loads, then aggregation"""
+    from order_aggregation import aggregate_orders
+    from order_cache import cached_load_orders
+
+    cache_dir = tempfile.mkdtemp(prefix='bench_cache_')
+    try:
+        timer('cache_cold', cached_load_orders, path, cache_dir=cache_dir)
+        df = timer('cache_warm', cached_load_orders, path, cache_dir=cache_dir)
+        timer('status_counts', df['Status'].value_counts)
+        timer('aggregate', aggregate_orders, df)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return len(df)
+
+
+def bench_streaming(path, timer):
+    """Chunked single-pass aggregation (order_reader.stream_aggregates)"""
+    from order_reader import stream_aggregates
+
+    result = timer('stream_aggregate', stream_aggregates, path)
+    return result['rows']
+
+
+def bench_anomalies(path, timer):
+    """Streaming anomaly scan (order_anomalies) over the chunked export"""
+    from order_anomalies import scan_export
+
+    rows, _ = timer('scan', scan_export, path)
+    return rows
+
+
+def bench_sketches(path, timer):
+    """Approximate quick look (order_sketches): one pass into fixed-size sketches"""
+    from order_sketches import quick_look
+
+    look = timer('quick_look', quick_look, path)
+    return look.rows
+
+
+def bench_id_diff(path, timer):
+    """csv_analysis.py ID diff: index the export and merge-join it against a platform copy"""
+    from order_diff import build_index, csv_index, diff_orders
+    from order_folding import FOLD_COLUMNS
+    from order_reader import load_orders
+
+    df = timer('load', load_orders, path, FOLD_COLUMNS)
+    idx = timer('csv_index', csv_index, df)
+
+    # Platform side: the same orders with ~1% missing and ~1% different amounts
+    rng = np.random.default_rng(0)
+    keep = rng.random(len(idx['order_id'])) > 0.01
+    cents = idx['cents'][keep] + np.where(rng.random(int(keep.sum())) < 0.01, 1, 0)
+    platform = timer('platform_index', build_index, idx['order_id'][keep], idx['location'][keep], cents / 100)
+    timer('diff', diff_orders, idx, platform)
+    return len(df)
+
+
+def bench_fees(path, timer):
+    """Exact getDashboardSummary() fees per location (money.dashboard_summary)"""
+    from money import dashboard_summary, to_cents
+    from order_reader import load_orders
+
+    df = timer('load', load_orders, path, ['Status', 'Location', 'Total Amount'])
+    orders = df[df['Total Amount'] >= 0]
+    cents = timer('to_cents', to_cents, orders['Total Amount'])
+    timer('summary', dashboard_summary, cents, orders['Status'], orders['Location'].astype(object))
+    return len(df)
+
+
+def bench_fee_simulation(path, timer):
+    """Net deposit per location under 100 fee schedules (fee_simulator)"""
+    from fee_simulator import FeeSimulation, fee_grid, location_aggregates
+    from money import to_cents
+    from order_reader import load_orders
+
+    df = timer('load', load_orders, path, ['Status', 'Location', 'Total Amount'])
+    orders = df[df['Total Amount'] >= 0]
+    schedules = fee_grid(np.arange(0.05, 0.10, 0.005), [0.027, 0.029, 0.031, 0.033, 0.035], [0.25, 0.30])
+    aggregates = timer('aggregate', location_aggregates, to_cents(orders['Total Amount']), orders['Status'],
+                       orders['Location'])
+    timer('simulate', FeeSimulation, aggregates, schedules)
+    return len(df)
+
+
+def bench_payments(path, timer):
+    """Payment column: distinct-string parsing and the location x brand x wallet breakdown"""
+    from order_reader import load_orders
+    from payment_methods import parse_payments, payment_breakdown
+
+    df = timer('load', load_orders, path, ['Status', 'Location', 'Payment', 'Total Amount'])
+    timer('parse', parse_payments, df['Payment'])
+    timer('breakdown', payment_breakdown, df)
+    return len(df)
+
+
+def bench_notes(path, timer):
+    """Order Notes parsing: serial, then chunks on a process pool"""
+    from order_notes import parse_export_notes
+
+    fields, _ = timer('parse_serial', parse_export_notes, path, workers=1)
+    timer('parse_parallel', parse_export_notes, path, workers=os.cpu_count())
+    return len(fields)
+
+
+def bench_heatmap(path, timer):
+    """Paid Date parsing (pd.to_datetime vs. the bulk parser) and the store-local heatmap"""
+    import pandas as pd
+
+    from money import to_cents
+    from order_heatmap import SalesHeatmap
+    from order_reader import PAID_DATE_FORMAT, load_orders, parse_paid_date_values
+
+    columns = ['Paid Date', 'Location', 'Total Amount']
+    paid = timer('read', pd.read_csv, path, usecols=columns)['Paid Date']
+    timer('parse_to_datetime', pd.to_datetime, paid, format=PAID_DATE_FORMAT, errors='coerce')
+    timer('parse_bulk', parse_paid_date_values, paid)
+    df = timer('load', load_orders, path, columns)
+    orders = df[df['Total Amount'] >= 0]
+    timer('heatmap', SalesHeatmap.from_orders, orders['Paid Date'], orders['Location'],
+          to_cents(orders['Total Amount']))
+    return len(df)
+
+
+def xlsx_path(path):
+    """The .xlsx copy of a generated export (written by run_suite)"""
+    return os.path.splitext(path)[0] + '.xlsx'
+
+
+def bench_xlsx(path, timer):
+    """stream_aggregates() over the .xlsx copy of the export (compare with 'streaming')"""
+    from order_reader import stream_aggregates
+
+    result = timer('stream_xlsx', stream_aggregates, xlsx_path(path))
+    return result['rows']
+
+
+BENCHMARKS = {
+    'cleaned_analysis': bench_cleaned_analysis,
+    'comprehensive': bench_comprehensive,
+    'streaming': bench_streaming,
+    'anomalies': bench_anomalies,
+    'sketches': bench_sketches,
+    'id_diff': bench_id_diff,
+    'fees': bench_fees,
+    'fee_simulation': bench_fee_simulation,
+    'payments': bench_payments,
+    'notes': bench_notes,
+    'heatmap': bench_heatmap,
+    'xlsx': bench_xlsx,
+}
+
+
+def _run_benchmark(name, path):
+    timer = StageTimer()
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    rows = BENCHMARKS[name](path, timer)
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'startup_rss_mb': baseline_rss,
+        'stages': timer.stages,
+    }
+
+
+def run_benchmark(name, path):
+    """Run one benchmark in a fresh process so its peak RSS is its own"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_run_benchmark, (name, path))
+
+
+def run_suite(sizes, names, workdir, seed=0, keep_going=False):
+    """Generate an export per size and run every benchmark on it
+
+    With keep_going a failing benchmark is reported (its result has an
+    'error') and the others still run.
+    """
+    results = []
+    for rows in sizes:
+        path = os.path.join(workdir, f"orders_{rows}.csv")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            generate_export(path, rows, seed=seed)
+            print(f"Generated {rows:,} orders in {time.perf_counter() - start:.1f}s ({path})")
+        if 'xlsx' in names and not os.path.exists(xlsx_path(path)):
+            import pandas as pd
+
+            from order_reader import PAID_DATE_FORMAT
+            from order_xlsx import write_xlsx
+
+            start = time.perf_counter()
+            export = pd.read_csv(path)
+            export['Paid Date'] = pd.to_datetime(export['Paid Date'], format=PAID_DATE_FORMAT, errors='coerce')
+            write_xlsx(export, xlsx_path(path))
+            print(f"Wrote the .xlsx copy in {time.perf_counter() - start:.1f}s ({xlsx_path(path)})")
+        for name in names:
+            try:
+                result = run_benchmark(name, path)
+            except Exception as error:
+                if not keep_going:
+                    raise
+                results.append({'benchmark': name, 'orders': rows, 'error': f"{type(error).__name__}: {error}"})
+                print(f"  {name:18s} {rows:>10,} orders | FAILED: {results[-1]['error']}")
+                continue
+            result.update({'benchmark': name, 'orders': rows, 'file_mb': os.path.getsize(path) / 1e6})
+            results.append(result)
+            print(f"  {name:18s} {rows:>10,} orders | {result['seconds']:8.3f}s | "
+                  f"{result['rows_per_second']:>12,.0f} rows/s | peak RSS {result['peak_rss_mb']:8.1f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the order analysis paths on synthetic exports')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='export sizes in orders')
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--workdir', help='where to keep generated exports (default: a temporary directory)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--smoke', action='store_true',
+                        help=f'run each benchmark once on {SMOKE_ROWS:,} orders; exit 1 if any fails')
+    args = parser.parse_args()
+    if args.smoke:
+        args.rows = [SMOKE_ROWS]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_orders_')
+    os.makedirs(workdir, exist_ok=True)
+    print("=== ANALYSIS BENCHMARKS ===")
+    try:
+        results = run_suite(args.rows, args.benchmarks, workdir, seed=args.seed, keep_going=args.smoke)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = [result for result in results if 'error' in result]
+    if args.smoke:
+        print(f"\nSmoke run: {len(results) - len(failed)} of {len(results)} benchmarks ran")
+        sys.exit(1 if failed else 0)
+
+    print("\nPer-stage timings (seconds):")
+    for result in results:
+        stages = ', '.join(f"{stage}={seconds:.3f}" for stage, seconds in result['stages'].items())
+        print(f"  {result['benchmark']:18s} {result['orders']:>10,} | {stages}")
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({'python': sys.version.split()[0], 'results': results}, handle, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,59 @@
 #!/usr/bin/env python3
+"""
+Location-by-location diff of the cleaned CSV export against the
+platform's figures (`reconcile.py locations`).
+"""
+
+import argparse
 
 import pandas as pd
 import numpy as np
-from collections import defaultdict
 
-def analyze_cleaned_csv():
+from location_normalization import canonicalize_locations
+from order_aggregation import aggregate_folded, location_metrics, totals
+from order_folding import fold_orders
+from order_reader import load_orders
+from pipeline_profile import enable_from_argv, stage
+
+CLEANED_EXPORT = 'attached_assets/cleaned-Mayorders-2025-06-03-17-44-11.csv'
+
+# Platform locations; CSV names are canonicalized onto these
+PLATFORM_LOCATIONS = [
+    '7 Court St, Binghamton, NY',
+    '7434 Ogontz Ave, Philadelphia, PA',
+    '314 S High St, West Chester, PA',
+    '2210 Cottman Ave, Philadelphia, PA',
+    '6151 Ridge Ave, Philadelphia, PA',
+    '4501 N Broad St, Philadelphia, PA',
+    '1947 Street Rd, Bensalem, PA',
+    'Drexel University 3301 Market St, Philadelphia',
+    '2100 Mt Ephraim Ave, Oaklyn, NJ'
+]
+
+
+def clean_locations(df):
+    """Rows at a platform location, with the Location canonicalized onto PLATFORM_LOCATIONS"""
+    # Remove rows with no location (empty rows)
+    df = df.dropna(subset=['Location'])
+    df = df.assign(Location=canonicalize_locations(df['Location'], known_locations=PLATFORM_LOCATIONS))
+    return df.dropna(subset=['Location'])
+
+
+def cleaned_metrics(df):
+    """Location metrics of cleaned rows, one record per order (refund rows folded in)"""
+    return location_metrics(aggregate_folded(fold_orders(df), locations=PLATFORM_LOCATIONS))
+
+
+def analyze_cleaned_csv(path=CLEANED_EXPORT):
     """Analyze the cleaned CSV with proper WooCommerce refund filtering"""
     
-    # Read the cleaned CSV data
-    df = pd.read_csv('attached_assets/cleaned-Mayorders-2025-06-03-17-44-11.csv')
+    # Read only the columns we need, typed at parse time
+    df = load_orders(path)
     
     print("=== CLEANED CSV ANALYSIS (Refunded Status + Total(-Refund) ≠ 0) ===\n")
     
-    # Clean and prepare data
-    df['Total Amount'] = pd.to_numeric(df['Total Amount'], errors='coerce')
-    df['Total (- Refund)'] = pd.to_numeric(df['Total (- Refund)'], errors='coerce')
-    df['Refund Amount'] = pd.to_numeric(df['Refund Amount'], errors='coerce')
-    
-    # Remove rows with no location (empty rows)
-    df = df.dropna(subset=['Location'])
-    
-    # Location mapping to match platform
-    location_mapping = {
-        '7 Court St, Binghamton, NY': '7 Court St, Binghamton, NY',
-        '7434 Ogontz Ave, Philadelphia, PA': '7434 Ogontz Ave, Philadelphia, PA', 
-        '314 S High St, West Chester, PA': '314 S High St, West Chester, PA',
-        '2210 Cottman Ave, Philadelphia, PA': '2210 Cottman Ave, Philadelphia, PA',
-        '6151 Ridge Ave, Philadelphia, PA': '6151 Ridge Ave, Philadelphia, PA',
-        '4501 N Broad St, Philadelphia, PA': '4501 N Broad St, Philadelphia, PA',
-        '1947 Street Rd, Bensalem, PA': '1947 Street Rd, Bensalem, PA',
-        'Drexel University 3301 Market St, Philadelphia': 'Drexel University 3301 Market St, Philadelphia',
-        '2100 Mt Ephraim Ave, Oaklyn, NJ': '2100 Mt Ephraim Ave, Oaklyn, NJ'
-    }
-    
-    # Filter to known locations only
-    df = df[df['Location'].isin(location_mapping.keys())]
-    df['Location'] = df['Location'].map(location_mapping)
+    # Keep the platform's locations only, with canonical names
+    df = clean_locations(df)
     
     # Separate processing and refunded orders
     processing_orders = df[df['Status'] == 'Processing'].copy()
@@ -86,31 +104,11 @@ def analyze_cleaned_csv():
         }
     }
     
-    # Analyze by location
-    results = defaultdict(dict)
-    
-    for location in location_mapping.values():
-        location_processing = processing_orders[processing_orders['Location'] == location]
-        location_refunded = refunded_orders[refunded_orders['Location'] == location]
-        
-        # Processing orders analysis
-        processing_sales = location_processing['Total Amount'].sum()
-        processing_count = len(location_processing)
-        
-        # Refunded orders analysis - use absolute value of Total (- Refund) for refund amount
-        refund_amount = abs(location_refunded['Total (- Refund)'].sum())
-        refunded_count = len(location_refunded)
-        
-        results[location] = {
-            'csv_processing_sales': processing_sales,
-            'csv_processing_orders': processing_count,
-            'csv_refunds': refund_amount,
-            'csv_refunded_orders': refunded_count,
-            'platform_processing_sales': platform_data[location]['processing_sales'],
-            'platform_processing_orders': platform_data[location]['processing_orders'],
-            'platform_refunds': platform_data[location]['refunds'],
-            'platform_refunded_orders': platform_data[location]['refunded_orders']
-        }
+    # One record per order, then all locations in a single groupby pass
+    with stage('aggregate'):
+        csv_metrics = cleaned_metrics(df)
+    platform_metrics = pd.DataFrame.from_dict(platform_data, orient='index').reindex(csv_metrics.index)
+    results = pd.concat([csv_metrics.add_prefix('csv_'), platform_metrics.add_prefix('platform_')], axis=1)
     
     # Print detailed comparison
     print("LOCATION-BY-LOCATION COMPARISON:")
@@ -118,53 +116,55 @@ def analyze_cleaned_csv():
     
     total_discrepancies = 0
     
-    for location, data in results.items():
-        print(f"\n📍 {location}")
-        print("-" * 60)
+    with stage('print'):
+        for location, data in results.to_dict('index').items():
+            print(f"\n📍 {location}")
+            print("-" * 60)
         
-        # Processing Sales
-        sales_diff = abs(data['csv_processing_sales'] - data['platform_processing_sales'])
-        sales_match = sales_diff < 0.01
-        print(f"Processing Sales:")
-        print(f"  CSV: ${data['csv_processing_sales']:.2f}")
-        print(f"  Platform: ${data['platform_processing_sales']:.2f}")
-        print(f"  Match: {'✅' if sales_match else '❌'} (diff: ${sales_diff:.2f})")
+            # Processing Sales
+            sales_diff = abs(data['csv_processing_sales'] - data['platform_processing_sales'])
+            sales_match = sales_diff < 0.01
+            print(f"Processing Sales:")
+            print(f"  CSV: ${data['csv_processing_sales']:.2f}")
+            print(f"  Platform: ${data['platform_processing_sales']:.2f}")
+            print(f"  Match: {'✅' if sales_match else '❌'} (diff: ${sales_diff:.2f})")
         
-        # Processing Orders
-        orders_match = data['csv_processing_orders'] == data['platform_processing_orders']
-        print(f"Processing Orders:")
-        print(f"  CSV: {data['csv_processing_orders']}")
-        print(f"  Platform: {data['platform_processing_orders']}")
-        print(f"  Match: {'✅' if orders_match else '❌'}")
+            # Processing Orders
+            orders_match = data['csv_processing_orders'] == data['platform_processing_orders']
+            print(f"Processing Orders:")
+            print(f"  CSV: {data['csv_processing_orders']}")
+            print(f"  Platform: {data['platform_processing_orders']}")
+            print(f"  Match: {'✅' if orders_match else '❌'}")
         
-        # Refunds
-        refund_diff = abs(data['csv_refunds'] - data['platform_refunds'])
-        refund_match = refund_diff < 0.01
-        print(f"Refunds:")
-        print(f"  CSV: ${data['csv_refunds']:.2f}")
-        print(f"  Platform: ${data['platform_refunds']:.2f}")
-        print(f"  Match: {'✅' if refund_match else '❌'} (diff: ${refund_diff:.2f})")
+            # Refunds
+            refund_diff = abs(data['csv_refunds'] - data['platform_refunds'])
+            refund_match = refund_diff < 0.01
+            print(f"Refunds:")
+            print(f"  CSV: ${data['csv_refunds']:.2f}")
+            print(f"  Platform: ${data['platform_refunds']:.2f}")
+            print(f"  Match: {'✅' if refund_match else '❌'} (diff: ${refund_diff:.2f})")
         
-        # Refunded Orders
-        refunded_orders_match = data['csv_refunded_orders'] == data['platform_refunded_orders']
-        print(f"Refunded Orders:")
-        print(f"  CSV: {data['csv_refunded_orders']}")
-        print(f"  Platform: {data['platform_refunded_orders']}")
-        print(f"  Match: {'✅' if refunded_orders_match else '❌'}")
+            # Refunded Orders
+            refunded_orders_match = data['csv_refunded_orders'] == data['platform_refunded_orders']
+            print(f"Refunded Orders:")
+            print(f"  CSV: {data['csv_refunded_orders']}")
+            print(f"  Platform: {data['platform_refunded_orders']}")
+            print(f"  Match: {'✅' if refunded_orders_match else '❌'}")
         
-        if not (sales_match and orders_match and refund_match and refunded_orders_match):
-            total_discrepancies += 1
+            if not (sales_match and orders_match and refund_match and refunded_orders_match):
+                total_discrepancies += 1
     
     # Calculate totals
-    csv_total_processing_sales = sum(data['csv_processing_sales'] for data in results.values())
-    csv_total_processing_orders = sum(data['csv_processing_orders'] for data in results.values())
-    csv_total_refunds = sum(data['csv_refunds'] for data in results.values())
-    csv_total_refunded_orders = sum(data['csv_refunded_orders'] for data in results.values())
+    result_totals = totals(results)
+    csv_total_processing_sales = result_totals['csv_processing_sales']
+    csv_total_processing_orders = int(result_totals['csv_processing_orders'])
+    csv_total_refunds = result_totals['csv_refunds']
+    csv_total_refunded_orders = int(result_totals['csv_refunded_orders'])
     
-    platform_total_processing_sales = sum(data['platform_processing_sales'] for data in results.values())
-    platform_total_processing_orders = sum(data['platform_processing_orders'] for data in results.values())
-    platform_total_refunds = sum(data['platform_refunds'] for data in results.values())
-    platform_total_refunded_orders = sum(data['platform_refunded_orders'] for data in results.values())
+    platform_total_processing_sales = result_totals['platform_processing_sales']
+    platform_total_processing_orders = int(result_totals['platform_processing_orders'])
+    platform_total_refunds = result_totals['platform_refunds']
+    platform_total_refunded_orders = int(result_totals['platform_refunded_orders'])
     
     # Summary
     print(f"\n{'='*80}")
@@ -208,5 +208,12 @@ def analyze_cleaned_csv():
     else:
         print("No refunded orders found in filtered data.")
 
+def main(argv=None):
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Diff the cleaned CSV export against platform figures per location')
+    parser.add_argument('path', nargs='?', default=CLEANED_EXPORT, help='cleaned WooCommerce export (CSV or .xlsx)')
+    args = parser.parse_args(argv)
+    analyze_cleaned_csv(args.path)
+
 if __name__ == "__main__":
-    analyze_cleaned_csv()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,83 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-location order counts, sales and refunds of a CSV export, as printed
+before comparing with the platform (`reconcile.py summary`).
+"""
+
+import argparse
+
 import pandas as pd
 import numpy as np
 
-# Read the CSV file
-df = pd.read_csv('attached_assets/Mayorders-2025-06-03-17-44-11.csv')
+from order_cache import cached_load_orders
+from order_reader import DEFAULT_EXPORT
+from pipeline_profile import enable_from_argv, stage
+
+def analyze_locations(path=DEFAULT_EXPORT):
+    """Print per-location metrics and the CSV totals of an export"""
+    # Load the typed order table (from the columnar cache when current)
+    with stage('load'):
+        df = cached_load_orders(path)
 
-print("=== COMPREHENSIVE CSV vs PLATFORM ANALYSIS ===")
+    print("=== COMPREHENSIVE CSV vs PLATFORM ANALYSIS ===")
 
-# Clean the data
-df_clean = df.copy()
-df_clean['Total Amount'] = pd.to_numeric(df_clean['Total Amount'], errors='coerce')
-df_clean['Refund Amount'] = pd.to_numeric(df_clean['Refund Amount'], errors='coerce').fillna(0)
+    # Clean the data
+    df_clean = df.copy()
+    df_clean['Refund Amount'] = df_clean['Refund Amount'].fillna(0)
 
-# Get unique locations
-unique_locations = df_clean['Location'].unique()
-print(f"Locations found in CSV: {len(unique_locations)}")
-for i, location in enumerate(unique_locations, 1):
-    print(f"  {i}. {location}")
+    # Get unique locations
+    unique_locations = df_clean['Location'].unique()
+    print(f"Locations found in CSV: {len(unique_locations)}")
+    for i, location in enumerate(unique_locations, 1):
+        print(f"  {i}. {location}")
 
-print("\n" + "="*80)
+    print("\n" + "="*80)
 
-# Analyze each location
-total_csv_sales = 0
-total_csv_orders = 0
-total_csv_refunds = 0
+    # Analyze each location
+    total_csv_sales = 0
+    total_csv_orders = 0
+    total_csv_refunds = 0
 
-for location in unique_locations:
-    # Handle NaN values
-    if pd.isna(location):
-        location_name = "UNKNOWN LOCATION"
-        print(f"\n=== {location_name} ANALYSIS ===")
-        location_orders = df_clean[df_clean['Location'].isna()]
-    else:
-        location_name = location.upper()
-        print(f"\n=== {location_name} ANALYSIS ===")
-        location_orders = df_clean[df_clean['Location'] == location]
+    for location in unique_locations:
+        # Handle NaN values
+        with stage('location_filter') as timed:
+            if pd.isna(location):
+                location_name = "UNKNOWN LOCATION"
+                location_orders = df_clean[df_clean['Location'].isna()]
+            else:
+                location_name = location.upper()
+                location_orders = df_clean[df_clean['Location'] == location]
+            timed.rows = len(location_orders)
     
-    # Calculate metrics
-    total_orders = len(location_orders)
-    processing_orders = len(location_orders[location_orders['Status'] == 'Processing'])
-    refunded_orders = len(location_orders[location_orders['Status'] == 'Refunded'])
+            # Calculate metrics
+            total_orders = len(location_orders)
+            processing_orders = len(location_orders[location_orders['Status'] == 'Processing'])
+            refunded_orders = len(location_orders[location_orders['Status'] == 'Refunded'])
     
-    # Calculate sales (processing only - excluding refunded from sales)
-    processing_sales = location_orders[location_orders['Status'] == 'Processing']['Total Amount'].sum()
-    refund_amount = location_orders[location_orders['Status'] == 'Refunded']['Total Amount'].sum()
+            # Calculate sales (processing only - excluding refunded from sales)
+            processing_sales = location_orders[location_orders['Status'] == 'Processing']['Total Amount'].sum()
+            refund_amount = location_orders[location_orders['Status'] == 'Refunded']['Total Amount'].sum()
     
-    # Status breakdown
-    status_breakdown = location_orders['Status'].value_counts()
+            # Status breakdown
+            status_breakdown = location_orders['Status'].value_counts()
+            status_breakdown = status_breakdown[status_breakdown > 0]
     
-    print(f"Total Orders: {total_orders}")
-    print(f"Processing Orders: {processing_orders}")
-    print(f"Refunded Orders: {refunded_orders}")
-    print(f"Processing Sales: ${processing_sales:.2f}")
-    print(f"Refund Amount: ${refund_amount:.2f}")
+        with stage('print'):
+            print(f"\n=== {location_name} ANALYSIS ===")
+            print(f"Total Orders: {total_orders}")
+            print(f"Processing Orders: {processing_orders}")
+            print(f"Refunded Orders: {refunded_orders}")
+            print(f"Processing Sales: ${processing_sales:.2f}")
+            print(f"Refund Amount: ${refund_amount:.2f}")
     
-    print(f"Status Breakdown:")
-    for status, count in status_breakdown.items():
-        print(f"  {status}: {count}")
+            print(f"Status Breakdown:")
+            for status, count in status_breakdown.items():
+                print(f"  {status}: {count}")
     
-    # Add to totals
-    total_csv_sales += processing_sales
-    total_csv_orders += total_orders
-    total_csv_refunds += refund_amount
+        # Add to totals
+        total_csv_sales += processing_sales
+        total_csv_orders += total_orders
+        total_csv_refunds += refund_amount
     
-    # Show order ID range for verification
-    order_ids = location_orders['Order ID'].astype(str)
-    if len(order_ids) > 0:
-        print(f"Order ID Range: {order_ids.min()} to {order_ids.max()}")
-        print(f"Sample Order IDs: {list(order_ids.head(3))}")
+        # Show order ID range for verification
+        order_ids = location_orders['Order ID'].astype(str)
+        if len(order_ids) > 0:
+            with stage('print'):
+                print(f"Order ID Range: {order_ids.min()} to {order_ids.max()}")
+                print(f"Sample Order IDs: {list(order_ids.head(3))}")
+
+    print(f"\n" + "="*80)
+    print(f"=== TOTAL CSV SUMMARY ===")
+    print(f"Total Sales (Processing only): ${total_csv_sales:.2f}")
+    print(f"Total Orders (All statuses): {total_csv_orders}")
+    print(f"Total Refunds: ${total_csv_refunds:.2f}")
+
+    print(f"\n" + "="*80)
+    print(f"=== PLATFORM COMPARISON NEEDED ===")
+    print("Now we need to compare these CSV totals with platform data:")
+    print("1. Query platform for all locations in May 2025")
+    print("2. Filter by processing + refunded status")
+    print("3. Compare location by location")
+    print("4. Identify any discrepancies")
+
 
-print(f"\n" + "="*80)
-print(f"=== TOTAL CSV SUMMARY ===")
-print(f"Total Sales (Processing only): ${total_csv_sales:.2f}")
-print(f"Total Orders (All statuses): {total_csv_orders}")
-print(f"Total Refunds: ${total_csv_refunds:.2f}")
+def main(argv=None):
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Per-location analysis of a WooCommerce CSV export')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV or .xlsx)')
+    args = parser.parse_args(argv)
+    analyze_locations(args.path)
 
-print(f"\n" + "="*80)
-print(f"=== PLATFORM COMPARISON NEEDED ===")
-print("Now we need to compare these CSV totals with platform data:")
-print("1. Query platform for all locations in May 2025")
-print("2. Filter by processing + refunded status")
-print("3. Compare location by location")
-print("4. Identify any discrepancies")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,25 @@
+#!/usr/bin/env python3
+"""
+Cottman order analysis and order-ID diff between the CSV export and the
+platform (`reconcile.py ids`). With a platform woo_orders source (CSV
+dump or database) every location is diffed; otherwise the Cottman IDs
+copied from the platform below are used.
+"""
+
+import argparse
+
+import numpy as np
 import pandas as pd
 import re
 
-# Read the CSV file
-df = pd.read_csv('attached_assets/Mayorders-2025-06-03-17-44-11.csv')
-
-# Clean the data
-df['Total Amount'] = pd.to_numeric(df['Total Amount'], errors='coerce')
-df['Refund Amount'] = pd.to_numeric(df['Refund Amount'], errors='coerce').fillna(0)
-df['Total (- Refund)'] = pd.to_numeric(df['Total (- Refund)'], errors='coerce')
-
-# Filter for Cottman location orders
-cottman_orders = df[df['Location'].str.contains('2210 Cottman Ave, Philadelphia, PA', na=False)]
-
-# Remove duplicate refund entries (negative amounts)
-cottman_orders_clean = cottman_orders[cottman_orders['Total Amount'] >= 0]
-
-# Calculate metrics
-total_orders = len(cottman_orders_clean)
-total_sales = cottman_orders_clean['Total (- Refund)'].sum()
-refunded_orders = cottman_orders_clean[cottman_orders_clean['Status'] == 'Refunded']
-refund_count = len(refunded_orders)
-refund_amount = refunded_orders['Refund Amount'].sum()
-
-# Processing orders (successful)
-processing_orders = cottman_orders_clean[cottman_orders_clean['Status'] == 'Processing']
-processing_count = len(processing_orders)
-processing_sales = processing_orders['Total (- Refund)'].sum()
-
-print("=== COTTMAN CSV ANALYSIS ===")
-print(f"Total Orders: {total_orders}")
-print(f"Processing Orders: {processing_count}")
-print(f"Refunded Orders: {refund_count}")
-print(f"Total Sales (after refunds): ${total_sales:.2f}")
-print(f"Processing Sales: ${processing_sales:.2f}")
-print(f"Total Refund Amount: ${refund_amount:.2f}")
-
-# Show status breakdown
-status_breakdown = cottman_orders_clean['Status'].value_counts()
-print(f"\nStatus Breakdown:")
-for status, count in status_breakdown.items():
-    print(f"  {status}: {count}")
-
-# Show sample of the data
-# Extract all order IDs from CSV
-csv_order_ids = set(cottman_orders_clean['Order ID'].astype(str))
-
-print(f"\nFirst 5 Cottman orders:")
-print(cottman_orders_clean[['Order ID', 'Status', 'Total Amount', 'Refund Amount', 'Total (- Refund)']].head())
-
-print(f"\nCSV Order IDs count: {len(csv_order_ids)}")
-print(f"Sample CSV Order IDs: {list(csv_order_ids)[:10]}")
-
-# Platform has these order IDs (from SQL query)
-platform_order_ids = {
+from order_cache import cached_load_orders
+from order_diff import build_index, csv_index, diff_orders, load_platform_orders, platform_index, summarize_diff
+from order_folding import fold_orders
+from order_reader import DEFAULT_EXPORT
+from pipeline_profile import enable_from_argv, stage
+
+# Platform has these Cottman order IDs (from SQL query)
+COTTMAN_PLATFORM_ORDER_IDS = {
     '26004', '26014', '26035', '26044', '26071', '26077', '26083', '26086', '26094', '26107',
     '26114', '26157', '26160', '26173', '26174', '26180', '26183', '26185', '26187', '26193',
     '26199', '26219', '26237', '26240', '26247', '26253', '26259', '26260', '26276', '26286',
@@ -82,16 +49,97 @@ platform_order_ids = {
     '28406', '28438', '28454', '28468', '28492'
 }
 
-print(f"\nPlatform Order IDs count: {len(platform_order_ids)}")
-
-# Find missing orders
-missing_in_csv = platform_order_ids - csv_order_ids
-extra_in_csv = csv_order_ids - platform_order_ids
-
-print(f"\nOrders in platform but NOT in CSV: {len(missing_in_csv)}")
-if missing_in_csv:
-    print(f"Missing Order IDs: {sorted(missing_in_csv)}")
 
-print(f"\nOrders in CSV but NOT in platform: {len(extra_in_csv)}")
-if extra_in_csv:
-    print(f"Extra Order IDs: {sorted(extra_in_csv)}")
\ No newline at end of file
+def analyze_cottman(path=DEFAULT_EXPORT, platform_source=None, locations_dump=None):
+    """Print the Cottman metrics and the order-ID diff against the platform"""
+    # Load the typed order table (from the columnar cache when current)
+    with stage('load'):
+        df = cached_load_orders(path)
+
+    # One record per order: refund rows are folded into their order
+    orders = fold_orders(df)
+
+    # Filter for Cottman location orders
+    cottman_orders_clean = orders[orders['Location'].str.contains('2210 Cottman Ave, Philadelphia, PA', na=False)]
+
+    # Calculate metrics
+    total_orders = len(cottman_orders_clean)
+    total_sales = cottman_orders_clean['net_cents'].sum() / 100
+    refunded_orders = cottman_orders_clean[cottman_orders_clean['Status'] == 'Refunded']
+    refund_count = len(refunded_orders)
+    refund_amount = refunded_orders['refund_cents'].sum() / 100
+
+    # Processing orders (successful)
+    processing_orders = cottman_orders_clean[cottman_orders_clean['Status'] == 'Processing']
+    processing_count = len(processing_orders)
+    processing_sales = processing_orders['net_cents'].sum() / 100
+
+    print("=== COTTMAN CSV ANALYSIS ===")
+    print(f"Total Orders: {total_orders}")
+    print(f"Processing Orders: {processing_count}")
+    print(f"Refunded Orders: {refund_count}")
+    print(f"Total Sales (after refunds): ${total_sales:.2f}")
+    print(f"Processing Sales: ${processing_sales:.2f}")
+    print(f"Total Refund Amount: ${refund_amount:.2f}")
+
+    # Show status breakdown
+    status_breakdown = cottman_orders_clean['Status'].value_counts()
+    status_breakdown = status_breakdown[status_breakdown > 0]
+    print(f"\nStatus Breakdown:")
+    for status, count in status_breakdown.items():
+        print(f"  {status}: {count}")
+
+    # Show sample of the data
+    print(f"\nFirst 5 Cottman orders:")
+    print(cottman_orders_clean[['Status', 'gross_cents', 'refund_cents', 'net_cents']].head())
+
+    # Sorted integer order-ID index of the Cottman CSV orders
+    csv_idx = build_index(cottman_orders_clean.index, cottman_orders_clean['Location'],
+                          cottman_orders_clean['gross_cents'] / 100)
+
+    print(f"\nCSV Order IDs count: {len(csv_idx['order_id'])}")
+    print(f"Sample CSV Order IDs: {csv_idx['order_id'][:10].tolist()}")
+
+    if platform_source:
+        # Platform woo_orders rows from a dump or database: diff every location
+        csv_idx = csv_index(df)
+        platform_idx = platform_index(load_platform_orders(platform_source, locations_dump))
+    else:
+        # Platform has these order IDs (from SQL query)
+        platform_order_ids = COTTMAN_PLATFORM_ORDER_IDS
+        platform_idx = build_index(list(platform_order_ids), ['2210 Cottman Ave, Philadelphia, PA'] * len(platform_order_ids),
+                                   [np.nan] * len(platform_order_ids))
+
+    print(f"\nPlatform Order IDs count: {len(platform_idx['order_id'])}")
+
+    # Find missing orders with a single merge-join over the sorted indexes
+    with stage('id_diff', rows=len(csv_idx['order_id'])):
+        diff = diff_orders(csv_idx, platform_idx)
+    missing_in_csv = diff['missing']['order_id'].tolist()
+    extra_in_csv = diff['extra']['order_id'].tolist()
+
+    print(f"\nOrders in platform but NOT in CSV: {len(missing_in_csv)}")
+    if missing_in_csv:
+        print(f"Missing Order IDs: {missing_in_csv}")
+
+    print(f"\nOrders in CSV but NOT in platform: {len(extra_in_csv)}")
+    if extra_in_csv:
+        print(f"Extra Order IDs: {extra_in_csv}")
+
+    if platform_source:
+        print(f"\nOrders with different amounts: {len(diff['amount_mismatch'])}")
+        print(f"\nDifferences by location:")
+        print(summarize_diff(diff).to_string())
+
+
+def main(argv=None):
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Cottman analysis and CSV vs platform order-ID diff')
+    parser.add_argument('platform', nargs='?', help='platform woo_orders source (CSV dump or database)')
+    parser.add_argument('--export', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV or .xlsx)')
+    parser.add_argument('--locations', help='locations CSV (id, name) for a woo_orders dump with only location_id')
+    args = parser.parse_args(argv)
+    analyze_cottman(args.export, args.platform, args.locations)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ import pandas as pd
 import requests
 import json
 
+from location_normalization import LocationIndex
+from platform_client import client_from_env
+
 def analyze_drexel_may_data():
     """Analyze Drexel May 2025 data from the image"""
     
@@ -39,10 +42,12 @@ def analyze_drexel_may_data():
     
     # Get platform data (we'll need to query the API)
     try:
-        # Get dashboard summary for May 2025
-        response = requests.get("http://localhost:5000/api/dashboard/summary?month=2025-05")
-        if response.status_code == 200:
-            platform_data = response.json()
+        # Get dashboard summary for the Drexel location in May 2025
+        client = client_from_env()
+        locations = {location['name']: location['id'] for location in client.locations()}
+        drexel_location = LocationIndex(locations).match("Drexel University 3301 Market St, Philadelphia")
+        if drexel_location:
+            platform_data = client.summary(location_id=locations[drexel_location], month="2025-05")
             print("PLATFORM DATA (May 2025):")
             print(f"Total Sales: ${platform_data.get('totalSales', 0):.2f}")
             print(f"Total Orders: {platform_data.get('totalOrders', 0)}")
@@ -76,8 +81,10 @@ def analyze_drexel_may_data():
                 if refunds_diff >= 0.01:
                     print(f"- Refund mismatch: ${refunds_diff:.2f}")
         else:
-            print(f"Failed to get platform data: {response.status_code}")
+            print("Drexel location not found on the platform")
             
+    except requests.exceptions.HTTPError as error:
+        print(f"Failed to get platform data: {error.response.status_code}")
     except requests.exceptions.ConnectionError:
         print("Cannot connect to platform API - using manual comparison")
         print()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+What-if net deposits per location under candidate fee schedules.
+
+A schedule is a platform fee rate, a Stripe rate plus fixed fee per
+order, and the two choices on which the platform's own queries disagree:
+
+    stripe_all_orders  Stripe fees on every order (getDashboardSummary)
+                       or on sales only (/api/dashboard/export)
+    deduct_refunds     refunded amounts come off net deposit and the
+                       platform fee (getDashboardSummary) or are only
+                       reported (/api/dashboard/export); `refunds` is the
+                       refunded amount under either rule
+
+Every fee is linear in the order amounts, so the orders are first
+collapsed to per-location sums and counts by status class (one bincount
+pass), and the K schedules are then applied to all L locations at once
+by broadcasting (L, 1) sums against (1, K) schedule parameters. The cost
+of adding schedules is independent of the number of orders: 1M orders x
+100 schedules is the time to load the export plus a few milliseconds.
+
+As in money.py the arithmetic is exact: rates are held in parts per
+million and fees in 1e-6 cent units, rounded to cents once per figure,
+half away from zero. PLATFORM_SCHEDULES reproduce money.dashboard_summary
+and platform_mirror.dashboard_export to the cent.
+"""
+
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import canonicalize_locations
+from money import REFUND_STATUSES, SALE_STATUSES, format_cents, to_cents, units_to_cents
+from order_reader import DEFAULT_EXPORT, load_orders
+from pipeline_profile import enable_from_argv, profiled
+
+PPM = 1_000_000  # rates in parts per million; fees in 1e-6 cent units
+UNKNOWN_LOCATION = 'Unknown Location'
+MAX_PRINTED_SCHEDULES = 6
+
+SCHEDULE_COLUMNS = ['platform_rate', 'stripe_rate', 'stripe_fixed', 'stripe_all_orders', 'deduct_refunds']
+PLATFORM_SCHEDULES = pd.DataFrame({
+    'platform_rate': [0.07, 0.07],
+    'stripe_rate': [0.029, 0.029],
+    'stripe_fixed': [0.30, 0.30],
+    'stripe_all_orders': [True, False],
+    'deduct_refunds': [True, False],
+}, index=pd.Index(['dashboard_summary', 'dashboard_export'], name='schedule'))
+
+# Status classes of the per-location sums
+STATUS_CLASSES = ['sale', 'refund', 'other']
+AGGREGATE_COLUMNS = [f'{kind}_{value}' for kind in STATUS_CLASSES for value in ('cents', 'orders')]
+FIGURES = ['sales', 'refunds', 'platform_fees', 'stripe_fees', 'net_deposit']
+
+
+def schedule_table(schedules):
+    """Schedules as a DataFrame of SCHEDULE_COLUMNS, one row per schedule
+
+    Accepts a DataFrame or a list of dicts; missing columns take the
+    dashboard_summary values. Rates are fractions (0.07), stripe_fixed is
+    in dollars.
+    """
+    table = pd.DataFrame(schedules).copy()
+    unknown = set(table.columns) - set(SCHEDULE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown schedule columns: {', '.join(sorted(unknown))}")
+    for column in SCHEDULE_COLUMNS:
+        if column not in table:
+            table[column] = PLATFORM_SCHEDULES.loc['dashboard_summary', column]
+    table = table[SCHEDULE_COLUMNS]
+    for column in ('stripe_all_orders', 'deduct_refunds'):
+        if table[column].dtype != bool:
+            table[column] = table[column].astype('string').str.lower().isin({'1', 'true', 't', 'yes'})
+    if table.index.name is None:
+        table.index.name = 'schedule'
+    return table
+
+
+def load_schedules(path):
+    """Schedules from a CSV with a `name` column and any of SCHEDULE_COLUMNS"""
+    return schedule_table(pd.read_csv(path, index_col='name'))
+
+
+def fee_grid(platform_rates, stripe_rates, stripe_fixed, basis='dashboard_summary'):
+    """Every combination of the given rates and fixed fees, with `basis`'s refund and Stripe rules"""
+    rules = PLATFORM_SCHEDULES.loc[basis]
+    rows = {
+        f"p{platform:.2%} s{stripe:.2%}+{fixed:.2f}": {
+            'platform_rate': platform, 'stripe_rate': stripe, 'stripe_fixed': fixed,
+            'stripe_all_orders': rules['stripe_all_orders'], 'deduct_refunds': rules['deduct_refunds'],
+        }
+        for platform, stripe, fixed in itertools.product(platform_rates, stripe_rates, stripe_fixed)
+    }
+    return schedule_table(pd.DataFrame.from_dict(rows, orient='index'))
+
+
+@profiled()
+def location_aggregates(cents, statuses, locations):
+    """Per-location cents and order counts for sales, refunds and other statuses
+
+    Locations are canonicalized; returns a DataFrame indexed by location
+    with AGGREGATE_COLUMNS.
+    """
+    raw_statuses = pd.Categorical(statuses)
+    lowered = pd.Index(raw_statuses.categories.astype(str)).str.lower()
+    category_classes = np.where(lowered.isin(SALE_STATUSES), 0, np.where(lowered.isin(REFUND_STATUSES), 1, 2))
+    classes = np.append(category_classes, 2)[raw_statuses.codes]  # code -1 (missing status) is 'other'
+
+    names = canonicalize_locations(pd.Categorical(locations))
+    location_codes, location_names = pd.factorize(names.astype(object).fillna(UNKNOWN_LOCATION), sort=True)
+    flat = location_codes * len(STATUS_CLASSES) + classes
+    size = len(location_names) * len(STATUS_CLASSES)
+    shape = (len(location_names), len(STATUS_CLASSES))
+    orders = np.bincount(flat, minlength=size).reshape(shape)
+    # bincount weights are float64: exact for integer sums below 2**53 cents
+    sums = np.rint(np.bincount(flat, weights=np.asarray(cents, dtype='int64'), minlength=size)).astype('int64')
+    sums = sums.reshape(shape)
+
+    columns = {}
+    for position, kind in enumerate(STATUS_CLASSES):
+        columns[f'{kind}_cents'] = sums[:, position]
+        columns[f'{kind}_orders'] = orders[:, position]
+    return pd.DataFrame(columns, index=pd.Index(list(location_names), name='Location'))[AGGREGATE_COLUMNS]
+
+
+@profiled()
+def simulate_fees(aggregates, schedules):
+    """Fees and net deposit for each aggregate row under each schedule
+
+    Returns {figure: int64 cents array of shape (rows, schedules)} for
+    FIGURES. One broadcasted pass: no loop over schedules or orders.
+    """
+    schedules = schedule_table(schedules)
+    sums = {column: aggregates[column].to_numpy(dtype='int64')[:, None] for column in AGGREGATE_COLUMNS}
+    platform_rate = np.rint(schedules['platform_rate'].to_numpy(dtype='float64') * PPM).astype('int64')[None, :]
+    stripe_rate = np.rint(schedules['stripe_rate'].to_numpy(dtype='float64') * PPM).astype('int64')[None, :]
+    stripe_fixed = to_cents(schedules['stripe_fixed'])[None, :] * PPM
+    stripe_all = schedules['stripe_all_orders'].to_numpy(dtype=bool)[None, :]
+    deduct = schedules['deduct_refunds'].to_numpy(dtype=bool)[None, :]
+
+    deducted_cents = np.where(deduct, sums['refund_cents'], 0)
+    sales = sums['sale_cents'] * PPM
+    refunds = sums['refund_cents'] * PPM
+    platform_fees = (sums['sale_cents'] - deducted_cents) * platform_rate
+    stripe_cents = sums['sale_cents'] + np.where(stripe_all, sums['refund_cents'] + sums['other_cents'], 0)
+    stripe_orders = sums['sale_orders'] + np.where(stripe_all, sums['refund_orders'] + sums['other_orders'], 0)
+    stripe_fees = stripe_cents * stripe_rate + stripe_orders * stripe_fixed
+    figures = {
+        'sales': sales,
+        'refunds': refunds,
+        'platform_fees': platform_fees,
+        'stripe_fees': stripe_fees,
+        'net_deposit': sales - deducted_cents * PPM - platform_fees - stripe_fees,
+    }
+    shape = (len(aggregates), len(schedules))
+    return {name: units_to_cents(np.broadcast_to(units, shape), PPM) for name, units in figures.items()}
+
+
+class FeeSimulation:
+    """Fees and net deposit per (location, schedule), in cents"""
+
+    def __init__(self, aggregates, schedules):
+        self.aggregates = aggregates
+        self.schedules = schedule_table(schedules)
+        self.locations = aggregates.index
+        self.figures = simulate_fees(aggregates, self.schedules)
+        # Totals are computed from the summed orders, as the platform does, not by adding rounded rows
+        self.total_figures = {name: values[0] for name, values in
+                              simulate_fees(aggregates.sum().to_frame().T, self.schedules).items()}
+
+    @classmethod
+    def from_orders(cls, cents, statuses, locations, schedules=PLATFORM_SCHEDULES):
+        """Simulate aligned per-order arrays"""
+        return cls(location_aggregates(cents, statuses, locations), schedules)
+
+    @classmethod
+    def from_export(cls, path, schedules=PLATFORM_SCHEDULES):
+        """Simulate an export's orders (negative refund rows duplicate their parent and are skipped)"""
+        df = load_orders(path, columns=['Status', 'Location', 'Total Amount'])
+        df = df[df['Total Amount'] >= 0]
+        return cls.from_orders(to_cents(df['Total Amount']), df['Status'], df['Location'], schedules)
+
+    def frame(self, figure='net_deposit'):
+        """Location x schedule DataFrame of one figure"""
+        return pd.DataFrame(self.figures[figure], index=self.locations, columns=self.schedules.index)
+
+    def totals(self):
+        """Schedule x figure DataFrame over all locations"""
+        return pd.DataFrame(self.total_figures, index=self.schedules.index)[FIGURES]
+
+    def long_frame(self):
+        """One row per (location, schedule) with every figure"""
+        index = pd.MultiIndex.from_product([self.locations, self.schedules.index])
+        return pd.DataFrame({name: values.ravel() for name, values in self.figures.items()}, index=index)[FIGURES]
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Net deposit per location under candidate fee schedules')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV or .xlsx)')
+    parser.add_argument('--schedules', help='CSV of schedules: name plus any of ' + ', '.join(SCHEDULE_COLUMNS))
+    parser.add_argument('--platform-rate', type=float, nargs='+', help='platform fee rates for a grid (0.07 = 7%%)')
+    parser.add_argument('--stripe-rate', type=float, nargs='+', help='Stripe rates for a grid')
+    parser.add_argument('--stripe-fixed', type=float, nargs='+', help='Stripe fixed fees in dollars for a grid')
+    parser.add_argument('--basis', choices=list(PLATFORM_SCHEDULES.index), default='dashboard_summary',
+                        help='refund and Stripe rules of the grid')
+    parser.add_argument('--output', help='write every (location, schedule) figure to this CSV')
+    args = parser.parse_args()
+
+    schedules = [PLATFORM_SCHEDULES]
+    if args.schedules:
+        schedules.append(load_schedules(args.schedules))
+    if args.platform_rate or args.stripe_rate or args.stripe_fixed:
+        current = PLATFORM_SCHEDULES.loc[args.basis]
+        schedules.append(fee_grid(args.platform_rate or [current['platform_rate']],
+                                  args.stripe_rate or [current['stripe_rate']],
+                                  args.stripe_fixed or [current['stripe_fixed']], args.basis))
+    schedules = pd.concat(schedules)
+
+    simulation = FeeSimulation.from_export(args.path, schedules)
+
+    print(f"=== FEE SCHEDULE SIMULATION: {args.path} ===")
+    print(f"{len(simulation.locations)} locations x {len(schedules)} schedules\n")
+    totals = simulation.totals()
+    totals['vs_summary'] = totals['net_deposit'] - totals.loc['dashboard_summary', 'net_deposit']
+    print(totals.map(format_cents).to_string())
+
+    if len(schedules) <= MAX_PRINTED_SCHEDULES:
+        print("\nNet deposit per location:")
+        print(simulation.frame().map(format_cents).to_string())
+    else:
+        print(f"\nPer-location figures for {len(schedules)} schedules: use --output")
+
+    if args.output:
+        simulation.long_frame().to_csv(args.output)
+        print(f"\nSimulation written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
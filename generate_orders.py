@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Synthetic WooCommerce order export generator.
+
+Writes exports with the same columns and quirks as the real ones: quoted
+multi-line Order Notes with Stripe charge IDs, an empty Pick UP column,
+mostly Processing orders with some Cancelled, refunded orders followed
+later by their negative refund row (no Paid Date), rows without a
+location and slightly different spellings of the same location. Rows are
+generated and written in blocks, so 10M-row files need little memory.
+"""
+
+import argparse
+import calendar
+
+import numpy as np
+import pandas as pd
+
+EXPORT_COLUMNS = ['Order ID', 'Paid Date', 'Status', 'First Name', 'Pick UP', 'Location', 'Payment', 'Tax',
+                  'Total Amount', 'Refund Amount', 'Total (- Refund)', 'Order Notes']
+
+LOCATIONS = [
+    '7 Court St, Binghamton, NY',
+    '7434 Ogontz Ave, Philadelphia, PA',
+    '314 S High St, West Chester, PA',
+    '2210 Cottman Ave, Philadelphia, PA',
+    '6151 Ridge Ave, Philadelphia, PA',
+    '4501 N Broad St, Philadelphia, PA',
+    '1947 Street Rd, Bensalem, PA',
+    'Drexel University 3301 Market St, Philadelphia',
+    '2100 Mt Ephraim Ave, Oaklyn, NJ',
+]
+LOCATION_VARIANTS = [
+    '2210 Cottman Ave,  Philadelphia, PA',
+    '314 S High St, West Chester',
+    '7 Court St, Binghamton NY',
+]
+FIRST_NAMES = ['Steven', 'Malik', 'Zack', 'Kahlil', 'Jordan', 'Maxwell', 'ava', 'Grace', 'Umar', 'Brendan',
+               'Devante', 'Courtney', 'Jake', 'Ethan', 'Samantha', 'Audrey', 'Summer', 'Benjamin', '']
+MENU_PRICES = np.array([8.65, 11.43, 13.74, 14.89, 16.05, 21.82, 24.01, 26.32, 29.79, 36.59, 42.37])
+TAX_RATE = 0.08
+CARD_BRANDS = ['Visa', 'MasterCard', 'Discover', 'American Express']
+CHARGE_ALPHABET = np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789', dtype='S1')
+
+DEFAULT_BLOCK_SIZE = 200_000
+
+
+def paid_dates(rng, n, year, month):
+    """Random 'May 1, 2025 12:11 AM' style timestamps within one month"""
+    days = rng.integers(1, calendar.monthrange(year, month)[1] + 1, n)
+    hours = rng.integers(0, 24, n)
+    minutes = rng.integers(0, 60, n)
+    hour12 = np.where(hours % 12 == 0, 12, hours % 12)
+    suffix = np.where(hours < 12, 'AM', 'PM')
+    return (f"{calendar.month_name[month]} " + pd.Series(days).astype(str) + f", {year} "
+            + pd.Series(hour12).astype(str) + ':' + pd.Series(minutes).map('{:02d}'.format)
+            + ' ' + suffix)
+
+
+def charge_ids(rng, n):
+    """Random Stripe-style charge IDs (ch_3...)"""
+    chars = CHARGE_ALPHABET[rng.integers(0, len(CHARGE_ALPHABET), (n, 24))]
+    return 'ch_3' + pd.Series(chars.view('S24').ravel()).str.decode('ascii')
+
+
+def payments(rng, n):
+    """Payment strings in the formats seen in real exports"""
+    brand = np.asarray(CARD_BRANDS)[rng.choice(len(CARD_BRANDS), n, p=[0.6, 0.3, 0.07, 0.03])]
+    last4 = pd.Series(rng.integers(0, 10_000, n)).map('{:04d}'.format)
+    brand = pd.Series(brand)
+    style = rng.integers(0, 5, n)
+    return pd.Series(np.select(
+        [style == 0, style == 1, style == 2, style == 3],
+        [brand + ' ' + last4 + ' (Google Pay)', brand + ' ********' + last4, brand + ' ending in ' + last4,
+         pd.Series('Apple Pay', index=brand.index)],
+        default=brand + ' ' + last4 + ' (Apple Pay)',
+    ))
+
+
+def generate_block(rng, first_order_id, n, year=2025, month=5, refund_rate=0.02, cancel_rate=0.001,
+                   unknown_rate=0.1, variant_rate=0.01):
+    """One block of export rows (refunded orders add a trailing negative row)"""
+    order_ids = first_order_id + np.cumsum(rng.integers(1, 4, n))
+    totals = MENU_PRICES[rng.integers(0, len(MENU_PRICES), n)] * rng.integers(1, 3, n)
+    totals = np.round(totals, 2)
+    tax = np.round(totals * TAX_RATE / (1 + TAX_RATE), 2)
+
+    draw = rng.random(n)
+    status = np.where(draw < refund_rate, 'Refunded', np.where(draw < refund_rate + cancel_rate, 'Cancelled', 'Processing'))
+    refunded = status == 'Refunded'
+
+    location = np.asarray(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)]
+    where = rng.random(n)
+    location[where < variant_rate] = np.asarray(LOCATION_VARIANTS, dtype=object)[
+        rng.integers(0, len(LOCATION_VARIANTS), int((where < variant_rate).sum()))]
+    location[where > 1 - unknown_rate] = None
+
+    payment = payments(rng, n)
+    notes = ('Order charge successful in Stripe. Charge: ' + charge_ids(rng, n) + '. Payment Method: ' + payment
+             + '\nOrder status changed from Pending payment to Processing.'
+             + '\nOrder status changed from Draft to Pending payment.')
+    notes[refunded] = ('Order status changed from Processing to Refunded.\n' + notes[refunded])
+
+    refund_amount = np.where(refunded, totals, 0.0)
+    orders = pd.DataFrame({
+        'Order ID': order_ids,
+        'Paid Date': paid_dates(rng, n, year, month),
+        'Status': status,
+        'First Name': np.asarray(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), n)],
+        'Pick UP': None,
+        'Location': location,
+        'Payment': payment,
+        'Tax': tax,
+        'Total Amount': totals,
+        'Refund Amount': refund_amount,
+        'Total (- Refund)': np.round(totals - refund_amount, 2),
+        'Order Notes': notes,
+    })
+
+    # Refund rows: same order, negative amounts, no date or notes
+    refunds = orders[refunded].copy()
+    refunds['Paid Date'] = None
+    refunds['Order Notes'] = None
+    refunds['Tax'] = -refunds['Tax']
+    refunds['Total Amount'] = -refunds['Total Amount']
+    refunds['Refund Amount'] = 0.0
+    refunds['Total (- Refund)'] = refunds['Total Amount']
+
+    # Refund rows show up later in the export than their parent order
+    positions = np.concatenate([np.arange(n), np.flatnonzero(refunded) + rng.integers(1, 500, int(refunded.sum()))])
+    block = pd.concat([orders, refunds], ignore_index=True)
+    return block.iloc[np.argsort(positions, kind='stable')], int(order_ids[-1]) if n else first_order_id
+
+
+def generate_export(path, rows, seed=0, year=2025, month=5, block_size=DEFAULT_BLOCK_SIZE, first_order_id=25_997):
+    """Write an export of roughly `rows` orders (plus refund rows) to `path`"""
+    rng = np.random.default_rng(seed)
+    written = 0
+    next_id = first_order_id
+    with open(path, 'w', newline='') as handle:
+        handle.write(','.join(EXPORT_COLUMNS) + '\n')
+        while written < rows:
+            n = min(block_size, rows - written)
+            block, next_id = generate_block(rng, next_id, n, year=year, month=month)
+            block.to_csv(handle, header=False, index=False, lineterminator='\n')
+            written += n
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic WooCommerce order export')
+    parser.add_argument('path', help='output CSV path')
+    parser.add_argument('--rows', type=int, default=10_000, help='number of orders (10k to 10M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--month', default='2025-05', help='month of the Paid Date values (YYYY-MM)')
+    args = parser.parse_args()
+
+    year, month = (int(part) for part in args.month.split('-'))
+    generate_export(args.path, args.rows, seed=args.seed, year=year, month=month)
+    print(f"Wrote {args.rows} orders to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Incremental reconciliation of a growing order export.
+
+A checkpoint keeps the high-water-mark Order ID, the running per-location
+aggregates and a compact per-order state (status, location, a fingerprint
+of the order's rows and the order's contribution to the aggregates). The
+next run only folds in orders above the high-water mark, plus older
+orders whose rows changed since the checkpoint (a status change, a new
+partial refund row, a corrected total): their previous contribution is
+subtracted and the new one added, so nothing is recomputed from scratch.
+Orders that disappeared from the export are subtracted as well.
+
+--check replays a grown export (new orders, a late refund row, a corrected
+total, a status change and a deleted order) on top of a checkpoint and
+verifies the result equals a full recompute.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from order_aggregation import (AGGREGATE_COLUMNS, combine_aggregates, empty_aggregates, folded_contributions,
+                               location_metrics, totals)
+from order_cache import DEFAULT_CACHE_DIR, cached_load_orders
+from order_folding import fold_orders, row_hashes
+from order_reader import DEFAULT_EXPORT
+from pipeline_profile import enable_from_argv, profiled
+
+DEFAULT_CHECKPOINT = os.path.join(DEFAULT_CACHE_DIR, 'checkpoint.npz')
+NO_ORDERS = pd.Index([], dtype='int64', name='Order ID')
+
+
+@profiled()
+def order_contributions(df):
+    """Per-order contribution to the location aggregates
+
+    The order's rows are folded first (order_folding), so a refunded order
+    counts once, as in every other entry point (order_aggregation.
+    folded_contributions). Returns a frame indexed by Order ID with
+    Location, Status and AGGREGATE_COLUMNS.
+    """
+    folded = fold_orders(df)
+    result = folded_contributions(folded)
+    result.insert(0, 'Status', folded['Status'].astype(object))
+    result.insert(0, 'Location', folded['Location'].astype(object))
+    return result.sort_index()
+
+
+@profiled()
+def order_fingerprints(df):
+    """64-bit fingerprint of each order's rows, as a Series indexed by Order ID
+
+    The sum (wrapping at 64 bits) of the order's row hashes: any added,
+    removed or edited row changes it, whatever order the rows come in.
+    """
+    df = df[df['Order ID'].notna()]
+    ids = df['Order ID'].to_numpy(dtype='int64')
+    order = np.argsort(ids, kind='stable')
+    ids, hashes = ids[order], row_hashes(df)[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.zeros(0, dtype='int64')
+    sums = np.add.reduceat(hashes, starts) if len(ids) else np.zeros(0, dtype='uint64')
+    return pd.Series(sums, index=pd.Index(ids[starts], name='Order ID'), dtype='uint64')
+
+
+def by_location(contributions):
+    """Location aggregates from per-order contributions (orders without a location are skipped)"""
+    known = contributions[contributions['Location'].notna()]
+    return known.groupby('Location')[AGGREGATE_COLUMNS].sum()
+
+
+@profiled()
+def load_checkpoint(path):
+    """Checkpoint dict, or None when there is none yet (or it predates order fingerprints)"""
+    if not Path(path).exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        if 'order_fingerprint' not in data:
+            return None
+        meta = json.loads(str(data['meta']))
+        orders = pd.DataFrame({
+            'Location': np.where(data['order_location'] == '', None, data['order_location'].astype(object)),
+            'Status': data['order_status'].astype(object),
+            'fingerprint': data['order_fingerprint'],
+            **{column: data[f'order_{column}'] for column in AGGREGATE_COLUMNS},
+        }, index=pd.Index(data['order_id'], name='Order ID'))
+        aggregates = pd.DataFrame(data['aggregate_values'], columns=AGGREGATE_COLUMNS,
+                                  index=pd.Index(data['aggregate_locations'].astype(object), name='Location'))
+    return {'high_water_mark': meta['high_water_mark'], 'source': meta['source'],
+            'orders': orders, 'aggregates': aggregates}
+
+
+@profiled()
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically as a compressed .npz"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    orders = checkpoint['orders']
+    aggregates = checkpoint['aggregates']
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        meta=json.dumps({'high_water_mark': checkpoint['high_water_mark'], 'source': checkpoint['source']}),
+        order_id=orders.index.to_numpy(dtype='int64'),
+        order_location=orders['Location'].fillna('').to_numpy(dtype=str),
+        order_status=orders['Status'].to_numpy(dtype=str),
+        order_fingerprint=orders['fingerprint'].to_numpy(dtype='uint64'),
+        **{f'order_{column}': orders[column].to_numpy(dtype='int64') for column in AGGREGATE_COLUMNS},
+        aggregate_locations=aggregates.index.to_numpy(dtype=str),
+        aggregate_values=aggregates[AGGREGATE_COLUMNS].to_numpy(dtype='int64'),
+    )
+    os.replace(tmp_path, path)
+
+
+@profiled()
+def changed_rows(df, fingerprints, checkpoint):
+    """Rows of new or changed orders, plus the changed and the deleted Order IDs
+
+    An order at or below the high-water mark is changed when its fingerprint
+    differs from the checkpoint's (or the checkpoint never saw it); it is
+    deleted when the checkpoint has it but the export no longer does.
+    """
+    stored = checkpoint['orders']['fingerprint']
+    old = fingerprints[fingerprints.index <= checkpoint['high_water_mark']]
+    changed = old.index[stored.reindex(old.index).to_numpy() != old.to_numpy()]
+    deleted = stored.index.difference(fingerprints.index)
+
+    ids = df['Order ID']
+    selected = (ids > checkpoint['high_water_mark']) | ids.isin(changed)
+    return df[selected.fillna(False).to_numpy()], changed, deleted
+
+
+def apply_update(df, checkpoint, source):
+    """Fold the new and changed orders of a loaded export into `checkpoint` (None: start over)
+
+    Returns (checkpoint, stats); nothing is read or written.
+    """
+    fingerprints = order_fingerprints(df)
+    if checkpoint is None:
+        delta, changed, deleted = df, NO_ORDERS, NO_ORDERS
+    else:
+        delta, changed, deleted = changed_rows(df, fingerprints, checkpoint)
+
+    contributions = order_contributions(delta)
+    contributions['fingerprint'] = fingerprints.reindex(contributions.index)
+    if checkpoint is None:
+        orders = contributions
+        aggregates = by_location(contributions)
+        high_water_mark = 0
+    else:
+        replaced = contributions.index.union(deleted)
+        previous = checkpoint['orders'].reindex(replaced).dropna(subset=['Status'])
+        removed = -by_location(previous.astype({column: 'int64' for column in AGGREGATE_COLUMNS}))
+        aggregates = combine_aggregates(checkpoint['aggregates'], removed, by_location(contributions))
+        orders = pd.concat([checkpoint['orders'].drop(replaced, errors='ignore'), contributions])
+        orders = orders.sort_index()
+        high_water_mark = checkpoint['high_water_mark']
+
+    if df['Order ID'].notna().any():
+        high_water_mark = max(high_water_mark, int(df['Order ID'].max()))
+    checkpoint = {
+        'high_water_mark': high_water_mark,
+        'source': str(source),
+        'orders': orders,
+        'aggregates': aggregates if len(aggregates) else empty_aggregates(),
+    }
+    stats = {'rows_total': len(df), 'rows_processed': len(delta),
+             'changed_orders': len(changed), 'deleted_orders': len(deleted)}
+    return checkpoint, stats
+
+
+def incremental_update(path, checkpoint_path=DEFAULT_CHECKPOINT, reset=False):
+    """Fold new and changed orders into the checkpoint; returns (checkpoint, stats)"""
+    checkpoint = None if reset else load_checkpoint(checkpoint_path)
+    checkpoint, stats = apply_update(cached_load_orders(path), checkpoint, path)
+    save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint, stats
+
+
+def grown_export(df):
+    """(before, after) copies of a loaded export for check_incremental()
+
+    `after` is `df` with a late partial refund row on one Processing order;
+    `before` lacks the newest tenth of the orders and that refund row, has
+    a different total on a second order, has a third (Refunded) order still
+    Processing and has an extra order that was deleted since.
+    """
+    df = df[df['Order ID'].notna()].astype({'Status': object, 'Location': object}).reset_index(drop=True)
+    ids = df['Order ID'].astype('int64')
+    old = df[ids <= int(ids.quantile(0.9))]
+    parents = old[old['Total Amount'] >= 0]
+    processing = parents.index[parents['Status'] == 'Processing']
+    refunded = parents.index[parents['Status'] == 'Refunded']
+    if len(processing) < 2 or not len(refunded):
+        raise ValueError("The check needs at least two Processing and one Refunded order below the newest tenth")
+
+    refund_row = df.loc[[processing[0]]].assign(**{'Paid Date': pd.NaT, 'Total Amount': -1.0,
+                                                   'Refund Amount': 0.0, 'Total (- Refund)': -1.0})
+    # Row hashes depend on the dtypes, so both copies keep the loaded ones
+    after = pd.concat([df, refund_row], ignore_index=True).astype(df.dtypes.to_dict())
+
+    before = old.copy()
+    before.loc[processing[1], ['Total Amount', 'Total (- Refund)']] += 1.0
+    before.loc[refunded[0], ['Status', 'Refund Amount']] = ['Processing', 0.0]
+    deleted = old.loc[[processing[0]]].assign(**{'Order ID': ids.min() - 1})
+    before = pd.concat([before, deleted], ignore_index=True).astype(df.dtypes.to_dict())
+    return before, after
+
+
+def check_incremental(df):
+    """Run grown_export() incrementally and from scratch; returns a list of mismatches"""
+    before, after = grown_export(df)
+    checkpoint, _ = apply_update(before, None, 'before')
+    incremental, stats = apply_update(after, checkpoint, 'after')
+    full, _ = apply_update(after, None, 'after')
+
+    problems = []
+    if stats['changed_orders'] != 3 or stats['deleted_orders'] != 1:
+        problems.append(f"expected 3 changed and 1 deleted orders, got {stats['changed_orders']} "
+                        f"and {stats['deleted_orders']}")
+    def nonzero(aggregates):
+        # A location whose orders were all deleted keeps a row of zeros
+        return aggregates[aggregates.ne(0).any(axis=1)].sort_index()
+
+    if not nonzero(incremental['aggregates']).equals(nonzero(full['aggregates'])):
+        problems.append("aggregates differ from a full recompute:\n"
+                        f"{nonzero(incremental['aggregates']).compare(nonzero(full['aggregates']))}")
+    if not incremental['orders'].equals(full['orders']):
+        problems.append("per-order state differs from a full recompute")
+    return problems
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Incrementally reconcile an order export against a checkpoint')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--reset', action='store_true', help='ignore any existing checkpoint')
+    parser.add_argument('--check', action='store_true',
+                        help='verify that an incremental run over a grown copy of the export equals a full recompute')
+    args = parser.parse_args()
+
+    if args.check:
+        problems = check_incremental(cached_load_orders(args.path))
+        for problem in problems:
+            print(problem)
+        parser.exit(1 if problems else 0, "" if problems else "Incremental check passed\n")
+
+    checkpoint, stats = incremental_update(args.path, args.checkpoint, reset=args.reset)
+    metrics = location_metrics(checkpoint['aggregates']).sort_index()
+
+    print(f"=== INCREMENTAL RECONCILIATION: {args.path} ===")
+    print(f"Rows in export: {stats['rows_total']}")
+    print(f"Rows processed: {stats['rows_processed']}")
+    print(f"Changed orders re-folded: {stats['changed_orders']}")
+    print(f"Deleted orders removed: {stats['deleted_orders']}")
+    print(f"High-water-mark Order ID: {checkpoint['high_water_mark']}")
+    print()
+    print(metrics.to_string(float_format='%.2f'))
+    overall = totals(metrics)
+    print(f"\nProcessing Sales: ${overall['processing_sales']:.2f} | Refunds: ${overall['refunds']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
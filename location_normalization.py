@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Location name canonicalization for order exports.
+
+Applies the same rules as normalizeLocationName() in
+server/locationUtils.ts (trim, strip a trailing state abbreviation,
+collapse whitespace, then the alias table). Only the unique raw strings of
+a column are normalized; the results are kept in a lookup table and applied
+to the whole column as a categorical remap. Names that do not normalize to
+a known location fall back to a character-trigram index instead of
+comparing against every known location.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from pipeline_profile import profiled
+
+STATE_SUFFIX = re.compile(
+    r',\s*(PA|DE|NJ|NY|MD|VA|CT|MA|FL|CA|TX|IL|OH|MI|WI|MN|IA|MO|ND|SD|NE|KS|OK|AR|LA|MS|AL|TN|KY|IN|WV|NC|SC|GA'
+    r'|VT|NH|ME|RI|AK|HI|WA|OR|ID|MT|WY|CO|NM|AZ|UT|NV)\s*$',
+    re.IGNORECASE,
+)
+WHITESPACE = re.compile(r'\s+')
+
+# Same alias table as locationMappings in normalizeLocationName()
+LOCATION_ALIASES = {
+    "Drexel University 3301 Market St, Philadelphia": "3301 Market St, Philadelphia",
+    "3301 Market St, Philadelphia, PA": "3301 Market St, Philadelphia",
+    "414 North Union St, Wilmington, DE": "414 North Union St, Wilmington DE",
+    "414 North Union St, Wilmington DE": "414 North Union St, Wilmington DE",
+    "4407 Chestnut St, Philadelphia, PA": "4407 Chestnut St, Philadelphia",
+}
+
+FUZZY_THRESHOLD = 0.8
+
+
+@lru_cache(maxsize=None)
+def normalize_location_name(name):
+    """Python port of normalizeLocationName() (memoized per raw string)"""
+    if not name:
+        return name
+    normalized = STATE_SUFFIX.sub('', name.strip())
+    normalized = WHITESPACE.sub(' ', normalized).strip()
+    return LOCATION_ALIASES.get(normalized, normalized)
+
+
+def trigrams(text):
+    """Character trigrams of a lowercased, space-padded name"""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocationIndex:
+    """Resolve raw location strings to a fixed set of known locations
+
+    Lookups try, in order: the raw string itself, its normalized form, and
+    a trigram-index fuzzy match (Dice similarity >= `threshold`). Results
+    are memoized, so each distinct raw string is resolved once.
+    """
+
+    def __init__(self, known_locations, threshold=FUZZY_THRESHOLD):
+        self.known = list(dict.fromkeys(known_locations))
+        self.known_set = set(self.known)
+        self.threshold = threshold
+        self.by_normalized = {}
+        self.grams = []
+        self.postings = {}
+        for position, name in enumerate(self.known):
+            normalized = normalize_location_name(name)
+            self.by_normalized.setdefault(normalized, name)
+            grams = trigrams(normalized)
+            self.grams.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(position)
+        self.cache = {}
+
+    def fuzzy_match(self, normalized):
+        """Best known location by trigram Dice similarity, or None"""
+        grams = trigrams(normalized)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        if not shared:
+            return None
+        position, score = max(
+            ((position, 2 * count / (len(grams) + self.grams[position])) for position, count in shared.items()),
+            key=lambda item: item[1],
+        )
+        return self.known[position] if score >= self.threshold else None
+
+    def match(self, raw):
+        """Known location for a raw string, or None if nothing is close enough"""
+        if raw in self.cache:
+            return self.cache[raw]
+        if raw is None or (isinstance(raw, float) and np.isnan(raw)):
+            return None
+        if raw in self.known_set:
+            result = raw
+        else:
+            normalized = normalize_location_name(raw)
+            result = self.by_normalized.get(normalized) or self.fuzzy_match(normalized)
+        self.cache[raw] = result
+        return result
+
+
+@profiled()
+def canonicalize_locations(locations, known_locations=None, threshold=FUZZY_THRESHOLD):
+    """Canonicalize a location column via a lookup table over its unique values
+
+    Without `known_locations` every value is replaced by its normalized
+    name. With them, values are resolved through a LocationIndex and
+    anything unmatched becomes NaN. Returns a categorical Series aligned
+    with `locations`.
+    """
+    raw = pd.Categorical(locations)
+    if known_locations is None:
+        canonical = [normalize_location_name(name) for name in raw.categories]
+    else:
+        index = LocationIndex(known_locations, threshold=threshold)
+        canonical = [index.match(name) for name in raw.categories]
+
+    targets = pd.Index([name for name in dict.fromkeys(canonical) if name is not None])
+    lookup = np.append(targets.get_indexer(canonical), -1)  # code -1 (NaN) stays NaN
+    codes = lookup[raw.codes]
+    result = pd.Categorical.from_codes(codes, categories=targets)
+    return pd.Series(result, index=getattr(locations, 'index', None), name=getattr(locations, 'name', None))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Exact money arithmetic for the analysis pipeline.
+
+Amounts are held as int64 cents in NumPy arrays. Fees follow the
+platform's getDashboardSummary() formulas exactly by working in integer
+units of 1/1000 cent (1e-5 dollars), which represent `amount * 0.07` and
+`amount * 0.029 + 0.30` without remainder, just like Postgres DECIMAL
+arithmetic. Rounding to cents happens once, on the final totals, half
+away from zero like Postgres ROUND().
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from pipeline_profile import enable_from_argv, profiled
+
+UNITS_PER_CENT = 1000  # 1 unit = 1e-5 dollars
+
+PLATFORM_FEE_UNITS = 70       # 7% of a cent
+STRIPE_FEE_UNITS = 29         # 2.9% of a cent
+STRIPE_FIXED_UNITS = 30_000   # $0.30
+
+SALE_STATUSES = ('completed', 'processing')
+REFUND_STATUSES = ('refunded',)
+
+
+def to_cents(amounts):
+    """Convert dollar amounts to int64 cents (NaN and non-numeric become 0)
+
+    Values are rounded with np.rint(x * 100), which is exact for any
+    two-decimal amount below ~$90 trillion.
+    """
+    values = pd.to_numeric(pd.Series(amounts), errors='coerce').to_numpy(dtype='float64', na_value=0.0)
+    return np.rint(values * 100).astype('int64')
+
+
+def units_to_cents(units, units_per_cent=UNITS_PER_CENT):
+    """Round 1e-5-dollar units (or 1/units_per_cent cents) to cents, half away from zero"""
+    units = np.asarray(units, dtype='int64')
+    half = units_per_cent // 2
+    return np.where(units >= 0, (units + half) // units_per_cent, -((-units + half) // units_per_cent))
+
+
+def format_cents(cents):
+    """'$1,234.56' style string for an integer number of cents"""
+    cents = int(cents)
+    sign = '-' if cents < 0 else ''
+    return f"{sign}${abs(cents) // 100:,}.{abs(cents) % 100:02d}"
+
+
+def status_masks(statuses):
+    """(is_sale, is_refund) boolean arrays for a status column, case-insensitive
+
+    Only the distinct statuses are lowercased; missing ones are neither.
+    """
+    codes, uniques = pd.factorize(pd.Series(statuses))
+    lowered = pd.Index(uniques).astype(str).str.lower()
+    is_sale = np.append(lowered.isin(SALE_STATUSES), False)[codes]  # code -1 (missing) is neither
+    is_refund = np.append(lowered.isin(REFUND_STATUSES), False)[codes]
+    return is_sale, is_refund
+
+
+def summarize_totals(sale_cents, sale_orders, refund_cents, all_cents, all_orders):
+    """getDashboardSummary() figures from pre-aggregated cents and order counts
+
+    Both fee formulas are linear in the amounts, so summing per-order fees
+    equals applying the formulas to the sums: platform fees are 7% of
+    (sales - refunds) and Stripe fees are 2.9% of every order's amount
+    plus $0.30 per order. Works on scalars or arrays; returns a dict of
+    int64 cents (totalOrders is a count).
+    """
+    sales = np.asarray(sale_cents, dtype='int64') * UNITS_PER_CENT
+    refunds = np.asarray(refund_cents, dtype='int64') * UNITS_PER_CENT
+    platform_fees = (np.asarray(sale_cents, dtype='int64') - np.asarray(refund_cents, dtype='int64')) * PLATFORM_FEE_UNITS
+    stripe_fees = (np.asarray(all_cents, dtype='int64') * STRIPE_FEE_UNITS
+                   + np.asarray(all_orders, dtype='int64') * STRIPE_FIXED_UNITS)
+    return {
+        'totalSales': units_to_cents(sales),
+        'totalOrders': np.asarray(sale_orders, dtype='int64'),
+        'totalRefunds': units_to_cents(refunds),
+        'platformFees': units_to_cents(platform_fees),
+        'stripeFees': units_to_cents(stripe_fees),
+        'netDeposit': units_to_cents(sales - refunds - platform_fees - stripe_fees),
+    }
+
+
+@profiled()
+def dashboard_summary(cents, statuses, groups=None):
+    """getDashboardSummary() totals, exact, optionally per group
+
+    `groups` is one key per order or a DataFrame of keys (one index level
+    per column). Returns a DataFrame (one row per group, or a single
+    'all' row) with totalSales, totalOrders, totalRefunds, platformFees,
+    stripeFees and netDeposit, each money column in integer cents.
+    """
+    cents = np.asarray(cents, dtype='int64')
+    is_sale, is_refund = status_masks(statuses)
+    frame = pd.DataFrame({
+        'sale_cents': np.where(is_sale, cents, 0),
+        'sale_orders': is_sale.astype('int64'),
+        'refund_cents': np.where(is_refund, cents, 0),
+        'all_cents': cents,
+        'all_orders': np.ones(len(cents), dtype='int64'),
+    })
+    if groups is None:
+        grouped = frame.sum().to_frame('all').T
+    elif isinstance(groups, pd.DataFrame):
+        # One index level per column, categoricals kept (only observed combinations)
+        keys = [groups[column].reset_index(drop=True) for column in groups]
+        grouped = frame.groupby(keys, observed=True).sum()
+    else:
+        grouped = frame.groupby(pd.Series(groups).to_numpy(), dropna=False).sum()
+    return pd.DataFrame(summarize_totals(**{column: grouped[column].to_numpy() for column in frame}),
+                        index=grouped.index)
+
+
+def main():
+    from order_reader import DEFAULT_EXPORT, load_orders
+
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Exact platform-style fee summary of an order export')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    args = parser.parse_args()
+
+    df = load_orders(args.path)
+    orders = df[df['Total Amount'] >= 0]  # negative rows duplicate their refunded parent
+    cents = to_cents(orders['Total Amount'])
+    summary = dashboard_summary(cents, orders['Status'],
+                                groups=orders['Location'].astype(object).fillna('Unknown Location'))
+
+    print("=== EXACT DASHBOARD SUMMARY (integer cents) ===")
+    for location, row in summary.iterrows():
+        print(f"\n📍 {location}")
+        print(f"  Total Sales:   {format_cents(row['totalSales'])} ({row['totalOrders']} orders)")
+        print(f"  Total Refunds: {format_cents(row['totalRefunds'])}")
+        print(f"  Platform Fees: {format_cents(row['platformFees'])}")
+        print(f"  Stripe Fees:   {format_cents(row['stripeFees'])}")
+        print(f"  Net Deposit:   {format_cents(row['netDeposit'])}")
+
+    overall = dashboard_summary(cents, orders['Status']).iloc[0]
+    print(f"\nTOTAL Net Deposit: {format_cents(overall['netDeposit'])}")
+
+
+if __name__ == "__main__":
+    main()
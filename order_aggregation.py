@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Vectorized per-location aggregation of WooCommerce order exports.
+
+All location metrics are produced by a single groupby over categorical
+Location/Status columns instead of one filter pass per location. Money is
+summed as int64 cents, so aggregates stay exact however many chunks or
+files are combined.
+"""
+
+import numpy as np
+import pandas as pd
+
+from money import to_cents
+from pipeline_profile import stage
+
+STATUSES = ['Processing', 'Refunded']
+
+# Raw (additive) aggregate columns. These can be summed across chunks or
+# files; location_metrics() turns them into the reported figures.
+AGGREGATE_COLUMNS = ['processing_cents', 'processing_orders', 'refund_cents', 'refunded_orders']
+
+METRIC_COLUMNS = ['processing_sales', 'processing_orders', 'refunds', 'refunded_orders']
+
+
+def empty_aggregates(locations=None):
+    """Zero-filled aggregate frame, used as the starting point for folds"""
+    index = pd.Index(list(locations or []), name='Location')
+    return pd.DataFrame(0, index=index, columns=AGGREGATE_COLUMNS, dtype='int64')
+
+
+def aggregate_orders(df, locations=None, by=None):
+    """Sum sales and count orders per location and status in one groupby pass
+
+    Processing sales come from 'Total Amount'; refunds come from
+    'Total (- Refund)' so that negative refund rows net out. When
+    `locations` is given, the result has exactly those locations (in that
+    order), with zeros for locations that have no orders. `by` names extra
+    columns (e.g. a month) that are prepended to the Location index.
+    """
+    with stage('aggregate_orders', rows=len(df)):
+        return _aggregate_orders(df, locations, list(by or []))
+
+
+def _aggregate_orders(df, locations, by):
+    if locations is None:
+        locations = pd.unique(df['Location'].dropna())
+
+    status = pd.Categorical(df['Status'], categories=STATUSES)
+    amount = np.where(status == 'Processing', to_cents(df['Total Amount']), to_cents(df['Total (- Refund)']))
+    frame = pd.DataFrame({
+        **{column: pd.Categorical(df[column]) for column in by},
+        'Location': pd.Categorical(df['Location'], categories=list(locations)),
+        'Status': status,
+        'amount': amount,
+    })
+
+    grouped = frame.groupby(by + ['Location', 'Status'], observed=False)['amount'].agg(['sum', 'size'])
+    wide = grouped.unstack('Status')
+
+    result = pd.DataFrame({
+        'processing_cents': wide[('sum', 'Processing')],
+        'processing_orders': wide[('size', 'Processing')],
+        'refund_cents': wide[('sum', 'Refunded')],
+        'refunded_orders': wide[('size', 'Refunded')],
+    })
+    if by:
+        result.index = pd.MultiIndex.from_tuples(result.index.to_list(), names=result.index.names)
+    else:
+        result.index = pd.Index(result.index.astype(object), name='Location')
+    return result
+
+
+def folded_contributions(folded):
+    """Each folded order's contribution to the location aggregates (AGGREGATE_COLUMNS, same index)
+
+    Processing sales are the gross of Processing orders; refunds are the
+    refunded cents of every order (partial refunds included), counted as
+    refunded orders.
+    """
+    is_processing = (folded['Status'].astype(object) == 'Processing').to_numpy()
+    refunded = folded['refund_cents'].to_numpy() > 0
+    return pd.DataFrame({
+        'processing_cents': np.where(is_processing, folded['gross_cents'], 0),
+        'processing_orders': is_processing.astype('int64'),
+        'refund_cents': -folded['refund_cents'].to_numpy(),
+        'refunded_orders': refunded.astype('int64'),
+    }, index=folded.index)
+
+
+def aggregate_folded(folded, locations=None, by=None):
+    """Location aggregates from folded orders (see order_folding.fold_orders)
+
+    Each order counts once (see folded_contributions()). `locations` and
+    `by` work as in aggregate_orders(), with `by` naming columns of
+    `folded`.
+    """
+    by = list(by or [])
+    if locations is None:
+        locations = pd.unique(folded['Location'].dropna())
+    frame = folded_contributions(folded).reset_index(drop=True)
+    for column in by:
+        frame[column] = pd.Categorical(folded[column])
+    frame['Location'] = pd.Categorical(folded['Location'], categories=list(locations))
+    result = frame.groupby(by + ['Location'], observed=False)[AGGREGATE_COLUMNS].sum()
+    if by:
+        result.index = pd.MultiIndex.from_tuples(result.index.to_list(), names=result.index.names)
+    else:
+        result.index = pd.Index(result.index.astype(object), name='Location')
+    return result.astype('int64')
+
+
+def combine_aggregates(*frames):
+    """Add aggregate frames together (e.g. partial results from chunks)"""
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return empty_aggregates()
+    combined = frames[0]
+    for frame in frames[1:]:
+        combined = combined.add(frame, fill_value=0)
+    return combined.astype('int64')
+
+
+def location_metrics(aggregates):
+    """Turn raw aggregates into reported metrics in dollars (refunds as a positive amount)"""
+    return pd.DataFrame({
+        'processing_sales': aggregates['processing_cents'] / 100,
+        'processing_orders': aggregates['processing_orders'],
+        'refunds': aggregates['refund_cents'].abs() / 100,
+        'refunded_orders': aggregates['refunded_orders'],
+    }, index=aggregates.index)[METRIC_COLUMNS]
+
+
+def totals(metrics):
+    """Column totals for any metrics/comparison frame in one vectorized pass"""
+    return metrics.sum(numeric_only=True)
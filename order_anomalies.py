@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Anomaly detection over an order export while it streams in.
+
+AnomalyMonitor.update() takes the typed chunks of
+order_reader.iter_order_chunks() and keeps, per store, only constant-size
+state: exponentially weighted mean and variance of its daily order count,
+sales and refund rate, the current run of days without orders, and the
+days still open. A day is closed once the stream's latest Paid Date is
+`lateness` days past it (exports are in Order ID order, so dates arrive
+roughly but not strictly sorted); closing a day scores it against the
+store's statistics before folding it in. Flags:
+
+    spike / drop        a day's orders or sales `threshold` standard
+                        deviations above or below the rolling mean
+                        (deviations are floored at Poisson noise)
+    refund_rate         a day's refunded share far above the usual one
+    gap                 a run of empty days the store's volume makes
+                        improbable (Poisson, below GAP_PROBABILITY)
+    unmapped_location   rows whose Location is empty or matches no known
+                        store
+    silent_location     a known store with no orders at all
+    late_rows           rows for days already closed (raise --lateness)
+
+Anomalies are reported as soon as they are found (on_anomaly) and
+collected into a compact report, one row per anomaly.
+"""
+
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import LocationIndex, normalize_location_name
+from money import format_cents, status_masks, to_cents
+from order_reader import DEFAULT_CHUNKSIZE, DEFAULT_EXPORT, iter_order_chunks
+from pipeline_profile import enable_from_argv, profiled
+
+MONITOR_COLUMNS = ['Paid Date', 'Status', 'Location', 'Total Amount']
+REPORT_COLUMNS = ['kind', 'location', 'start', 'end', 'metric', 'value', 'expected', 'score', 'rows']
+MISSING_LOCATION = '(empty)'
+
+DEFAULT_SPAN = 28          # days of memory of the rolling statistics
+DEFAULT_WARMUP = 7         # active days before a store's days are scored
+DEFAULT_THRESHOLD = 4.0    # standard deviations
+DEFAULT_LATENESS = 2       # days a day stays open for out-of-order rows
+GAP_PROBABILITY = 1e-3     # flag empty runs less likely than this
+MIN_REFUNDS = 3            # refunded orders before a day's refund rate is scored
+
+
+class RollingStat:
+    """Exponentially weighted mean and variance of a daily value, O(1) memory"""
+
+    __slots__ = ('alpha', 'mean', 'var', 'count')
+
+    def __init__(self, span=DEFAULT_SPAN):
+        self.alpha = 2 / (span + 1)
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if self.count == 0:
+            self.mean = float(value)
+        else:
+            diff = value - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.var = (1 - self.alpha) * (self.var + diff * increment)
+        self.count += 1
+
+    def zscore(self, value, floor_var=0.0):
+        """Deviation of `value` from the mean in standard deviations (variance floored at `floor_var`)"""
+        deviation = math.sqrt(max(self.var, floor_var, 1e-12))
+        return (value - self.mean) / deviation
+
+
+class _StoreState:
+    """Open days and rolling statistics of one store"""
+
+    __slots__ = ('open_days', 'next_day', 'orders', 'sales', 'refund_rate', 'empty_start', 'empty_days', 'late_rows')
+
+    def __init__(self, span):
+        self.open_days = {}  # day -> [orders, cents, refunded]; at most lateness + 1 days
+        self.next_day = None
+        self.orders = RollingStat(span)
+        self.sales = RollingStat(span)
+        self.refund_rate = RollingStat(span)
+        self.empty_start = None
+        self.empty_days = 0
+        self.late_rows = 0
+
+
+class AnomalyMonitor:
+    """Per-store rolling statistics over streamed chunks (see the module docstring)"""
+
+    def __init__(self, known_locations=None, span=DEFAULT_SPAN, warmup=DEFAULT_WARMUP,
+                 threshold=DEFAULT_THRESHOLD, lateness=DEFAULT_LATENESS, on_anomaly=None):
+        self.index = LocationIndex(known_locations) if known_locations is not None else None
+        self.known_locations = list(self.index.known) if self.index is not None else []
+        self.span = span
+        self.warmup = warmup
+        self.threshold = threshold
+        self.lateness = lateness
+        self.on_anomaly = on_anomaly
+        self.stores = {}
+        self.resolved = {}   # raw Location -> store, None when unmapped
+        self.unmapped = {}   # raw Location -> [rows, cents, first day, last day]
+        self.watermark = None
+        self.rows = 0
+        self.anomalies = []
+
+    def _resolve(self, raw):
+        if raw not in self.resolved:
+            if self.index is not None:
+                self.resolved[raw] = self.index.match(raw)
+            else:
+                self.resolved[raw] = normalize_location_name(raw) or None
+        return self.resolved[raw]
+
+    def _flag(self, kind, location, start, end=None, metric=None, value=None, expected=None, score=None, rows=None):
+        anomaly = {
+            'kind': kind, 'location': location,
+            'start': None if start is None else str(np.datetime64(int(start), 'D')),
+            'end': None if end is None else str(np.datetime64(int(end), 'D')),
+            'metric': metric, 'value': value, 'expected': expected,
+            'score': None if score is None else round(float(score), 1), 'rows': rows,
+        }
+        self.anomalies.append(anomaly)
+        if self.on_anomaly is not None:
+            self.on_anomaly(anomaly)
+
+    @profiled('monitor_anomalies')
+    def update(self, chunk):
+        """Fold one typed chunk (MONITOR_COLUMNS) into the running statistics"""
+        self.rows += len(chunk)
+        orders = chunk[chunk['Total Amount'] >= 0]  # negative refund rows duplicate their parent
+        raw = pd.Categorical(orders['Location'])
+        stores = np.array([self._resolve(name) for name in raw.categories] + [None], dtype=object)[raw.codes]
+        paid = pd.Series(orders['Paid Date']).to_numpy(dtype='datetime64[ns]')
+        dated = ~np.isnat(paid)
+        days = np.where(dated, paid.astype('datetime64[D]').astype('int64'), -1)
+        cents = to_cents(orders['Total Amount'])
+        _, is_refund = status_masks(orders['Status'])
+
+        # Unmapped rows, per raw value
+        unmapped = pd.isna(stores)
+        if unmapped.any():
+            raw_values = pd.Series(raw[unmapped]).astype(object).fillna(MISSING_LOCATION)
+            frame = pd.DataFrame({'raw': raw_values.to_numpy(), 'cents': cents[unmapped],
+                                  'day': pd.Series(days[unmapped]).where(dated[unmapped])})
+            for name, group in frame.groupby('raw', sort=False):
+                entry = self.unmapped.setdefault(name, [0, 0, None, None])
+                entry[0] += len(group)
+                entry[1] += int(group['cents'].sum())
+                if group['day'].notna().any():
+                    first, last = int(group['day'].min()), int(group['day'].max())
+                    entry[2] = first if entry[2] is None else min(entry[2], first)
+                    entry[3] = last if entry[3] is None else max(entry[3], last)
+
+        # Per (store, day) totals of the dated, mapped rows
+        keep = dated & ~unmapped
+        if keep.any():
+            daily = pd.DataFrame({
+                'store': stores[keep], 'day': days[keep], 'orders': 1,
+                'cents': cents[keep], 'refunded': is_refund[keep].astype('int64'),
+            }).groupby(['store', 'day'], sort=False).sum()
+            for (store, day), (count, total, refunded) in zip(daily.index, daily.to_numpy()):
+                state = self.stores.get(store)
+                if state is None:
+                    state = self.stores[store] = _StoreState(self.span)
+                if state.next_day is not None and day < state.next_day:
+                    state.late_rows += int(count)
+                    continue
+                totals = state.open_days.setdefault(int(day), [0, 0, 0])
+                totals[0] += int(count)
+                totals[1] += int(total)
+                totals[2] += int(refunded)
+            latest = int(days[keep].max())
+            self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+            self._close_through(self.watermark - self.lateness)
+
+    def _close_through(self, horizon):
+        for store, state in self.stores.items():
+            if state.next_day is None:
+                if not state.open_days:
+                    continue
+                state.next_day = min(state.open_days)
+            while state.next_day <= horizon:
+                following = min(state.open_days) if state.open_days else horizon + 1
+                empty = min(following, horizon + 1) - state.next_day
+                if empty > 0:  # a run of days without orders, skipped in one step
+                    if state.empty_start is None:
+                        state.empty_start = state.next_day
+                    state.empty_days += empty
+                    state.next_day += empty
+                    continue
+                self._close_day(store, state, state.next_day, *state.open_days.pop(state.next_day))
+                state.next_day += 1
+
+    def _end_gap(self, store, state, end):
+        """Flag the store's current run of empty days if its volume makes it improbable"""
+        if state.empty_days and state.orders.count >= self.warmup and state.orders.mean > 0:
+            # P(no orders for n days) = exp(-mean * n) under Poisson arrivals
+            needed = math.ceil(-math.log(GAP_PROBABILITY) / state.orders.mean)
+            if state.empty_days >= max(needed, 1):
+                self._flag('gap', store, state.empty_start, end, 'orders', 0, round(state.orders.mean, 1),
+                           rows=0)
+        state.empty_start = None
+        state.empty_days = 0
+
+    def _close_day(self, store, state, day, count, cents, refunded):
+        self._end_gap(store, state, day - 1)
+        if state.orders.count >= self.warmup:
+            # Variances are floored at Poisson noise: orders ~ Poisson(mean), and
+            # sales ~ compound Poisson, whose variance is at least mean**2 / mean orders
+            for metric, stat, value, floor_var in (
+                ('orders', state.orders, count, state.orders.mean),
+                ('sales', state.sales, cents, state.sales.mean ** 2 / max(state.orders.mean, 1)),
+            ):
+                score = stat.zscore(value, floor_var)
+                if abs(score) >= self.threshold:
+                    expected = round(stat.mean) if metric == 'sales' else round(stat.mean, 1)
+                    self._flag('spike' if score > 0 else 'drop', store, day, day, metric, value, expected, score,
+                               rows=count)
+            rate = refunded / count
+            mean_rate = state.refund_rate.mean
+            score = state.refund_rate.zscore(rate, mean_rate * (1 - mean_rate) / count)
+            if refunded >= MIN_REFUNDS and score >= self.threshold:
+                self._flag('refund_rate', store, day, day, 'refund_rate', round(rate, 3), round(mean_rate, 3),
+                           score, rows=count)
+        state.orders.update(count)
+        state.sales.update(cents)
+        state.refund_rate.update(refunded / count)
+
+    def finish(self):
+        """Close every open day and flag what only the whole stream shows; returns the report"""
+        if self.watermark is not None:
+            self._close_through(self.watermark)
+            for store, state in self.stores.items():
+                self._end_gap(store, state, self.watermark)
+        for store, state in self.stores.items():
+            if state.late_rows:
+                self._flag('late_rows', store, None, rows=state.late_rows)
+        for name, (rows, cents, first, last) in self.unmapped.items():
+            self._flag('unmapped_location', name, first, last, 'sales', cents, rows=rows)
+        for store in self.known_locations:
+            if store not in self.stores:
+                self._flag('silent_location', store, None, rows=0)
+        return self.report()
+
+    def report(self):
+        """The anomalies found so far, one row each"""
+        return pd.DataFrame(self.anomalies, columns=REPORT_COLUMNS)
+
+
+def known_locations_from(path):
+    """Store names from a locations CSV (the platform's `locations` table: a `name` column)"""
+    return pd.read_csv(path, usecols=['name'], dtype=str)['name'].dropna().tolist()
+
+
+@profiled()
+def scan_export(path, known_locations=None, chunksize=DEFAULT_CHUNKSIZE, on_anomaly=None, **options):
+    """Stream an export through an AnomalyMonitor; returns (rows, report)"""
+    monitor = AnomalyMonitor(known_locations, on_anomaly=on_anomaly, **options)
+    for chunk in iter_order_chunks(path, chunksize=chunksize, columns=MONITOR_COLUMNS):
+        monitor.update(chunk)
+    return monitor.rows, monitor.finish()
+
+
+def describe(anomaly):
+    """One line for an anomaly"""
+    when = anomaly['start'] if anomaly['start'] == anomaly['end'] else \
+        f"{anomaly['start'] or ''}..{anomaly['end'] or ''}".strip('.')
+    value, expected = anomaly['value'], anomaly['expected']
+    if anomaly['metric'] == 'sales':
+        value = format_cents(value)
+        expected = None if expected is None else format_cents(expected)
+    detail = f"{anomaly['metric']}={value}" if anomaly['metric'] else ''
+    if expected is not None:
+        detail += f" (usual {expected}" + (f", z={anomaly['score']})" if anomaly['score'] is not None else ')')
+    if anomaly['rows']:
+        detail += f" rows={anomaly['rows']}"
+    return f"[{anomaly['kind']}] {anomaly['location']} {when or ''} {detail}".replace('  ', ' ').strip()
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Flag gaps, spikes and unmapped stores while streaming an export')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV or .xlsx)')
+    parser.add_argument('--locations', help="the platform's locations CSV (name column); enables unmapped/silent")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='rows per chunk')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='z-score for spikes and drops')
+    parser.add_argument('--lateness', type=int, default=DEFAULT_LATENESS,
+                        help='days a day stays open for out-of-order rows')
+    parser.add_argument('--span', type=int, default=DEFAULT_SPAN, help='days of memory of the rolling statistics')
+    parser.add_argument('--report', help='write the anomaly report to this CSV')
+    args = parser.parse_args()
+
+    known = known_locations_from(args.locations) if args.locations else None
+    print(f"=== ANOMALY SCAN: {args.path} ===")
+    rows, report = scan_export(args.path, known, chunksize=args.chunksize, threshold=args.threshold,
+                               lateness=args.lateness, span=args.span,
+                               on_anomaly=lambda anomaly: print(describe(anomaly)))
+    counts = report['kind'].value_counts()
+    print(f"\n{rows} rows | {len(report)} anomalies" +
+          (": " + ", ".join(f"{kind} {count}" for kind, count in counts.items()) if len(report) else ''))
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+        print(f"Anomaly report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
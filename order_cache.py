@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Columnar cache of parsed order exports.
+
+The first load of an export parses the CSV (the slow part, because of the
+quoted multi-line Order Notes) and writes the typed order table to an
+Arrow IPC (Feather v2) file named after a hash of the CSV contents. Later
+loads memory-map that file instead. When the CSV changes its hash changes,
+so the cache is rebuilt automatically and the stale file is removed.
+
+pyarrow is optional: without it every load falls back to parsing the CSV.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from order_reader import DEFAULT_EXPORT, ORDER_COLUMNS, load_orders
+from pipeline_profile import enable_from_argv, profiled, stage
+
+DEFAULT_CACHE_DIR = '.order_cache'
+CACHE_VERSION = 1  # bump when the typed table layout changes
+HASH_BLOCK_SIZE = 1 << 20
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_digest(path):
+    """BLAKE2b digest of the file contents, read in 1 MiB blocks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(cache_dir / MANIFEST_NAME) as handle:
+            return json.load(handle)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_manifest(cache_dir, manifest):
+    tmp_path = cache_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(tmp_path, cache_dir / MANIFEST_NAME)
+
+
+@profiled('hash_source')
+def source_digest(path, cache_dir):
+    """Content hash of `path`, reusing the last hash if size and mtime are unchanged
+
+    Hashing a multi-GB export takes seconds, so the manifest remembers the
+    digest together with the file's size and mtime.
+    """
+    stat = os.stat(path)
+    key = str(Path(path).resolve())
+    entry = _read_manifest(cache_dir).get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['digest']
+    return file_digest(path)
+
+
+def cache_path(path, digest, columns, cache_dir):
+    """Cache file for a source digest and column selection"""
+    key = hashlib.blake2b(
+        json.dumps([CACHE_VERSION, digest, list(columns)]).encode(), digest_size=8
+    ).hexdigest()
+    return Path(cache_dir) / f"{Path(path).stem}-{key}.arrow"
+
+
+def cached_load_orders(path, columns=ORDER_COLUMNS, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    """Load the typed order table, from the columnar cache when it is current"""
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return load_orders(path, columns=columns)
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    digest = source_digest(path, cache_dir)
+    target = cache_path(path, digest, columns, cache_dir)
+
+    if target.exists() and not refresh:
+        with stage('cache_read') as timed:
+            df = feather.read_table(target, memory_map=True).to_pandas()
+            timed.rows = len(df)
+        return df
+
+    df = load_orders(path, columns=columns)
+    with stage('cache_write', rows=len(df)):
+        tmp_target = target.with_suffix('.tmp')
+        feather.write_feather(df, tmp_target, compression='uncompressed')
+        os.replace(tmp_target, target)
+
+    key = str(Path(path).resolve())
+    manifest = _read_manifest(cache_dir)
+    previous = manifest.get(key, {})
+    if previous.get('digest') == digest:
+        files = set(previous.get('files', []))
+    else:
+        # Source changed: drop tables built from the old contents
+        for stale in previous.get('files', []):
+            (cache_dir / stale).unlink(missing_ok=True)
+        files = set()
+    stat = os.stat(path)
+    manifest[key] = {
+        'digest': digest,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'files': sorted(files | {target.name}),
+    }
+    _write_manifest(cache_dir, manifest)
+    return df
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Build or refresh the columnar cache for an order export')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--refresh', action='store_true', help='rebuild even if the cache is current')
+    args = parser.parse_args()
+
+    for attempt in ['first load', 'second load']:
+        start = time.perf_counter()
+        df = cached_load_orders(args.path, cache_dir=args.cache_dir, refresh=args.refresh and attempt == 'first load')
+        print(f"{attempt.capitalize()}: {len(df)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
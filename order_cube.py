@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated location x day x status order cube.
+
+One pass over an export (or a woo_orders dump) fills two int64 arrays
+shaped (location, day, status): amount in cents and order count. Fee
+components follow from those exactly (see money.summarize_totals), so
+every getDashboardSummary() figure can be rolled up from the cube. Both
+arrays are kept as prefix sums along the day axis, so any date range
+(month, quarter, year, custom) over any subset of locations and statuses
+is two slices and a subtraction instead of a rescan.
+"""
+
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from money import REFUND_STATUSES, SALE_STATUSES, format_cents, summarize_totals, to_cents
+from order_diff import location_names
+from order_reader import DEFAULT_EXPORT, load_orders
+from pipeline_profile import enable_from_argv, profiled
+
+UNKNOWN_LOCATION = 'Unknown Location'
+
+PLATFORM_CUBE_QUERY = """
+    SELECT l.name AS location, wo.order_date, wo.amount, wo.status
+    FROM woo_orders wo
+    LEFT JOIN locations l ON l.id = wo.location_id
+"""
+
+
+class OrderCube:
+    """Per (location, day, status) cents and order counts with prefix-sum rollups"""
+
+    def __init__(self, locations, start_day, statuses, cents, orders):
+        self.locations = pd.Index(locations, name='Location')
+        self.start_day = np.datetime64(start_day, 'D')
+        self.statuses = list(statuses)
+        self.cents = np.asarray(cents, dtype='int64')
+        self.orders = np.asarray(orders, dtype='int64')
+        self.days = self.cents.shape[1]
+        # prefix[:, d] = totals of days [0, d); shape (L, D + 1, S)
+        zeros = np.zeros((len(self.locations), 1, len(self.statuses)), dtype='int64')
+        self.cents_prefix = np.concatenate([zeros, self.cents.cumsum(axis=1)], axis=1)
+        self.orders_prefix = np.concatenate([zeros, self.orders.cumsum(axis=1)], axis=1)
+        self.location_rows = {location: row for row, location in enumerate(self.locations)}
+        self.sale_mask = self._status_mask(SALE_STATUSES)
+        self.refund_mask = self._status_mask(REFUND_STATUSES)
+
+    @classmethod
+    @profiled('build_cube')
+    def from_orders(cls, days, locations, statuses, cents):
+        """Build the cube from aligned per-order arrays in a single bincount pass
+
+        `days` are datetimes (orders without one are skipped), `statuses`
+        are matched case-insensitively against the platform's lowercase
+        statuses, `cents` are int64 amounts.
+        """
+        days = pd.to_datetime(pd.Series(days)).dt.normalize().to_numpy().astype('datetime64[D]')
+        valid = ~np.isnat(days)
+        days = days[valid]
+        location_codes, location_names = pd.factorize(
+            pd.Series(locations).astype(object).fillna(UNKNOWN_LOCATION).to_numpy()[valid], sort=True)
+        status_codes, status_names = pd.factorize(
+            pd.Series(statuses).astype('string').str.lower().fillna('').to_numpy(dtype=object)[valid], sort=True)
+        cents = np.asarray(cents, dtype='int64')[valid]
+
+        start_day = days.min() if len(days) else np.datetime64('1970-01-01')
+        day_codes = (days - start_day).astype('int64')
+        shape = (len(location_names), int(day_codes.max()) + 1 if len(days) else 0, len(status_names))
+        flat = np.ravel_multi_index((location_codes, day_codes, status_codes), shape) if len(days) else day_codes
+        size = int(np.prod(shape))
+        cube_cents = np.bincount(flat, weights=cents, minlength=size)
+        # bincount weights are float64: exact for integer sums below 2**53 cents
+        cube_cents = np.rint(cube_cents).astype('int64').reshape(shape)
+        cube_orders = np.bincount(flat, minlength=size).astype('int64').reshape(shape)
+        return cls(list(location_names), start_day, list(status_names), cube_cents, cube_orders)
+
+    @classmethod
+    def from_export(cls, path):
+        """Cube of an export's orders, dated by Paid Date
+
+        Negative refund rows are skipped: the refunded parent row already
+        carries the order, as on the platform.
+        """
+        df = load_orders(path, columns=['Paid Date', 'Status', 'Location', 'Total Amount'])
+        orders = df[df['Total Amount'] >= 0]
+        return cls.from_orders(orders['Paid Date'], orders['Location'], orders['Status'],
+                               to_cents(orders['Total Amount']))
+
+    @classmethod
+    def from_platform(cls, source, locations_dump=None):
+        """Cube of woo_orders rows from a CSV dump or a SQLite database, dated by order_date
+
+        The cube is keyed by location name: a CSV dump with only location_id
+        needs `locations_dump` (id, name) to name them, else ValueError.
+        """
+        if source.startswith('sqlite:///') or source.endswith(('.db', '.sqlite', '.sqlite3')):
+            with sqlite3.connect(source.removeprefix('sqlite:///')) as connection:
+                df = pd.read_sql_query(PLATFORM_CUBE_QUERY, connection)
+        else:
+            df = pd.read_csv(source)
+            if 'location' not in df:
+                if not locations_dump:
+                    raise ValueError(f"{source} has no location names; pass the locations dump to resolve "
+                                     f"its location_id")
+                df['location'] = pd.to_numeric(df['location_id'], errors='coerce').map(location_names(locations_dump))
+        return cls.from_orders(pd.to_datetime(df['order_date'], errors='coerce'), df['location'],
+                               df['status'], to_cents(df['amount']))
+
+    def save(self, path):
+        """Store the cube as a compressed .npz (no pickled objects)"""
+        np.savez_compressed(
+            path,
+            locations=self.locations.to_numpy(dtype=str),
+            start_day=np.array(str(self.start_day)),
+            statuses=np.array(self.statuses, dtype=str),
+            cents=self.cents,
+            orders=self.orders,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['locations'].tolist(), str(data['start_day']), data['statuses'].tolist(),
+                       data['cents'], data['orders'])
+
+    def day_range(self, start=None, end=None):
+        """Day offsets [first, last + 1) for an inclusive date range, clipped to the cube"""
+        first = 0 if start is None else int((np.datetime64(start, 'D') - self.start_day).astype('int64'))
+        stop = self.days if end is None else int((np.datetime64(end, 'D') - self.start_day).astype('int64')) + 1
+        first = min(max(first, 0), self.days)
+        return first, min(max(stop, first), self.days)
+
+    def totals(self, start=None, end=None, locations=None):
+        """Cents and order counts per status over a date range and location subset"""
+        first, stop = self.day_range(start, end)
+        if locations is None:
+            cents = self.cents_prefix[:, stop].sum(axis=0) - self.cents_prefix[:, first].sum(axis=0)
+            orders = self.orders_prefix[:, stop].sum(axis=0) - self.orders_prefix[:, first].sum(axis=0)
+        else:
+            rows = [self.location_rows[location] for location in locations if location in self.location_rows]
+            cents = (self.cents_prefix[rows, stop] - self.cents_prefix[rows, first]).sum(axis=0)
+            orders = (self.orders_prefix[rows, stop] - self.orders_prefix[rows, first]).sum(axis=0)
+        return cents, orders
+
+    def _status_mask(self, names):
+        return np.array([status in names for status in self.statuses], dtype=bool)
+
+    def summary(self, start=None, end=None, locations=None, statuses=None):
+        """getDashboardSummary() figures (integer cents) for a date range and location subset
+
+        `statuses` restricts which orders are included at all, like the
+        dashboard's status filter; by default every order counts.
+        """
+        cents, orders = self.totals(start, end, locations)
+        if statuses is not None:
+            keep = self._status_mask({status.lower() for status in statuses})
+            cents, orders = np.where(keep, cents, 0), np.where(keep, orders, 0)
+        figures = summarize_totals(cents[self.sale_mask].sum(), orders[self.sale_mask].sum(),
+                                   cents[self.refund_mask].sum(), cents.sum(), orders.sum())
+        return {name: int(value) for name, value in figures.items()}
+
+    def month(self, month, locations=None, statuses=None):
+        """Summary for a 'YYYY-MM' month"""
+        period = pd.Period(month, freq='M')
+        return self.summary(period.start_time.date(), period.end_time.date(), locations, statuses)
+
+    def quarter(self, quarter, locations=None, statuses=None):
+        """Summary for a '2025Q2' style quarter"""
+        period = pd.Period(quarter, freq='Q')
+        return self.summary(period.start_time.date(), period.end_time.date(), locations, statuses)
+
+    def year(self, year, locations=None, statuses=None):
+        return self.summary(f"{year}-01-01", f"{year}-12-31", locations, statuses)
+
+    def breakdown(self, freq='M', locations=None, statuses=None):
+        """Summary per period (like getMonthlyBreakdown) as a DataFrame in cents"""
+        first = pd.Timestamp(self.start_day)
+        last = first + pd.Timedelta(days=max(self.days - 1, 0))
+        periods = pd.period_range(first, last, freq=freq)
+        rows = {str(period): self.summary(period.start_time.date(), period.end_time.date(), locations, statuses)
+                for period in periods}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def by_location(self, start=None, end=None, statuses=None):
+        """Summary per location for a date range as a DataFrame in cents"""
+        return pd.DataFrame.from_dict(
+            {location: self.summary(start, end, [location], statuses) for location in self.locations},
+            orient='index')
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Build a location x day x status cube and print rollups')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT,
+                        help='WooCommerce order export (CSV), or a .npz cube saved with --save')
+    parser.add_argument('--platform', help='build from a woo_orders CSV dump or SQLite file instead')
+    parser.add_argument('--locations', help='locations CSV (id, name) for a --platform dump with only location_id')
+    parser.add_argument('--save', help='write the cube to this .npz file')
+    parser.add_argument('--freq', default='M', help="rollup period: D, W, M, Q or Y (default: M)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.platform:
+        cube = OrderCube.from_platform(args.platform, args.locations)
+    elif args.path.endswith('.npz'):
+        cube = OrderCube.load(args.path)
+    else:
+        cube = OrderCube.from_export(args.path)
+    built = time.perf_counter() - start
+    if args.save:
+        cube.save(args.save)
+
+    print(f"=== ORDER CUBE: {len(cube.locations)} locations x {cube.days} days x {len(cube.statuses)} statuses ===")
+    print(f"Built in {built * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    overall = cube.summary()
+    print(f"Full rollup in {(time.perf_counter() - start) * 1e6:.0f} µs\n")
+
+    money_columns = ['totalSales', 'totalRefunds', 'platformFees', 'stripeFees', 'netDeposit']
+    breakdown = cube.breakdown(args.freq)
+    breakdown[money_columns] = breakdown[money_columns].map(format_cents)
+    print(breakdown.to_string())
+    print()
+    by_location = cube.by_location()
+    by_location[money_columns] = by_location[money_columns].map(format_cents)
+    print(by_location.to_string())
+    print(f"\nTOTAL Net Deposit: {format_cents(overall['netDeposit'])} ({overall['totalOrders']} orders)")
+
+
+if __name__ == "__main__":
+    main()
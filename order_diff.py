@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Order-level diff between a CSV export and the platform's woo_orders rows.
+
+Both sides are reduced to sorted int64 order-ID arrays with aligned
+location and amount-in-cents arrays. A single vectorized merge-join
+(np.searchsorted over the sorted platform IDs) then yields the orders
+missing from the CSV, the extra CSV orders and the orders whose amount or
+location disagree, for every location at once.
+
+Platform rows can come from a CSV dump of woo_orders (optionally joined
+with locations), a SQLite database or Postgres (psycopg2 required). A
+dump that only has location_id is given names from a locations dump; if
+there is none, locations are not compared. Both sides' location names are
+canonicalized (location_normalization) before they are compared.
+"""
+
+import argparse
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import canonicalize_locations
+from money import to_cents
+from order_folding import fold_orders
+from order_reader import DEFAULT_EXPORT, load_orders
+from pipeline_profile import enable_from_argv, profiled
+
+PLATFORM_QUERY = """
+    SELECT wo.order_id, l.name AS location, wo.amount, wo.status
+    FROM woo_orders wo
+    LEFT JOIN locations l ON l.id = wo.location_id
+"""
+
+
+@profiled()
+def build_index(order_ids, locations, amounts):
+    """Sorted order-ID index with aligned location and cents arrays
+
+    Non-numeric IDs are dropped and duplicate IDs keep their first row.
+    Location names are canonicalized; `locations` may be None when they
+    are unknown. Returns a dict of NumPy arrays plus the number of dropped
+    duplicates and whether there are locations to compare.
+    """
+    ids = pd.to_numeric(pd.Series(order_ids), errors='coerce')
+    valid = ids.notna().to_numpy()
+    ids = ids.to_numpy()[valid].astype('int64')
+    if locations is None:
+        locations = [None] * len(valid)
+    locations = canonicalize_locations(pd.Series(locations, dtype=object)).astype(object).to_numpy()[valid]
+    cents = to_cents(amounts)[valid]
+
+    order = np.argsort(ids, kind='stable')
+    ids, locations, cents = ids[order], locations[order], cents[order]
+
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = ids[1:] != ids[:-1]
+    return {
+        'order_id': ids[first],
+        'location': locations[first],
+        'cents': cents[first],
+        'duplicates': int((~first).sum()),
+        'has_locations': bool(pd.notna(locations).any()),
+    }
+
+
+def csv_index(df):
+    """Index one canonical record per order from an export
+
+    Refund rows are folded into their order first (order_folding), so each
+    order is compared with its gross amount.
+    """
+    orders = fold_orders(df)
+    return build_index(orders.index, orders['Location'], orders['gross_cents'] / 100)
+
+
+def platform_index(df):
+    """Index woo_orders rows (order_id, location, amount; location may be missing)"""
+    return build_index(df['order_id'], df['location'] if 'location' in df else None, df['amount'])
+
+
+def location_names(locations_dump):
+    """{location id: name} from a locations CSV dump"""
+    locations = pd.read_csv(locations_dump, usecols=['id', 'name'])
+    return dict(zip(locations['id'].astype('int64'), locations['name']))
+
+
+@profiled()
+def load_platform_orders(source, locations_dump=None):
+    """Load woo_orders rows from a CSV dump, a SQLite file or a Postgres URL
+
+    A CSV dump without a location column gets names for its location_id
+    from `locations_dump` (id, name); without one its orders have no
+    location.
+    """
+    if source.startswith(('postgres://', 'postgresql://')):
+        import psycopg2
+
+        with psycopg2.connect(source) as connection:
+            return pd.read_sql_query(PLATFORM_QUERY, connection)
+
+    if source.startswith('sqlite:///') or source.endswith(('.db', '.sqlite', '.sqlite3')):
+        path = source.removeprefix('sqlite:///')
+        with sqlite3.connect(path) as connection:
+            return pd.read_sql_query(PLATFORM_QUERY, connection)
+
+    df = pd.read_csv(source, dtype={'order_id': 'string'})
+    if 'location' not in df and 'location_id' in df and locations_dump:
+        df['location'] = pd.to_numeric(df['location_id'], errors='coerce').map(location_names(locations_dump))
+    return df
+
+
+@profiled()
+def diff_orders(csv_idx, platform_idx):
+    """Merge-join two sorted indexes and return missing/extra/mismatched orders
+
+    Returns a dict of DataFrames: 'missing' (on the platform but not in the
+    CSV), 'extra' (in the CSV but not on the platform), 'amount_mismatch'
+    and 'location_mismatch' (both sides present but disagreeing). Locations
+    are only compared when both indexes have them.
+    """
+    csv_ids = csv_idx['order_id']
+    platform_ids = platform_idx['order_id']
+
+    positions = np.searchsorted(platform_ids, csv_ids)
+    in_bounds = positions < len(platform_ids)
+    matched = np.zeros(len(csv_ids), dtype=bool)
+    matched[in_bounds] = platform_ids[positions[in_bounds]] == csv_ids[in_bounds]
+
+    platform_matched = np.zeros(len(platform_ids), dtype=bool)
+    platform_matched[positions[matched]] = True
+
+    csv_pos = np.flatnonzero(matched)
+    platform_pos = positions[matched]
+    amount_differs = csv_idx['cents'][csv_pos] != platform_idx['cents'][platform_pos]
+    csv_locations = csv_idx['location'][csv_pos]
+    platform_locations = platform_idx['location'][platform_pos]
+    location_differs = (csv_locations != platform_locations) & ~(pd.isna(csv_locations) & pd.isna(platform_locations))
+    if not (csv_idx['has_locations'] and platform_idx['has_locations']):
+        location_differs[:] = False
+
+    def _frame(idx, rows, prefix=None):
+        return pd.DataFrame({
+            'order_id': idx['order_id'][rows],
+            f'{prefix}location' if prefix else 'location': idx['location'][rows],
+            f'{prefix}cents' if prefix else 'cents': idx['cents'][rows],
+        })
+
+    def _pairs(mask):
+        frame = _frame(csv_idx, csv_pos[mask], 'csv_')
+        platform = _frame(platform_idx, platform_pos[mask], 'platform_')
+        return pd.concat([frame, platform.drop(columns='order_id')], axis=1)
+
+    return {
+        'missing': _frame(platform_idx, ~platform_matched),
+        'extra': _frame(csv_idx, ~matched),
+        'amount_mismatch': _pairs(amount_differs),
+        'location_mismatch': _pairs(location_differs),
+    }
+
+
+def summarize_diff(diff):
+    """Per-location counts of each kind of difference"""
+    counts = {
+        'missing_in_csv': diff['missing'].groupby('location', dropna=False).size(),
+        'extra_in_csv': diff['extra'].groupby('location', dropna=False).size(),
+        'amount_mismatch': diff['amount_mismatch'].groupby('csv_location', dropna=False).size(),
+        'location_mismatch': diff['location_mismatch'].groupby('csv_location', dropna=False).size(),
+    }
+    return pd.DataFrame(counts).fillna(0).astype('int64')
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Diff CSV export orders against platform woo_orders rows')
+    parser.add_argument('platform', help='woo_orders CSV dump, SQLite file (sqlite:///path) or Postgres URL')
+    parser.add_argument('--csv', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    parser.add_argument('--locations', help='locations CSV (id, name) for a woo_orders dump with only location_id')
+    parser.add_argument('--show', type=int, default=20, help='order IDs to list per category')
+    args = parser.parse_args()
+
+    csv_idx = csv_index(load_orders(args.csv))
+    platform_idx = platform_index(load_platform_orders(args.platform, args.locations))
+    diff = diff_orders(csv_idx, platform_idx)
+
+    print("=== ORDER ID DIFF ===")
+    print(f"CSV orders: {len(csv_idx['order_id'])} (duplicates dropped: {csv_idx['duplicates']})")
+    print(f"Platform orders: {len(platform_idx['order_id'])} (duplicates dropped: {platform_idx['duplicates']})")
+    if not platform_idx['has_locations']:
+        print("Platform rows have no location names: locations not compared (see --locations)")
+    print()
+    print(summarize_diff(diff).to_string())
+
+    for name, label in [('missing', 'Orders in platform but NOT in CSV'),
+                        ('extra', 'Orders in CSV but NOT in platform'),
+                        ('amount_mismatch', 'Orders with different amounts'),
+                        ('location_mismatch', 'Orders with different locations')]:
+        frame = diff[name]
+        print(f"\n{label}: {len(frame)}")
+        if len(frame):
+            print(frame.head(args.show).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Fold WooCommerce export rows into one canonical record per order.
+
+A refunded order appears as its original row (positive Total Amount,
+Refund Amount set, Total (- Refund) reduced) plus one negative row per
+refund. Pre-cleaned exports drop the original row and keep only the
+negative ones, and re-exports can repeat rows verbatim. fold_orders()
+removes exact duplicate parent rows by row hash, groups the rest by Order
+ID in a single hashed (unsorted) groupby and emits gross, refund and net
+cents per order:
+
+    gross   the original row's Total Amount (for an order that only has
+            refund rows, the refunded amount)
+    refund  the larger of the original row's Refund Amount and the sum of
+            the negative refund rows (they describe the same refunds)
+    net     gross - refund
+
+Partial refunds simply leave a positive net. Negative refund rows are
+never deduplicated: two equal partial refunds on one order look the same
+in the loaded columns (same Order ID, no Paid Date, same amount) but are
+both real. Exports can be folded chunk by chunk: partial folds combine
+with the same aggregation.
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from money import format_cents, to_cents
+from order_reader import DEFAULT_CHUNKSIZE, DEFAULT_EXPORT, iter_order_chunks
+from pipeline_profile import enable_from_argv, profiled
+
+# Export columns a fold reads (Paid Date is optional: without it orders get NaT)
+FOLD_COLUMNS = ['Order ID', 'Paid Date', 'Status', 'Location', 'Total Amount', 'Refund Amount']
+COMPACT_CHUNKS = 8  # OrderFolder merges its pending partial folds this often
+FOLDED_COLUMNS = ['Paid Date', 'Status', 'Location', 'gross_cents', 'refund_cents', 'net_cents', 'rows']
+
+# Partial folds combine with the same aggregation, so chunked and
+# whole-file folds give identical results.
+_PARTIAL_AGGREGATION = {
+    'Paid Date': 'first',
+    'Location': 'first',
+    'parent_status': 'first',
+    'row_status': 'first',
+    'parent_cents': 'max',
+    'stated_refund_cents': 'max',
+    'refund_row_cents': 'sum',
+    'parent_rows': 'sum',
+    'refund_rows': 'sum',
+}
+
+
+def row_hashes(df):
+    """64-bit hash per row over every column (index ignored)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _parent_mask(df):
+    """Rows with a non-negative Total Amount (the original order rows)"""
+    return (to_cents(df['Total Amount']) >= 0) & df['Total Amount'].notna().to_numpy()
+
+
+def _duplicate_parents(df):
+    """Parent rows repeating an earlier parent row of `df` (refund rows are never duplicates)"""
+    is_parent = _parent_mask(df)
+    duplicated = np.zeros(len(df), dtype=bool)
+    duplicated[is_parent] = pd.Series(row_hashes(df[is_parent])).duplicated().to_numpy()
+    return duplicated
+
+
+class _SeenHashes:
+    """Sorted runs of row hashes, merged when a run is no longer than the next one
+
+    Run sizes at least double going back, so there are O(log N) runs to
+    search and every hash is merged O(log N) times: streaming N rows costs
+    O(N log N) instead of re-sorting everything per chunk.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            found |= run[positions] == hashes
+        return found
+
+    def add(self, hashes):
+        """Add hashes that are not in the set yet (and unique among themselves)"""
+        if not len(hashes):
+            return
+        self.runs.append(np.sort(hashes))
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            # Two sorted runs: the stable (run-merging) sort is linear here
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind='stable')
+
+
+def _require_fold_columns(df):
+    missing = [column for column in FOLD_COLUMNS if column != 'Paid Date' and column not in df]
+    if missing:
+        raise ValueError(f"Folding orders needs the {', '.join(missing)} column(s); "
+                         f"load the export with order_folding.FOLD_COLUMNS")
+
+
+def _partial_fold(df):
+    total = to_cents(df['Total Amount'])
+    is_parent = _parent_mask(df)
+    status = df['Status'].astype(object)
+    frame = pd.DataFrame({
+        'Order ID': df['Order ID'].to_numpy(dtype='int64'),
+        'Paid Date': df['Paid Date'].to_numpy() if 'Paid Date' in df else pd.NaT,
+        'Location': df['Location'].astype(object).to_numpy(),
+        'parent_status': status.where(is_parent).to_numpy(),
+        'row_status': status.to_numpy(),
+        'parent_cents': np.where(is_parent, total, 0),
+        'stated_refund_cents': np.where(is_parent, to_cents(df['Refund Amount']), 0),
+        'refund_row_cents': np.where(is_parent, 0, -total),
+        'parent_rows': is_parent.astype('int64'),
+        'refund_rows': (~is_parent).astype('int64'),
+    })
+    return frame.groupby('Order ID', sort=False).agg(_PARTIAL_AGGREGATION)
+
+
+def _finish(partial):
+    has_parent = partial['parent_rows'].to_numpy() > 0
+    gross = np.where(has_parent, partial['parent_cents'], partial['refund_row_cents'])
+    refund = np.maximum(partial['stated_refund_cents'], partial['refund_row_cents'])
+    folded = pd.DataFrame({
+        'Paid Date': partial['Paid Date'],
+        'Status': pd.Categorical(partial['parent_status'].fillna(partial['row_status'])),
+        'Location': pd.Categorical(partial['Location']),
+        'gross_cents': gross.astype('int64'),
+        'refund_cents': refund.astype('int64'),
+        'net_cents': (gross - refund).astype('int64'),
+        'rows': (partial['parent_rows'] + partial['refund_rows']).astype('int64'),
+    }, index=partial.index)
+    return folded[FOLDED_COLUMNS]
+
+
+@profiled()
+def fold_orders(df):
+    """One canonical record per Order ID (see the module docstring)
+
+    Rows without an Order ID are dropped, as are exact duplicate parent
+    rows (refund rows are all kept).
+    Returns a DataFrame indexed by Order ID, in first-seen order, with
+    FOLDED_COLUMNS. Raises ValueError when `df` lacks one of the
+    FOLD_COLUMNS it needs.
+    """
+    _require_fold_columns(df)
+    df = df[df['Order ID'].notna()]
+    df = df[~_duplicate_parents(df)]
+    return _finish(_partial_fold(df))
+
+
+def _combine(partials):
+    combined = pd.concat(partials)
+    if len(partials) > 1:
+        combined = combined.groupby(level=0, sort=False).agg(_PARTIAL_AGGREGATION)
+    return combined
+
+
+class OrderFolder:
+    """fold_orders() fed one chunk at a time
+
+    Duplicate parent rows are detected across chunks, and the per-order
+    partial folds are merged every COMPACT_CHUNKS chunks, so memory is
+    bounded by the chunk, one partial record per order and one 8-byte hash
+    per parent row.
+    """
+
+    def __init__(self):
+        self.seen = _SeenHashes()
+        self.partials = []
+        self.duplicates = 0
+
+    def update(self, chunk):
+        _require_fold_columns(chunk)
+        chunk = chunk[chunk['Order ID'].notna()]
+        is_parent = _parent_mask(chunk)
+        hashes = row_hashes(chunk[is_parent])
+        duplicated = pd.Series(hashes).duplicated().to_numpy() | self.seen.contains(hashes)
+        self.seen.add(hashes[~duplicated])
+        keep = np.ones(len(chunk), dtype=bool)
+        keep[is_parent] = ~duplicated
+        self.duplicates += int(duplicated.sum())
+        self.partials.append(_partial_fold(chunk[keep]))
+        if len(self.partials) >= COMPACT_CHUNKS:
+            self.partials = [_combine(self.partials)]
+
+    def finish(self):
+        """The folded orders so far, as fold_orders() returns them"""
+        if not self.partials:
+            return _finish(_partial_fold(pd.DataFrame(columns=FOLD_COLUMNS)))
+        return _finish(_combine(self.partials))
+
+
+@profiled()
+def fold_export(path, chunksize=DEFAULT_CHUNKSIZE):
+    """fold_orders() over an export read in chunks; returns (folded, duplicate rows dropped)"""
+    folder = OrderFolder()
+    for chunk in iter_order_chunks(path, chunksize=chunksize):
+        folder.update(chunk)
+    return folder.finish(), folder.duplicates
+
+
+# Order 1 was partially refunded twice by the same amount; order 2 is the
+# same in a pre-cleaned export (refund rows only); order 3's row is repeated.
+CHECK_ROWS = [
+    (1, 'May 1, 2025 10:00 AM', 'Processing', '1947 Street Rd, Bensalem, PA', 30.00, 10.00, 20.00),
+    (1, None, 'Processing', '1947 Street Rd, Bensalem, PA', -5.00, 0.00, -5.00),
+    (1, None, 'Processing', '1947 Street Rd, Bensalem, PA', -5.00, 0.00, -5.00),
+    (2, None, 'Refunded', '1947 Street Rd, Bensalem, PA', -5.00, 0.00, -5.00),
+    (2, None, 'Refunded', '1947 Street Rd, Bensalem, PA', -5.00, 0.00, -5.00),
+    (3, 'May 2, 2025 11:00 AM', 'Processing', '1947 Street Rd, Bensalem, PA', 12.00, 0.00, 12.00),
+    (3, 'May 2, 2025 11:00 AM', 'Processing', '1947 Street Rd, Bensalem, PA', 12.00, 0.00, 12.00),
+]
+CHECK_EXPECTED = {  # Order ID: (gross, refund, net) cents
+    1: (3000, 1000, 2000),
+    2: (1000, 1000, 0),
+    3: (1200, 0, 1200),
+}
+
+
+def check_folding():
+    """Fold CHECK_ROWS whole and one row per chunk; returns a list of mismatches"""
+    columns = ['Order ID', 'Paid Date', 'Status', 'Location', 'Total Amount', 'Refund Amount', 'Total (- Refund)']
+    rows = pd.DataFrame(CHECK_ROWS, columns=columns)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'check.csv')
+        rows.to_csv(path, index=False)
+        folds = {
+            'fold_orders': fold_orders(next(iter_order_chunks(path))),
+            'fold_export': fold_export(path, chunksize=1)[0],
+        }
+    problems = []
+    for name, folded in folds.items():
+        for order_id, expected in CHECK_EXPECTED.items():
+            actual = tuple(int(folded.loc[order_id, column]) for column in ('gross_cents', 'refund_cents', 'net_cents'))
+            if actual != expected:
+                problems.append(f"{name}: order {order_id} folded to {actual}, expected {expected}")
+    return problems
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Fold refund rows into one record per order')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='rows per chunk')
+    parser.add_argument('--output', help='write the folded orders to this CSV')
+    parser.add_argument('--check', action='store_true',
+                        help='fold a small built-in export (equal partial refunds, repeated rows) and verify it')
+    args = parser.parse_args()
+
+    if args.check:
+        problems = check_folding()
+        for problem in problems:
+            print(problem)
+        parser.exit(1 if problems else 0, "" if problems else "Folding check passed\n")
+
+    folded, duplicates = fold_export(args.path, chunksize=args.chunksize)
+
+    print(f"=== FOLDED ORDERS: {args.path} ===")
+    print(f"Orders: {len(folded)} (duplicate rows dropped: {duplicates})")
+    print(f"Refunded orders: {int((folded['refund_cents'] > 0).sum())}")
+    print(f"Partially refunded: {int(((folded['refund_cents'] > 0) & (folded['net_cents'] > 0)).sum())}")
+    print(f"Gross:  {format_cents(folded['gross_cents'].sum())}")
+    print(f"Refund: {format_cents(folded['refund_cents'].sum())}")
+    print(f"Net:    {format_cents(folded['net_cents'].sum())}")
+    print()
+    by_status = folded.groupby('Status', observed=True)[['gross_cents', 'refund_cents', 'net_cents']].sum()
+    print(by_status.map(format_cents).to_string())
+
+    if args.output:
+        folded.to_csv(args.output)
+        print(f"\nFolded orders written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
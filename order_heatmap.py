@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Hour-of-day x weekday x location order heatmaps in store-local time.
+
+Paid Date (like woo_orders.order_date) is the WooCommerce site's wall
+clock, US Eastern, with no offset attached; the platform's "timezone
+fix" in the monthly breakdown works around exactly that. Here every
+order is localized to the site timezone once and converted to the
+timezone of its store (from the state in the location name), so an order
+paid at 12:30 AM lands on the right local day, month and hour.
+
+Bucketing is one bincount over (location, weekday, hour) codes, so a
+full year of orders across every store is counted in well under a
+second once the dates are parsed (see order_reader.parse_paid_date_values).
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import canonicalize_locations
+from money import format_cents, to_cents
+from order_reader import DEFAULT_EXPORT, load_orders
+from pipeline_profile import enable_from_argv, profiled
+
+SITE_TIMEZONE = 'America/New_York'
+UNKNOWN_LOCATION = 'Unknown Location'
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HOURS = 24
+
+STATE_PATTERN = re.compile(r'\b([A-Z]{2})\s*$')
+STATE_TIMEZONES = {
+    **dict.fromkeys(['CT', 'DE', 'FL', 'GA', 'MA', 'MD', 'ME', 'MI', 'NC', 'NH', 'NJ', 'NY', 'OH', 'PA',
+                     'RI', 'SC', 'VA', 'VT', 'WV'], 'America/New_York'),
+    **dict.fromkeys(['AL', 'AR', 'IA', 'IL', 'LA', 'MN', 'MO', 'MS', 'OK', 'TX', 'WI'], 'America/Chicago'),
+    **dict.fromkeys(['CO', 'MT', 'NM', 'UT', 'WY'], 'America/Denver'),
+    'AZ': 'America/Phoenix',
+    **dict.fromkeys(['CA', 'NV', 'OR', 'WA'], 'America/Los_Angeles'),
+    'AK': 'America/Anchorage',
+    'HI': 'Pacific/Honolulu',
+}
+
+
+def location_timezone(location, default=SITE_TIMEZONE):
+    """Timezone of a store from the state at the end of its raw name (else `default`)"""
+    match = STATE_PATTERN.search(location or '')
+    return STATE_TIMEZONES.get(match.group(1), default) if match else default
+
+
+@profiled()
+def local_times(paid_dates, locations, site_timezone=SITE_TIMEZONE):
+    """Store-local wall-clock times of site-time Paid Dates, as naive datetime64
+
+    Each distinct timezone is converted once over its rows. Times that do
+    not exist in the site timezone (the spring-forward hour) are shifted
+    forward; repeated fall-back times are taken as standard time.
+    """
+    paid = pd.DatetimeIndex(pd.to_datetime(pd.Series(paid_dates).to_numpy()))
+    raw = pd.Categorical(locations)
+    zones = pd.Index([location_timezone(name, site_timezone) for name in raw.categories] + [site_timezone])
+    zone_codes, zone_names = pd.factorize(zones.to_numpy()[raw.codes])  # code -1 is the site timezone
+
+    result = paid.to_numpy().copy()
+    for code, zone in enumerate(zone_names):
+        if zone == site_timezone:
+            continue
+        rows = zone_codes == code
+        site = paid[rows].tz_localize(site_timezone, ambiguous=np.zeros(int(rows.sum()), dtype=bool),
+                                      nonexistent='shift_forward')
+        result[rows] = site.tz_convert(zone).tz_localize(None).to_numpy()
+    return result
+
+
+class SalesHeatmap:
+    """Orders and cents per (location, weekday, hour) in store-local time"""
+
+    def __init__(self, locations, orders, cents, weekday_days):
+        self.locations = pd.Index(locations, name='Location')
+        self.orders = np.asarray(orders, dtype='int64')            # (L, 7, 24)
+        self.cents = np.asarray(cents, dtype='int64')              # (L, 7, 24)
+        self.weekday_days = np.asarray(weekday_days, dtype='int64')  # (L, 7) local days seen per weekday
+
+    @classmethod
+    @profiled('build_heatmap')
+    def from_orders(cls, paid_dates, locations, cents, site_timezone=SITE_TIMEZONE):
+        """Bucket aligned per-order arrays (orders without a date are skipped)"""
+        local = local_times(paid_dates, locations, site_timezone)
+        valid = ~np.isnat(local)
+        local = local[valid]
+        names = canonicalize_locations(pd.Categorical(locations)[valid])
+        location_codes, location_names = pd.factorize(names.astype(object).fillna(UNKNOWN_LOCATION), sort=True)
+        cents = np.asarray(cents, dtype='int64')[valid]
+
+        days = local.astype('datetime64[D]').astype('int64')
+        weekdays = (days + 3) % 7  # 1970-01-01 was a Thursday
+        hours = local.astype('datetime64[h]').astype('int64') % HOURS
+        shape = (len(location_names), len(WEEKDAYS), HOURS)
+        flat = np.ravel_multi_index((location_codes, weekdays, hours), shape)
+        size = int(np.prod(shape))
+        orders = np.bincount(flat, minlength=size).reshape(shape)
+        # bincount weights are float64: exact for integer sums below 2**53 cents
+        sums = np.rint(np.bincount(flat, weights=cents, minlength=size)).astype('int64').reshape(shape)
+
+        # Distinct local days per (location, weekday), for per-day averages
+        first_day = days.min() if len(days) else 0
+        span = int(days.max() - first_day) + 1 if len(days) else 1
+        seen = np.zeros((shape[0], span), dtype=bool)
+        seen[location_codes, days - first_day] = True
+        span_weekdays = (np.arange(span) + first_day + 3) % 7
+        weekday_days = np.stack([seen[:, span_weekdays == weekday].sum(axis=1) for weekday in range(len(WEEKDAYS))],
+                                axis=1)
+        return cls(list(location_names), orders, sums, weekday_days)
+
+    @classmethod
+    def from_export(cls, path, statuses=None, site_timezone=SITE_TIMEZONE):
+        """Heatmap of an export's orders, timed by Paid Date
+
+        Negative refund rows are skipped (they have no Paid Date and their
+        parent row carries the order). `statuses` keeps only those statuses.
+        """
+        df = load_orders(path, columns=['Paid Date', 'Status', 'Location', 'Total Amount'])
+        df = df[df['Total Amount'] >= 0]
+        if statuses is not None:
+            df = df[df['Status'].astype('string').str.lower().isin({status.lower() for status in statuses})]
+        return cls.from_orders(df['Paid Date'], df['Location'], to_cents(df['Total Amount']), site_timezone)
+
+    def _rows(self, locations):
+        if locations is None:
+            return slice(None)
+        return [self.locations.get_loc(location) for location in locations]
+
+    def frame(self, locations=None, values='orders', per_day=False):
+        """Weekday x hour DataFrame summed over `locations` (default: all stores)
+
+        values is 'orders' or 'cents'. With per_day the sums are divided
+        by the number of local days of each weekday, e.g. the average
+        orders a store takes on a Friday between 12:00 and 13:00.
+        """
+        rows = self._rows(locations)
+        grid = getattr(self, values)[rows].sum(axis=0).astype('float64')
+        if per_day:
+            # Stores share the calendar: a weekday's day count is the largest among them
+            grid = grid / np.maximum(self.weekday_days[rows].max(axis=0), 1)[:, None]
+        return pd.DataFrame(grid, index=pd.Index(WEEKDAYS, name='Weekday'),
+                            columns=pd.RangeIndex(HOURS, name='Hour'))
+
+    def peaks(self, values='orders'):
+        """Busiest (weekday, hour) per location with its total"""
+        grid = getattr(self, values).reshape(len(self.locations), -1)
+        best = grid.argmax(axis=1)
+        return pd.DataFrame({
+            'weekday': [WEEKDAYS[position // HOURS] for position in best],
+            'hour': best % HOURS,
+            values: grid[np.arange(len(self.locations)), best],
+        }, index=self.locations)
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Hour x weekday order heatmaps per store, in store-local time')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    parser.add_argument('--location', action='append', help='only these stores (repeatable, canonical names)')
+    parser.add_argument('--status', action='append', help='only these statuses (repeatable)')
+    parser.add_argument('--values', choices=['orders', 'cents'], default='orders')
+    parser.add_argument('--per-day', action='store_true', help='average per local day instead of totals')
+    parser.add_argument('--site-timezone', default=SITE_TIMEZONE, help='timezone of the Paid Date wall clock')
+    args = parser.parse_args()
+
+    # --profile splits this into the read_csv, parse_paid_dates and build_heatmap stages
+    start = time.perf_counter()
+    heatmap = SalesHeatmap.from_export(args.path, args.status, args.site_timezone)
+    elapsed = time.perf_counter() - start
+    unknown = [location for location in args.location or [] if location not in heatmap.locations]
+    if unknown:
+        parser.error(f"unknown --location {', '.join(unknown)} (stores: {'; '.join(heatmap.locations)})")
+
+    print(f"=== ORDER HEATMAP: {args.path} ===")
+    print(f"{int(heatmap.orders.sum())} orders | loaded and bucketed in {elapsed:.2f}s\n")
+    grid = heatmap.frame(args.location, args.values, args.per_day)
+    if args.values == 'cents' and not args.per_day:
+        grid = grid.map(lambda cents: format_cents(int(cents)))
+    print(grid.to_string(float_format='%.1f' if args.per_day else '%.0f'))
+    print()
+    peaks = heatmap.peaks(args.values)
+    if args.values == 'cents':
+        peaks['cents'] = peaks['cents'].map(format_cents)
+    print(peaks.to_string())
+
+
+if __name__ == "__main__":
+    main()
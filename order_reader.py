@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Ingestion helpers for WooCommerce order exports.
+
+Exports are read with only the columns the analyses use and with explicit
+dtypes, so the free-text Order Notes (multi-line Stripe logs) and payment
+text are never materialized. Large exports can be streamed in bounded
+chunks and folded into running per-location aggregates, so peak memory
+depends on the chunk size rather than on the size of the file.
+"""
+
+import argparse
+import calendar
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from order_aggregation import aggregate_folded, location_metrics
+from pipeline_profile import enable_from_argv, stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # dates are parsed with pd.to_datetime only
+    pa = pc = None
+
+DEFAULT_EXPORT = 'attached_assets/Mayorders-2025-06-03-17-44-11.csv'
+DEFAULT_CHUNKSIZE = 50_000
+
+PAID_DATE_FORMAT = '%B %d, %Y %I:%M %p'  # e.g. "May 1, 2025 12:11 AM"
+# PAID_DATE_FORMAT as named groups, for splitting dates into fields in bulk
+PAID_DATE_PATTERN = (r'^(?P<month>[A-Za-z]+) (?P<day>[0-9]{1,2}), (?P<year>[0-9]{4}) '
+                     r'(?P<hour>[0-9]{1,2}):(?P<minute>[0-9]{2}) (?P<meridiem>[AaPp][Mm])$')
+MONTH_NAMES = [name.lower() for name in calendar.month_name[1:]]
+
+MONEY_COLUMNS = ['Total Amount', 'Refund Amount', 'Total (- Refund)']
+
+# Money stays float64: float32 cannot hold cent-exact totals once a
+# location's sales pass ~$100k.
+COLUMN_DTYPES = {
+    'Order ID': 'Int64',
+    'Status': 'category',
+    'First Name': 'string',
+    'Location': 'category',
+    'Payment': 'string',
+    'Tax': 'float64',
+    'Total Amount': 'float64',
+    'Refund Amount': 'float64',
+    'Total (- Refund)': 'float64',
+    'Order Notes': 'string',
+}
+
+ORDER_COLUMNS = ['Order ID', 'Paid Date', 'Status', 'Location'] + MONEY_COLUMNS
+
+XLSX_SUFFIXES = ('.xlsx', '.xlsm')
+EXPORT_SUFFIXES = ('.csv',) + XLSX_SUFFIXES  # every export format load_orders() reads
+
+
+def is_xlsx(path):
+    """Whether a path is an Excel workbook (read with order_xlsx instead of read_csv)"""
+    return str(path).lower().endswith(XLSX_SUFFIXES)
+
+
+def is_export(path):
+    """Whether a path has an export suffix (CSV or Excel; Excel's ~$ lock files excluded)"""
+    return str(path).lower().endswith(EXPORT_SUFFIXES) and not os.path.basename(path).startswith('~$')
+
+
+def read_csv_options(columns=ORDER_COLUMNS):
+    """read_csv keyword arguments for a column-pruned, typed read"""
+    columns = list(columns)
+    options = {
+        'usecols': columns,
+        'dtype': {column: COLUMN_DTYPES[column] for column in columns if column in COLUMN_DTYPES},
+    }
+    return options
+
+
+def _split_paid_dates(values):
+    """Datetimes of unique Paid Date strings from their fields, via Arrow kernels
+
+    Strings the pattern does not cover come back as NaT.
+    """
+    fields = pc.extract_regex(pa.array(values, type=pa.string(), from_pandas=True), PAID_DATE_PATTERN).flatten()
+    month, day, year, hour, minute, meridiem = fields
+    month = pc.index_in(pc.utf8_lower(month), pa.array(MONTH_NAMES))
+    valid = pc.is_valid(month).to_numpy(zero_copy_only=False)
+
+    def numbers(column):
+        return pc.cast(column.fill_null('0'), pa.int64()).to_numpy()
+
+    year, day, hour, minute = numbers(year), numbers(day), numbers(hour), numbers(minute)
+    months = ((year - 1970) * 12 + month.fill_null(0).to_numpy()).astype('datetime64[M]')
+    month_days = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype('int64')
+    valid &= (day >= 1) & (day <= month_days) & (hour >= 1) & (hour <= 12) & (minute < 60)
+    pm = pc.equal(pc.utf8_upper(meridiem.fill_null('AM')), 'PM').to_numpy(zero_copy_only=False)
+    seconds = ((hour % 12) + 12 * pm) * 3600 + minute * 60
+    parsed = months.astype('datetime64[D]').astype('datetime64[s]') + (day - 1) * 86400 + seconds
+    parsed[~valid] = np.datetime64('NaT')
+    return parsed
+
+
+def parse_paid_date_values(values):
+    """Parse Paid Date strings with the fixed export format
+
+    Same result as pd.to_datetime(values, format=PAID_DATE_FORMAT,
+    errors='coerce'), much faster: an export has far fewer distinct
+    timestamps than rows (one per minute at most), so only the unique
+    strings are parsed, split into fields with Arrow kernels and assembled
+    as integers. Anything that does not fit the pattern goes through
+    pd.to_datetime, which then decides between a date and NaT.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    dtype = pd.to_datetime(pd.Series(['January 1, 2000 12:00 AM']), format=PAID_DATE_FORMAT).dtype
+    if pc is not None and len(uniques):
+        unique_dates = pd.Series(_split_paid_dates(uniques.to_numpy())).astype(dtype)
+        missed = unique_dates.isna().to_numpy()
+        if missed.any():
+            unique_dates[missed] = pd.to_datetime(uniques[missed], format=PAID_DATE_FORMAT, errors='coerce')
+    else:
+        unique_dates = pd.to_datetime(uniques, format=PAID_DATE_FORMAT, errors='coerce').astype(dtype)
+    dates = unique_dates.to_numpy()[np.maximum(codes, 0)] if len(uniques) else np.empty(len(codes), dtype=dtype)
+    dates[codes < 0] = np.datetime64('NaT')
+    return pd.Series(dates, index=values.index, name=values.name)
+
+
+def parse_paid_dates(df):
+    """Parse 'Paid Date' in place with the fixed export format
+
+    Values that do not match the format (and the empty dates of refund
+    rows) become NaT instead of leaving the whole column as text.
+    """
+    if 'Paid Date' in df:
+        with stage('parse_paid_dates', rows=len(df)):
+            df['Paid Date'] = parse_paid_date_values(df['Paid Date'])
+    return df
+
+
+def load_orders(path, columns=ORDER_COLUMNS):
+    """Load an export with only `columns`, typed at parse time
+
+    Location/Status are categoricals, Order ID is a nullable integer,
+    money is float64 and 'Paid Date' is parsed once with the fixed export
+    format. Refund rows have no Paid Date and get NaT. .xlsx exports are
+    streamed through order_xlsx into the same columns and dtypes.
+    """
+    if is_xlsx(path):
+        from order_xlsx import load_xlsx_orders
+        return load_xlsx_orders(path, columns=columns)
+    with stage('read_csv') as timed:
+        df = pd.read_csv(path, **read_csv_options(columns))
+        timed.rows = len(df)
+    return parse_paid_dates(df)
+
+
+def iter_order_chunks(path, chunksize=DEFAULT_CHUNKSIZE, columns=ORDER_COLUMNS):
+    """Yield the typed export as DataFrames of at most `chunksize` rows
+
+    The C parser tokenizes complete records before splitting them into
+    chunks, so a quoted multi-line 'Order Notes' value is never cut in
+    half at a chunk boundary even though it is not kept. .xlsx exports
+    are streamed row by row through order_xlsx instead.
+    """
+    if is_xlsx(path):
+        from order_xlsx import iter_xlsx_chunks
+        yield from iter_xlsx_chunks(path, chunksize=chunksize, columns=columns)
+        return
+    with pd.read_csv(path, chunksize=chunksize, **read_csv_options(columns)) as reader:
+        while True:
+            with stage('read_chunk') as timed:
+                chunk = next(reader, None)
+                timed.rows = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                return
+            yield parse_paid_dates(chunk)
+
+
+def load_orders_untyped(path):
+    """The scripts' original approach: read everything, coerce money afterwards"""
+    with stage('read_csv') as timed:
+        df = pd.read_csv(path)
+        timed.rows = len(df)
+    with stage('to_numeric', rows=len(df)):
+        for column in MONEY_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+def compare_loaders(path):
+    """Time and measure the typed loader against the untyped full read"""
+    results = {}
+    for name, loader in [('untyped', load_orders_untyped), ('typed', load_orders)]:
+        start = time.perf_counter()
+        with stage(f'load_{name}'):
+            df = loader(path)
+        results[name] = {
+            'seconds': time.perf_counter() - start,
+            'memory_bytes': int(df.memory_usage(deep=True).sum()),
+            'columns': len(df.columns),
+        }
+    results['memory_saved_bytes'] = results['untyped']['memory_bytes'] - results['typed']['memory_bytes']
+    return results
+
+
+def stream_aggregates(path, locations=None, chunksize=DEFAULT_CHUNKSIZE, monitor=None):
+    """Fold an export into per-location and per-status aggregates chunk by chunk
+
+    Rows are folded into one record per order as they stream in
+    (order_folding.OrderFolder), so a refunded order counts once even when
+    its refund rows come chunks after it; memory holds the current chunk
+    and a few numbers per order. Returns a dict with the row count, the
+    per-location aggregates (see order_aggregation.aggregate_folded) and
+    order counts per (Location, Status). A
+    `monitor` (order_anomalies.AnomalyMonitor) sees every chunk as it is
+    read, and its report is returned under 'anomalies'.
+    """
+    from order_folding import OrderFolder  # order_folding reads exports through this module
+
+    folder = OrderFolder()
+    rows = 0
+    for chunk in iter_order_chunks(path, chunksize=chunksize):
+        rows += len(chunk)
+        with stage('fold_chunk', rows=len(chunk)):
+            folder.update(chunk)
+        if monitor is not None:
+            monitor.update(chunk)
+
+    folded = folder.finish()
+    with stage('aggregate', rows=len(folded)):
+        aggregates = aggregate_folded(folded, locations=locations)
+        if locations is None:
+            aggregates = aggregates.sort_index()
+        status_counts = folded.groupby(['Location', 'Status'], observed=True).size()
+    result = {
+        'rows': rows,
+        'aggregates': aggregates,
+        'status_counts': status_counts.astype('int64'),
+    }
+    if monitor is not None:
+        result['anomalies'] = monitor.finish()
+    return result
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Stream an order export and print per-location metrics')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='rows per chunk')
+    parser.add_argument('--compare-loaders', action='store_true',
+                        help='report parse time and memory of the typed loader vs. a full untyped read')
+    parser.add_argument('--anomalies', action='store_true',
+                        help='flag gaps, spikes and unmapped stores while streaming (see order_anomalies.py)')
+    parser.add_argument('--anomaly-report', help='write the anomaly report to this CSV (implies --anomalies)')
+    args = parser.parse_args()
+
+    if args.compare_loaders:
+        comparison = compare_loaders(args.path)
+        print(f"=== LOADER COMPARISON: {args.path} ===")
+        for name in ['untyped', 'typed']:
+            stats = comparison[name]
+            print(f"{name.capitalize():8s} {stats['columns']:2d} columns | "
+                  f"{stats['seconds'] * 1000:8.1f} ms | {stats['memory_bytes'] / 1e6:8.2f} MB")
+        saved = comparison['memory_saved_bytes']
+        print(f"Memory saved: {saved / 1e6:.2f} MB "
+              f"({saved / comparison['untyped']['memory_bytes']:.0%})")
+        return
+
+    monitor = None
+    if args.anomalies or args.anomaly_report:
+        from order_anomalies import AnomalyMonitor, describe
+
+        monitor = AnomalyMonitor(on_anomaly=lambda anomaly: print(f"anomaly: {describe(anomaly)}"))
+    result = stream_aggregates(args.path, chunksize=args.chunksize, monitor=monitor)
+
+    print(f"=== STREAMED ANALYSIS: {args.path} ===")
+    print(f"Rows read: {result['rows']}")
+    print()
+    print(location_metrics(result['aggregates']).to_string(float_format='%.2f'))
+    print()
+    print("Status Breakdown:")
+    for (location, status), count in result['status_counts'].items():
+        print(f"  {location} | {status}: {count}")
+    if args.anomaly_report:
+        result['anomalies'].to_csv(args.anomaly_report, index=False)
+        print(f"\n{len(result['anomalies'])} anomalies written to {args.anomaly_report}")
+
+
+if __name__ == "__main__":
+    main()
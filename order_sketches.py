@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Approximate quick look at an export of any size, in one pass and fixed memory.
+
+The export is streamed in chunks (order_reader.iter_order_chunks) into
+sketches whose size does not depend on the number of rows:
+
+    HyperLogLog    distinct customers per location, a customer being
+                   First Name + card last-4 (payment_methods); 2**p
+                   one-byte registers per location, relative standard
+                   error 1.04 / sqrt(2**p)
+    Space-Saving   top-K order totals and customers by order count;
+                   `capacity` counters, each count an overestimate by at
+                   most its recorded error
+    Count-Min      frequency of any order total or customer, overestimating
+                   by at most eps * N with probability 1 - delta
+    Reservoir      `sample_size` uniformly sampled rows, instead of head()
+
+Each update works on a whole chunk with NumPy (hashing, bincount,
+value_counts), never row by row. Row counts and sales per location are
+cheap to keep exactly and are reported as such.
+"""
+
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import normalize_location_name
+from money import format_cents, to_cents
+from order_reader import DEFAULT_CHUNKSIZE, DEFAULT_EXPORT, iter_order_chunks
+from payment_methods import parse_payments
+from pipeline_profile import enable_from_argv, profiled
+
+SKETCH_COLUMNS = ['Order ID', 'Paid Date', 'Status', 'First Name', 'Location', 'Payment', 'Total Amount']
+UNKNOWN_LOCATION = 'Unknown Location'
+
+DEFAULT_PRECISION = 12      # HyperLogLog: 4096 registers (4 KB) per location, ~1.6% standard error
+DEFAULT_CAPACITY = 1000     # Space-Saving counters per top-K summary
+DEFAULT_EPSILON = 0.0005    # Count-Min: error at most eps * N ...
+DEFAULT_DELTA = 0.001       # ... with probability 1 - delta
+DEFAULT_SAMPLE_SIZE = 20
+DEFAULT_TOP = 10
+
+
+def hash_values(values):
+    """64-bit hashes of a column (strings, numbers or categoricals)"""
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+class HyperLogLog:
+    """One HyperLogLog per group: (groups, 2**precision) uint8 registers"""
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = np.zeros((0, self.size), dtype='uint8')
+
+    def resize(self, groups):
+        """Allocate empty registers up to `groups` groups"""
+        if groups > len(self.registers):
+            grown = np.zeros((groups, self.size), dtype='uint8')
+            grown[:len(self.registers)] = self.registers
+            self.registers = grown
+
+    def add(self, groups, hashes):
+        """Add hashes to the integer groups they belong to"""
+        groups = np.asarray(groups, dtype='int64')
+        if len(groups):
+            self.resize(groups.max() + 1)
+        hashes = np.asarray(hashes, dtype='uint64')
+        slots = (hashes >> np.uint64(64 - self.precision)).astype('int64')
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Rank = position of the first 1-bit in the remaining 64-p bits
+        bits = np.frexp(rest.astype('float64'))[1]  # bit length (0 for 0)
+        ranks = (64 - self.precision - bits + 1).astype('uint8')
+        np.maximum.at(self.registers, (groups, slots), ranks)
+
+    def estimate(self, registers=None):
+        """Distinct count per group (with the small-range correction)"""
+        registers = np.atleast_2d(self.registers if registers is None else registers)
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.exp2(-registers.astype('float64')).sum(axis=1)
+        zeros = (registers == 0).sum(axis=1)
+        small = (raw <= 2.5 * m) & (zeros > 0)
+        linear = m * np.log(m / np.maximum(zeros, 1))
+        return np.where(small, linear, raw)
+
+    def union_estimate(self):
+        """Distinct count over all groups (the union's registers are the element-wise max)"""
+        return float(self.estimate(self.registers.max(axis=0, initial=0))[0])
+
+    @property
+    def relative_error(self):
+        """Relative standard error of an estimate"""
+        return 1.04 / math.sqrt(self.size)
+
+
+class CountMinSketch:
+    """Count-Min sketch over 64-bit item hashes"""
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.epsilon = epsilon
+        self.delta = delta
+        self.table = np.zeros((self.depth, self.width), dtype='int64')
+        self.total = 0
+
+    def _columns(self, hashes):
+        # Double hashing: row d uses h1 + d * h2
+        hashes = np.asarray(hashes, dtype='uint64')
+        low = (hashes & np.uint64(0xFFFFFFFF)).astype('int64')
+        high = (hashes >> np.uint64(32)).astype('int64') | 1
+        return [(low + row * high) % self.width for row in range(self.depth)]
+
+    def add(self, hashes, counts):
+        counts = np.asarray(counts, dtype='int64')
+        for row, columns in enumerate(self._columns(hashes)):
+            self.table[row] += np.bincount(columns, weights=counts, minlength=self.width).astype('int64')
+        self.total += int(counts.sum())
+
+    def estimate(self, hashes):
+        """Upper-bound frequency of each hash (exceeds the truth by <= error_bound w.p. 1 - delta)"""
+        return np.min([self.table[row, columns] for row, columns in enumerate(self._columns(hashes))], axis=0)
+
+    @property
+    def error_bound(self):
+        return self.epsilon * self.total
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters, merged a chunk's exact counts at a time
+
+    Each kept item has a count that overestimates its true frequency by at
+    most `error`; items not kept occurred at most `floor` times.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counters = pd.DataFrame({'count': pd.Series(dtype='int64'), 'error': pd.Series(dtype='int64')})
+        self.floor = 0
+
+    def add(self, counts):
+        """Merge exact counts (a Series indexed by item) of the next chunk"""
+        counts = counts[counts > 0].astype('int64').sort_values(ascending=False)
+        chunk_floor = 0
+        if len(counts) > self.capacity:
+            chunk_floor = int(counts.iloc[self.capacity])
+            counts = counts.iloc[:self.capacity]
+        chunk = pd.DataFrame({'count': counts, 'error': np.full(len(counts), chunk_floor, dtype='int64')})
+        if self.counters.empty and not self.floor:
+            merged = chunk
+        else:
+            # An item missing from one side may have occurred up to that side's floor times there
+            index = self.counters.index.union(chunk.index)
+            merged = (self.counters.reindex(index, fill_value=self.floor)
+                      + chunk.reindex(index, fill_value=chunk_floor))
+        merged = merged.sort_values('count', ascending=False, kind='stable')
+        dropped = int(merged['count'].iloc[self.capacity]) if len(merged) > self.capacity else 0
+        self.floor = max(self.floor + chunk_floor, dropped)
+        self.counters = merged.iloc[:self.capacity]
+
+    def top(self, k):
+        """The k largest counters: item index with count (upper bound) and lower = count - error"""
+        top = self.counters.iloc[:k].copy()
+        top['lower'] = top['count'] - top['error']
+        return top
+
+
+class Reservoir:
+    """Uniform sample of `size` rows of a stream (Algorithm R, a chunk at a time)"""
+
+    def __init__(self, size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.sample = None
+        self.seen = 0
+
+    def add(self, chunk):
+        n = len(chunk)
+        positions = self.seen + np.arange(n)  # 0-based stream positions
+        # Row i fills slot i while the reservoir fills, then replaces a random slot with probability size/(i+1)
+        slots = np.where(positions < self.size, positions,
+                         np.floor(self.rng.random(n) * (positions + 1)).astype('int64'))
+        accepted = slots < self.size
+        self.seen += n
+        if not accepted.any():
+            return
+        # Later rows win a contested slot, as if replaced one at a time
+        slot_values, first = np.unique(slots[accepted][::-1], return_index=True)
+        incoming = chunk.iloc[np.flatnonzero(accepted)[::-1][first]].set_axis(slot_values)
+        if self.sample is None:
+            self.sample = incoming
+        else:
+            # concat, not assignment: each chunk's categoricals have their own categories
+            self.sample = pd.concat([self.sample.drop(slot_values, errors='ignore'), incoming]).sort_index()
+
+
+class QuickLook:
+    """All sketches of the quick look, fed chunk by chunk"""
+
+    def __init__(self, precision=DEFAULT_PRECISION, capacity=DEFAULT_CAPACITY, epsilon=DEFAULT_EPSILON,
+                 delta=DEFAULT_DELTA, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.customers = HyperLogLog(precision)
+        self.top_totals = SpaceSaving(capacity)
+        self.top_customers = SpaceSaving(capacity)
+        self.total_frequency = CountMinSketch(epsilon, delta)
+        self.customer_frequency = CountMinSketch(epsilon, delta)
+        self.reservoir = Reservoir(sample_size, seed)
+        self.customer_labels = {}
+        self.locations = {}     # canonical location -> HyperLogLog row
+        self.resolved = {}      # raw Location -> canonical location
+        self.location_orders = np.zeros(0, dtype='int64')  # exact, per HyperLogLog row
+        self.location_cents = np.zeros(0, dtype='int64')
+        self.rows = 0
+
+    def _location_codes(self, locations):
+        raw = pd.Categorical(locations)
+        names = []
+        for name in raw.categories:
+            if name not in self.resolved:
+                self.resolved[name] = normalize_location_name(name) or UNKNOWN_LOCATION
+            names.append(self.resolved[name])
+        names.append(UNKNOWN_LOCATION)  # code -1
+        codes = np.array([self.locations.setdefault(name, len(self.locations)) for name in names])
+        self.customers.resize(len(self.locations))
+        grow = len(self.locations) - len(self.location_orders)
+        self.location_orders = np.append(self.location_orders, np.zeros(grow, dtype='int64'))
+        self.location_cents = np.append(self.location_cents, np.zeros(grow, dtype='int64'))
+        return codes[raw.codes]
+
+    @profiled('sketch_chunk')
+    def update(self, chunk):
+        self.rows += len(chunk)
+        self.reservoir.add(chunk)
+        orders = chunk[chunk['Total Amount'] >= 0]  # negative refund rows duplicate their parent
+        cents = to_cents(orders['Total Amount'])
+        groups = self._location_codes(orders['Location'])
+        size = len(self.location_orders)
+        self.location_orders += np.bincount(groups, minlength=size)
+        # bincount weights are float64: exact for a chunk's sums below 2**53 cents
+        self.location_cents += np.rint(np.bincount(groups, weights=cents, minlength=size)).astype('int64')
+
+        # Customers: lowercased First Name + card last-4, hashed without building strings per row
+        names = orders['First Name'].astype('string').str.strip().str.lower()
+        last4 = parse_payments(orders['Payment'])['last4']
+        keys = pd.DataFrame({'name': names.reset_index(drop=True), 'last4': last4.reset_index(drop=True)})
+        known = keys['name'].notna().to_numpy()
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()[known]
+        self.customers.add(groups[known], hashes)
+
+        counts = pd.Series(hashes).value_counts()
+        self.customer_frequency.add(counts.index.to_numpy(dtype='uint64'), counts.to_numpy())
+        self.top_customers.add(counts)
+        # Readable labels only for counters that just entered the summary
+        new = self.top_customers.counters.index.difference(pd.Index(list(self.customer_labels), dtype='uint64'))
+        if len(new):
+            rows = np.flatnonzero(known)
+            first = pd.Series(rows, index=hashes)
+            first = first[~first.index.duplicated()].reindex(new)
+            for key, row in first.items():
+                last4 = keys['last4'].iloc[row]
+                self.customer_labels[key] = f"{keys['name'].iloc[row]} *{'----' if pd.isna(last4) else last4}"
+        if len(self.customer_labels) > 4 * self.top_customers.capacity:  # forget labels of evicted counters
+            kept = set(self.top_customers.counters.index)
+            self.customer_labels = {key: label for key, label in self.customer_labels.items() if key in kept}
+
+        counts = pd.Series(cents).value_counts()
+        self.total_frequency.add(hash_values(counts.index.to_numpy()), counts.to_numpy())
+        self.top_totals.add(counts)
+
+    def memory_bytes(self):
+        """Size of the sketches (fixed by their parameters, not by the export)"""
+        return int(self.customers.registers.nbytes
+                   + self.total_frequency.table.nbytes + self.customer_frequency.table.nbytes
+                   + self.top_totals.counters.memory_usage(index=True).sum()
+                   + self.top_customers.counters.memory_usage(index=True).sum())
+
+    def location_report(self):
+        """Exact orders and amount (any status) with estimated distinct customers (+-2 sigma) per location"""
+        names = pd.Index(list(self.locations), name='Location')
+        estimates = self.customers.estimate()
+        report = pd.DataFrame({
+            'orders': self.location_orders,
+            'amount_cents': self.location_cents,
+            'customers_est': np.rint(estimates).astype('int64'),
+            'customers_pm': np.ceil(2 * self.customers.relative_error * estimates).astype('int64'),
+        }, index=names)
+        return report[report['orders'] > 0].sort_index()
+
+    def top_customer_report(self, k=DEFAULT_TOP):
+        top = self.top_customers.top(k)
+        top['count_min'] = self.customer_frequency.estimate(top.index.to_numpy(dtype='uint64'))
+        top['upper'] = np.minimum(top['count'], top['count_min'])
+        top.index = [self.customer_labels.get(key, '?') for key in top.index]
+        return top[['lower', 'upper']].rename_axis('customer')
+
+    def top_total_report(self, k=DEFAULT_TOP):
+        top = self.top_totals.top(k)
+        top['count_min'] = self.total_frequency.estimate(hash_values(top.index.to_numpy()))
+        top['upper'] = np.minimum(top['count'], top['count_min'])
+        top.index = [format_cents(cents) for cents in top.index]
+        return top[['lower', 'upper']].rename_axis('order total')
+
+
+@profiled()
+def quick_look(path, chunksize=DEFAULT_CHUNKSIZE, **options):
+    """Stream an export once through a QuickLook"""
+    look = QuickLook(**options)
+    for chunk in iter_order_chunks(path, chunksize=chunksize, columns=SKETCH_COLUMNS):
+        look.update(chunk)
+    return look
+
+
+def print_quick_look(path, look, top=DEFAULT_TOP):
+    """The quick-look report, each estimate next to its error bound"""
+    print(f"=== QUICK LOOK (approximate): {path} ===")
+    print(f"{look.rows} rows | sketches {look.memory_bytes() / 1024:.0f} KB, fixed | orders and amounts exact\n")
+
+    report = look.location_report()
+    overall = look.customers.union_estimate()
+    print(f"Distinct customers (HyperLogLog, +-{2 * look.customers.relative_error:.1%} at 95%): ~{overall:,.0f}")
+    for location, row in report.iterrows():
+        print(f"  {location:45s} | Orders: {row['orders']:8d} | Amount: {format_cents(row['amount_cents']):>14s} "
+              f"| Customers: ~{row['customers_est']:,} +-{row['customers_pm']:,}")
+
+    bound = look.customer_frequency.error_bound
+    print(f"\nTop {top} customers by orders (Space-Saving range; Count-Min overcounts by <= {bound:.0f} "
+          f"w.p. {1 - look.customer_frequency.delta:.1%}):")
+    print(look.top_customer_report(top).to_string())
+    bound = look.total_frequency.error_bound
+    print(f"\nTop {top} order totals by frequency (Count-Min overcounts by <= {bound:.0f} "
+          f"w.p. {1 - look.total_frequency.delta:.1%}):")
+    print(look.top_total_report(top).to_string())
+
+    sample = look.reservoir.sample
+    print(f"\nSample rows (uniform reservoir of {look.reservoir.size} of {look.reservoir.seen}):")
+    if sample is not None:
+        print(sample.drop(columns=['Payment'], errors='ignore').to_string(index=False))
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='One-pass approximate quick look at an export, fixed memory')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV or .xlsx)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='rows per chunk')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='rows in the top-K tables')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION, help='HyperLogLog precision (4-16)')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='Space-Saving counters')
+    parser.add_argument('--sample', type=int, default=DEFAULT_SAMPLE_SIZE, help='sample rows to keep')
+    parser.add_argument('--seed', type=int, default=0, help='reservoir sampling seed')
+    args = parser.parse_args()
+
+    look = quick_look(args.path, chunksize=args.chunksize, precision=args.precision, capacity=args.capacity,
+                      sample_size=args.sample, seed=args.seed)
+    print_quick_look(args.path, look, args.top)
+
+
+if __name__ == "__main__":
+    main()
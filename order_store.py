@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped binary order store with date and location indexes.
+
+An export is converted once into a directory of .npy files:
+
+    orders.npy        structured records (order_id, paid_at, location,
+                      status, cents) sorted by paid_at
+    by_location.npy   record positions sorted by (location, paid_at)
+    location_at.npy   paid_at in by_location order, for binary search
+    meta.json         location and status names, per-location offsets
+
+paid_at is the export's Paid Date wall-clock time as seconds since the
+epoch (no timezone conversion). Files are opened with mmap, so a query
+like "Drexel orders between May 2 and May 30" is two binary searches on
+the date index (or on one location's slice of the location index) and
+only touches the pages of the matching records.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import LocationIndex
+from money import format_cents, to_cents
+from order_reader import DEFAULT_EXPORT, load_orders
+from pipeline_profile import enable_from_argv, profiled
+
+DEFAULT_STORE = os.path.join('.order_cache', 'order_store')
+STORE_VERSION = 1
+UNKNOWN_LOCATION = 'Unknown Location'
+
+ORDER_DTYPE = np.dtype([
+    ('order_id', '<i8'),
+    ('paid_at', '<i8'),    # epoch seconds of the Paid Date wall-clock time
+    ('location', '<u2'),   # index into meta['locations']
+    ('status', '<u1'),     # index into meta['statuses']
+    ('cents', '<i8'),
+])
+
+
+def to_epoch_seconds(timestamp):
+    """Epoch seconds of a date/datetime-like value (naive = wall clock)"""
+    return int(pd.Timestamp(timestamp).value // 1_000_000_000)
+
+
+@profiled('build_store')
+def build_store(path, store_dir=DEFAULT_STORE):
+    """Convert an export into an order store; returns the number of orders written
+
+    One record per order: negative refund rows are skipped (their parent
+    row carries the order), as are rows without an Order ID or Paid Date.
+    """
+    df = load_orders(path, columns=['Order ID', 'Paid Date', 'Status', 'Location', 'Total Amount'])
+    df = df[(df['Total Amount'] >= 0) & df['Order ID'].notna() & df['Paid Date'].notna()]
+
+    location_codes, locations = pd.factorize(df['Location'].astype(object).fillna(UNKNOWN_LOCATION), sort=True)
+    status_codes, statuses = pd.factorize(df['Status'].astype(object).fillna(''), sort=True)
+
+    records = np.empty(len(df), dtype=ORDER_DTYPE)
+    records['order_id'] = df['Order ID'].to_numpy(dtype='int64')
+    records['paid_at'] = df['Paid Date'].to_numpy().astype('datetime64[s]').astype('int64')
+    records['location'] = location_codes
+    records['status'] = status_codes
+    records['cents'] = to_cents(df['Total Amount'])
+    records = records[np.argsort(records['paid_at'], kind='stable')]
+
+    by_location = np.lexsort((records['paid_at'], records['location'])).astype('int64')
+    location_at = records['paid_at'][by_location]
+    offsets = np.searchsorted(records['location'][by_location], np.arange(len(locations) + 1))
+
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    np.save(store_dir / 'orders.npy', records)
+    np.save(store_dir / 'by_location.npy', by_location)
+    np.save(store_dir / 'location_at.npy', location_at)
+    meta = {
+        'version': STORE_VERSION,
+        'source': str(path),
+        'orders': len(records),
+        'locations': list(locations),
+        'statuses': list(statuses),
+        'location_offsets': offsets.tolist(),
+    }
+    with open(store_dir / 'meta.json', 'w') as handle:
+        json.dump(meta, handle, indent=2)
+    return len(records)
+
+
+class OrderStore:
+    """Read-only, memory-mapped view of an order store"""
+
+    def __init__(self, store_dir=DEFAULT_STORE):
+        store_dir = Path(store_dir)
+        with open(store_dir / 'meta.json') as handle:
+            self.meta = json.load(handle)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"{store_dir} was built by an incompatible version; rebuild it")
+        self.records = np.load(store_dir / 'orders.npy', mmap_mode='r')
+        self.by_location = np.load(store_dir / 'by_location.npy', mmap_mode='r')
+        self.location_at = np.load(store_dir / 'location_at.npy', mmap_mode='r')
+        self.locations = self.meta['locations']
+        self.statuses = self.meta['statuses']
+        self.offsets = self.meta['location_offsets']
+        self.index = LocationIndex(self.locations)
+
+    def __len__(self):
+        return len(self.records)
+
+    def location_code(self, name):
+        """Code of a location: exact, normalized or fuzzy name, else a unique substring match"""
+        match = self.index.match(name)
+        if match is None:
+            candidates = [location for location in self.locations if name.lower() in location.lower()]
+            if len(candidates) != 1:
+                raise KeyError(f"No unique location matches {name!r}")
+            match = candidates[0]
+        return self.locations.index(match)
+
+    def _time_bounds(self, start, end):
+        low = np.iinfo('int64').min if start is None else to_epoch_seconds(start)
+        high = np.iinfo('int64').max if end is None else to_epoch_seconds(pd.Timestamp(end) + pd.Timedelta(days=1))
+        return low, high
+
+    def positions(self, start=None, end=None, location=None):
+        """Record positions for an inclusive date range and optional location
+
+        Dates are whole days; times between `start` 00:00 and the end of
+        `end` are included.
+        """
+        low, high = self._time_bounds(start, end)
+        if location is None:
+            paid_at = self.records['paid_at']
+            first, stop = np.searchsorted(paid_at, [low, high], side='left')
+            return np.arange(first, stop)
+        code = location if isinstance(location, (int, np.integer)) else self.location_code(location)
+        segment_start, segment_end = self.offsets[code], self.offsets[code + 1]
+        segment = self.location_at[segment_start:segment_end]
+        first, stop = np.searchsorted(segment, [low, high], side='left')
+        return np.asarray(self.by_location[segment_start + first:segment_start + stop])
+
+    def query(self, start=None, end=None, location=None, statuses=None):
+        """Matching records as a DataFrame (order_id, paid_at, location, status, cents)"""
+        records = self.records[np.sort(self.positions(start, end, location))]
+        if statuses is not None:
+            wanted = [code for code, status in enumerate(self.statuses) if status.lower() in
+                      {status.lower() for status in statuses}]
+            records = records[np.isin(records['status'], wanted)]
+        return pd.DataFrame({
+            'order_id': records['order_id'],
+            'paid_at': records['paid_at'].astype('datetime64[s]'),
+            'location': pd.Categorical.from_codes(records['location'].astype('int64'), categories=self.locations),
+            'status': pd.Categorical.from_codes(records['status'].astype('int64'), categories=self.statuses),
+            'cents': records['cents'],
+        })
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Build or query the memory-mapped order store')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    build = subcommands.add_parser('build', help='convert an export into an order store')
+    build.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV)')
+    build.add_argument('--store', default=DEFAULT_STORE)
+    query = subcommands.add_parser('query', help='list orders by date range and location')
+    query.add_argument('--store', default=DEFAULT_STORE)
+    query.add_argument('--start', help='first day (YYYY-MM-DD)')
+    query.add_argument('--end', help='last day, inclusive (YYYY-MM-DD)')
+    query.add_argument('--location', help='location name (exact, normalized or a unique substring)')
+    query.add_argument('--status', action='append', help='only these statuses (repeatable)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_store(args.path, args.store)
+        print(f"Wrote {count} orders to {args.store}")
+        return
+
+    store = OrderStore(args.store)
+    orders = store.query(args.start, args.end, args.location, args.status)
+    print(f"=== ORDERS {args.start or 'start'} to {args.end or 'end'} | {args.location or 'all locations'} ===")
+    print(orders.to_string(index=False, formatters={'cents': format_cents}))
+    print(f"\nOrders: {len(orders)} | Total: {format_cents(orders['cents'].sum())}")
+
+
+if __name__ == "__main__":
+    main()
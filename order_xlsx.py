@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Row-streaming reader for .xlsx order exports.
+
+An .xlsx file is a zip of XML parts. The worksheet is fed in blocks
+straight from the zip member to a raw expat parser (_SheetRows) that
+builds no element tree: each row is handed on as soon as its cells are
+read, so memory is bounded by the chunk size plus the workbook's
+shared-string table (read with iterparse, like the other small parts),
+never by the whole sheet. Only the requested columns are kept and every
+chunk is typed exactly like order_reader's CSV path (COLUMN_DTYPES), so
+the rest of the pipeline cannot tell the two formats apart.
+
+Paid Date cells are Excel date serials (or text in the CSV format); they
+are truncated to the minute, the resolution of the CSV export.
+"""
+
+import argparse
+import posixpath
+import time
+import zipfile
+from xml.etree.ElementTree import iterparse
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from order_reader import (COLUMN_DTYPES, DEFAULT_CHUNKSIZE, ORDER_COLUMNS, load_orders,
+                          parse_paid_date_values)
+from pipeline_profile import enable_from_argv, peak_rss_mb, stage
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+EXCEL_EPOCH = np.datetime64('1899-12-30', 's')       # 1900 date system (with Excel's leap-year quirk)
+EXCEL_EPOCH_1904 = np.datetime64('1904-01-01', 's')
+
+
+def _column_index(ref):
+    """Zero-based column of a cell reference like 'AB12'"""
+    index = 0
+    for char in ref:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _text(element):
+    """Concatenated <t> text of a shared or inline string (rich text runs included)"""
+    return ''.join(node.text or '' for node in element.iter(f'{MAIN_NS}t'))
+
+
+def _workbook_parts(archive):
+    """(path of the first worksheet, whether the workbook uses the 1904 date system)"""
+    with archive.open('xl/workbook.xml') as handle:
+        workbook = next(element for _, element in iterparse(handle) if element.tag == f'{MAIN_NS}workbook')
+    properties = workbook.find(f'{MAIN_NS}workbookPr')
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+    sheet = workbook.find(f'{MAIN_NS}sheets/{MAIN_NS}sheet')
+    relation_id = sheet.get(f'{REL_NS}id')
+    with archive.open('xl/_rels/workbook.xml.rels') as handle:
+        for _, element in iterparse(handle):
+            if element.tag == f'{PACKAGE_REL_NS}Relationship' and element.get('Id') == relation_id:
+                target = element.get('Target')
+                return (target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)), date1904
+    raise ValueError('workbook has no worksheet')
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as handle:
+        for _, element in iterparse(handle):
+            if element.tag == f'{MAIN_NS}si':
+                strings.append(_text(element))
+                element.clear()
+    return strings
+
+
+ROW_TAG, CELL_TAG, VALUE_TAG, TEXT_TAG = (f'{MAIN_NS[1:-1]} {name}' for name in ('row', 'c', 'v', 't'))
+
+
+class _SheetRows:
+    """expat handlers collecting finished rows as {column index: value} dicts
+
+    No element tree is built: only the current cell's type, column and
+    text are tracked, so memory does not grow with the sheet. Once
+    `columns` is set, cells of other columns are skipped without decoding.
+    """
+
+    def __init__(self, strings):
+        self.strings = strings
+        self.columns = None
+        self.rows = []
+        self.row = None
+        self.column = self.kind = self.text = None
+        self.position = 0
+        self.column_of = {}  # column letters -> index
+
+    def start(self, tag, attrib):
+        if tag == CELL_TAG:
+            ref = attrib.get('r')
+            if ref:
+                letters = ref.rstrip('0123456789')
+                column = self.column_of.get(letters)
+                if column is None:
+                    column = self.column_of[letters] = _column_index(letters)
+            else:
+                column = self.position
+            self.position = column + 1
+            self.column = column if self.columns is None or column in self.columns else None
+            self.kind = attrib.get('t', 'n')
+        elif tag == ROW_TAG:
+            self.row = {}
+            self.position = 0
+        elif (tag == VALUE_TAG or tag == TEXT_TAG) and self.column is not None:
+            self.text = [] if self.text is None else self.text
+
+    def data(self, text):
+        if self.text is not None:
+            self.text.append(text)
+
+    def end(self, tag):
+        if tag == CELL_TAG:
+            if self.text is not None:
+                self.row[self.column] = self._value(''.join(self.text))
+                self.text = None
+        elif tag == VALUE_TAG or tag == TEXT_TAG:
+            if self.text is not None and self.kind != 'inlineStr':
+                self.row[self.column] = self._value(''.join(self.text))
+                self.text = None
+        elif tag == ROW_TAG:
+            if self.row:
+                self.rows.append(self.row)
+            self.row = None
+
+    def _value(self, value):
+        if self.kind == 's':
+            return self.strings[int(value)]
+        if self.kind == 'n':
+            return float(value)
+        if self.kind == 'b':
+            return value == '1'
+        return value  # inlineStr, str (formula result), e (error), d (ISO date)
+
+
+def _iter_rows(archive, sheet_path, strings, block_size=1 << 16):
+    """Yield each worksheet row as a {column index: value} dict, streaming
+
+    Values are str, float or bool; empty cells are absent and rows
+    without any value are skipped. The first row yielded is the header;
+    sending a set of column indexes back restricts the following rows to
+    those columns.
+    """
+    target = _SheetRows(strings)
+    parser = expat.ParserCreate(namespace_separator=' ')
+    parser.buffer_text = True
+    parser.StartElementHandler = target.start
+    parser.EndElementHandler = target.end
+    parser.CharacterDataHandler = target.data
+    with archive.open(sheet_path) as handle:
+        while True:
+            block = handle.read(block_size)
+            parser.Parse(block, not block)
+            for row in target.rows:
+                columns = yield row
+                if columns is not None:
+                    target.columns = set(columns)
+                    yield None  # the value of send()
+            target.rows.clear()
+            if not block:
+                return
+
+
+def excel_dates(values, date1904=False):
+    """Paid Date cells (Excel serials or export-format text) as datetimes, to the minute"""
+    values = pd.Series(values, dtype=object)
+    serial = pd.to_numeric(values.where(values.map(type) == float), errors='coerce').to_numpy(dtype='float64')
+    epoch = EXCEL_EPOCH_1904 if date1904 else EXCEL_EPOCH
+    seconds = np.rint(np.nan_to_num(serial) * 86400).astype('int64')
+    dates = (epoch + seconds.astype('timedelta64[s]')).astype('datetime64[m]')
+    text = parse_paid_date_values(values.where(values.map(type) == str)).to_numpy()
+    result = np.where(np.isnan(serial), text, dates.astype(text.dtype))
+    return pd.Series(result, index=values.index)
+
+
+def _typed_chunk(columns, names, date1904):
+    """A DataFrame of collected column values with order_reader's CSV dtypes"""
+    df = pd.DataFrame({name: pd.Series(values, dtype=object) for name, values in zip(names, columns)})
+    for name in names:
+        dtype = COLUMN_DTYPES.get(name)
+        if name == 'Paid Date':
+            df[name] = excel_dates(df[name], date1904)
+        elif dtype == 'Int64':
+            df[name] = pd.to_numeric(df[name], errors='coerce').round().astype('Int64')
+        elif dtype == 'float64':
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+        elif dtype is not None:
+            df[name] = df[name].map(lambda value: value if isinstance(value, str) or value is None
+                                    else f'{value:g}').astype(dtype)
+    return df
+
+
+def iter_xlsx_chunks(path, chunksize=DEFAULT_CHUNKSIZE, columns=ORDER_COLUMNS):
+    """Yield the typed, column-pruned export as DataFrames of at most `chunksize` rows
+
+    Same columns and dtypes as order_reader.iter_order_chunks on the CSV
+    export; missing columns raise ValueError like read_csv's usecols.
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheet_path, date1904 = _workbook_parts(archive)
+        rows = _iter_rows(archive, sheet_path, _shared_strings(archive))
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = {name: column for column, name in header.items() if isinstance(name, str)}
+        missing = [name for name in columns if name not in positions]
+        if missing:
+            raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+        names = [name for name in header.values() if name in set(columns)]  # file order, like read_csv
+        wanted = [positions[name] for name in names]
+        rows.send(wanted)
+
+        while True:
+            with stage('read_xlsx_chunk') as timed:
+                collected = [[] for _ in wanted]
+                count = 0
+                for row in rows:
+                    for values, column in zip(collected, wanted):
+                        values.append(row.get(column))
+                    count += 1
+                    if count >= chunksize:
+                        break
+                timed.rows = count
+            if not count:
+                return
+            yield _typed_chunk(collected, names, date1904)
+
+
+def load_xlsx_orders(path, columns=ORDER_COLUMNS, chunksize=DEFAULT_CHUNKSIZE):
+    """The whole typed export from an .xlsx file (see iter_xlsx_chunks)"""
+    chunks = list(iter_xlsx_chunks(path, chunksize=chunksize, columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=list(columns))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_xlsx(df, path):
+    """Write a DataFrame as a minimal single-sheet .xlsx, row by row
+
+    Strings are inline, numbers plain and datetimes Excel serials (the
+    way WooCommerce exports Paid Date). Meant for fixtures and benchmarks.
+    """
+    columns = list(df.columns)
+    datetime_columns = {column for column in columns if pd.api.types.is_datetime64_any_dtype(df[column])}
+    letters = []
+    for index in range(len(columns)):
+        name, index = '', index + 1
+        while index:
+            index, remainder = divmod(index - 1, 26)
+            name = chr(65 + remainder) + name
+        letters.append(name)
+
+    def cell(ref, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+            return ''
+        if isinstance(value, pd.Timestamp):
+            return f'<c r="{ref}"><v>{(value - pd.Timestamp(EXCEL_EPOCH)) / pd.Timedelta(days=1)!r}</v></c>'
+        if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+            return f'<c r="{ref}"><v>{value!r}</v></c>'
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+    parts = {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" Type="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships/officeDocument"/></Relationships>'),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{MAIN_NS[1:-1]}" xmlns:r="{REL_NS[1:-1]}">'
+            '<sheets><sheet name="Orders" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{PACKAGE_REL_NS[1:-1]}">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml" Type="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships/worksheet"/></Relationships>'),
+    }
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in parts.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as handle:
+            handle.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         f'<worksheet xmlns="{MAIN_NS[1:-1]}"><sheetData>'.encode())
+            header = ''.join(cell(f'{letter}1', name) for letter, name in zip(letters, columns))
+            handle.write(f'<row r="1">{header}</row>'.encode())
+            values = [df[column].astype(object).where(df[column].notna(), None) if column not in datetime_columns
+                      else df[column] for column in columns]
+            for number, row in enumerate(zip(*values), start=2):
+                cells = ''.join(cell(f'{letter}{number}', None if value is pd.NaT else value)
+                                for letter, value in zip(letters, row))
+                handle.write(f'<row r="{number}">{cells}</row>'.encode())
+            handle.write(b'</sheetData></worksheet>')
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Stream an .xlsx order export through the typed pipeline')
+    parser.add_argument('path', help='WooCommerce order export (.xlsx)')
+    parser.add_argument('--csv', help='the same export as CSV: compare contents, time and memory')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_xlsx_orders(args.path)
+    elapsed = time.perf_counter() - start
+    print(f"=== XLSX EXPORT: {args.path} ===")
+    print(f"Rows: {len(df)} | {elapsed:.2f}s ({len(df) / elapsed:,.0f} rows/s) | "
+          f"{df.memory_usage(deep=True).sum() / 1e6:.2f} MB | peak RSS {peak_rss_mb():.1f} MB")
+    print(df.dtypes.to_string())
+
+    if args.csv:
+        start = time.perf_counter()
+        csv = load_orders(args.csv)
+        csv_elapsed = time.perf_counter() - start
+        print(f"\nCSV: {len(csv)} rows in {csv_elapsed:.2f}s")
+        different = [column for column in csv if not csv[column].equals(df[column])]
+        print(f"Columns that differ from the CSV: {different or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Card brand, wallet and last-4 from the export's Payment column.
+
+Payment strings come in a handful of shapes:
+
+    Visa ending in 3726             card entered on the checkout
+    Visa ********8733               saved card
+    Visa 4702 (Google Pay)          card inside a wallet
+    Apple Pay                       wallet without card details
+
+A store sees the same customers' cards over and over, so the column is
+factorized once (one hash pass) and only its distinct strings are
+parsed, with one regex pass (Arrow's extract_regex when pyarrow is
+installed). The parsed brand, wallet and last-4 are mapped back to the
+rows as categorical codes, so a breakdown costs about one scan of the
+column plus a groupby on small integer codes.
+
+payment_breakdown() then gives the getDashboardSummary() figures per
+location x brand x wallet, exact to the cent (see money.py), with the
+Stripe fees that the card mix should produce.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from location_normalization import canonicalize_locations
+from money import dashboard_summary, format_cents, to_cents
+from order_reader import DEFAULT_EXPORT, load_orders
+from pipeline_profile import enable_from_argv, profiled
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # unique strings are parsed with Series.str.extract
+    pa = pc = None
+
+PAYMENT_PATTERN = (r'^\s*(?P<brand>[A-Za-z][A-Za-z ]*?)\s+(?:ending in\s+|\*+\s*)?(?P<last4>[0-9]{4})'
+                   r'(?:\s*\((?P<wallet>[^)]*)\))?\s*$')
+PAYMENT_FIELDS = ['brand', 'wallet', 'last4']
+BRAND_NAMES = {
+    'visa': 'Visa',
+    'mastercard': 'MasterCard',
+    'master card': 'MasterCard',
+    'amex': 'Amex',
+    'american express': 'Amex',
+    'discover': 'Discover',
+    'diners club': 'Diners Club',
+    'jcb': 'JCB',
+    'unionpay': 'UnionPay',
+}
+UNKNOWN_BRAND = 'Unknown'
+NO_WALLET = 'Card'  # card used directly, not through a wallet
+UNKNOWN_LOCATION = 'Unknown Location'
+
+
+def _extract(uniques):
+    """brand, last4 and wallet columns of unique Payment strings (missing where the pattern fails)"""
+    if pc is not None:
+        fields = pc.extract_regex(pa.array(uniques, type=pa.string(), from_pandas=True), PAYMENT_PATTERN)
+        # struct_field (unlike StructArray.field) keeps unmatched strings null
+        return pd.DataFrame({name: pc.struct_field(fields, name).to_pandas() for name in ('brand', 'last4', 'wallet')})
+    fields = pd.Series(uniques, dtype=object).str.extract(PAYMENT_PATTERN)
+    # str.extract leaves an unmatched optional group as NaN, Arrow as ''
+    fields['wallet'] = fields['wallet'].fillna('').where(fields['brand'].notna())
+    return fields
+
+
+def _rename(values, rename):
+    """Apply `rename` to each distinct value of an object array"""
+    codes, names = pd.factorize(values)
+    return np.asarray([rename(name) for name in names], dtype=object)[codes]
+
+
+def parse_payment_strings(uniques):
+    """brand, wallet and last4 of distinct Payment strings, as object columns
+
+    Strings without card digits are wallets when they end in "Pay"
+    (Apple Pay), else brands; brands are normalized through BRAND_NAMES.
+    """
+    uniques = pd.Series(uniques, dtype=object).reset_index(drop=True)
+    fields = _extract(uniques.to_numpy())
+    unmatched = fields['brand'].isna().to_numpy()
+    text = uniques[unmatched].str.strip()
+    is_wallet = text.str.endswith(' Pay').to_numpy()
+
+    brand = fields['brand'].to_numpy(dtype=object, copy=True)
+    brand[unmatched] = np.where(is_wallet, UNKNOWN_BRAND, text.to_numpy(dtype=object))
+    wallet = fields['wallet'].to_numpy(dtype=object, copy=True)
+    wallet[unmatched] = np.where(is_wallet, text.to_numpy(dtype=object), '')
+    # Few distinct brands and wallets: clean those, not every unique string
+    return pd.DataFrame({
+        'brand': _rename(brand, lambda name: BRAND_NAMES.get(' '.join(name.lower().split()), name.strip())),
+        'wallet': _rename(wallet, lambda name: name.strip() or NO_WALLET),
+        'last4': fields['last4'].to_numpy(dtype=object),
+    })
+
+
+@profiled()
+def parse_payments(values):
+    """brand, wallet and last4 categoricals aligned with a Payment column
+
+    Only the distinct strings are parsed (see the module docstring);
+    rows without a Payment get missing values.
+    """
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        value_codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        value_codes, uniques = pd.factorize(values)
+    fields = parse_payment_strings(pd.Series(uniques, dtype=object))
+    columns = {}
+    for name in PAYMENT_FIELDS:
+        codes, categories = pd.factorize(fields[name], sort=True)
+        row_codes = np.append(codes, -1)[value_codes]  # code -1 (no Payment) stays missing
+        columns[name] = pd.Categorical.from_codes(row_codes, categories=categories)
+    return pd.DataFrame(columns, index=values.index)
+
+
+def _filled(values, label):
+    """Categorical with its missing values replaced by `label`"""
+    values = pd.Series(values).reset_index(drop=True)
+    if label not in values.cat.categories:
+        values = values.cat.add_categories([label])
+    return values.fillna(label)
+
+
+@profiled()
+def payment_breakdown(df, levels=('Location', 'brand', 'wallet')):
+    """getDashboardSummary() figures per combination of `levels`
+
+    `df` needs Status, Location, Payment and Total Amount; negative refund
+    rows duplicate their parent and are skipped. `levels` are any of
+    Location, brand, wallet and last4. Fees are rounded once per group,
+    so a coarser breakdown is not the sum of a finer one's rounded rows.
+    Returns a DataFrame indexed by `levels` with money in cents.
+    """
+    orders = df[df['Total Amount'] >= 0]
+    fields = parse_payments(orders['Payment'])
+    keys = {
+        'Location': lambda: _filled(canonicalize_locations(orders['Location']), UNKNOWN_LOCATION),
+        'brand': lambda: _filled(fields['brand'], UNKNOWN_BRAND),
+        'wallet': lambda: _filled(fields['wallet'], NO_WALLET),
+        'last4': lambda: fields['last4'].reset_index(drop=True),
+    }
+    groups = pd.DataFrame({level: keys[level]() for level in levels})
+    return dashboard_summary(to_cents(orders['Total Amount']), orders['Status'], groups=groups)
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Sales and fees by location, card brand and wallet')
+    parser.add_argument('path', nargs='?', default=DEFAULT_EXPORT, help='WooCommerce order export (CSV or .xlsx)')
+    parser.add_argument('--by', choices=['brand', 'wallet', 'both'], default='both',
+                        help='break totals down by brand, wallet or both')
+    parser.add_argument('--locations', action='store_true', help='one table per location')
+    parser.add_argument('--output', help='write the location x brand x wallet figures to this CSV')
+    args = parser.parse_args()
+
+    df = load_orders(args.path, columns=['Status', 'Location', 'Payment', 'Total Amount'])
+    levels = {'brand': ['brand'], 'wallet': ['wallet'], 'both': ['brand', 'wallet']}[args.by]
+    money = ['totalSales', 'totalRefunds', 'platformFees', 'stripeFees', 'netDeposit']
+
+    def show(figures):
+        table = figures.copy()
+        # Stripe's cut relative to sales (its fees also cover refunded orders)
+        share = table['stripeFees'] / table['totalSales'].where(table['totalSales'] > 0)
+        table['stripe_pct'] = share.map(lambda value: f"{value:.2%}" if pd.notna(value) else '-')
+        table[money] = table[money].map(format_cents)
+        print(table.to_string())
+
+    print(f"=== PAYMENT METHODS: {args.path} ===")
+    print(f"{len(df)} rows | {df['Payment'].nunique()} distinct payment strings\n")
+    show(payment_breakdown(df, levels))
+    if args.locations:
+        by_location = payment_breakdown(df, ['Location'] + levels)
+        for location, figures in by_location.groupby(level='Location', observed=True):
+            print(f"\n📍 {location}")
+            show(figures.droplevel('Location'))
+
+    if args.output:
+        payment_breakdown(df).to_csv(args.output)
+        print(f"\nBreakdown written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
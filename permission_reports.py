@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Permission-scoped dashboard figures for every user from one scan of the orders.
+
+The platform answers /api/dashboard/summary with a full query per user,
+restricted to the user's locations (user_location_access; admins see all
+of them) and statuses (user_status_access, else completed/processing/
+refunded; admins are not filtered by status unless they ask for some).
+Here the order table is indexed once instead:
+
+    OrderBitmaps      one packed bitmap per location and per status over
+                      the order rows; a user's rows are the OR of their
+                      location bitmaps AND the OR of their status
+                      bitmaps, and their figures are masked sums.
+    scoped_reports()  the nightly batch: orders are bucketed once into a
+                      (location, status) cube of cents and counts, and
+                      every user's figures are a product of their
+                      location and status masks with the cube, so
+                      hundreds of users cost one pass over the orders.
+
+Figures follow the summary route: sales, platform fees (7%) and Stripe
+fees (2.9% + $0.30) over non-refunded orders, refunds listed but not
+deducted, and totalOrders counting every order in scope. Users and access
+lists come from the platform mirror (platform_mirror.py build loads them).
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from money import format_cents, summarize_totals
+from pipeline_profile import enable_from_argv, profiled
+from platform_mirror import DEFAULT_MIRROR, connect
+
+DEFAULT_STATUSES = ['completed', 'processing', 'refunded']
+REFUNDED = 'refunded'
+FIGURES = ['totalSales', 'totalOrders', 'totalRefunds', 'platformFees', 'stripeFees', 'netDeposit']
+
+ORDERS_SQL = "SELECT location_id, status, amount_cents FROM woo_orders"
+USERS_SQL = "SELECT id, username, role FROM users WHERE is_active = 1 ORDER BY id"
+
+
+def allowed_statuses(role, statuses, requested=None):
+    """Statuses the summary route filters a user's orders on (None: no status filter)
+
+    Admins get exactly the `requested` statuses, or no filter when none are
+    requested. Other users get the requested statuses they have access to
+    (user_status_access, else the three safe ones), falling back to all of
+    those when none of the requested ones remain.
+    """
+    if role == 'admin':
+        return None if requested is None else list(requested)
+    access = list(statuses) if statuses else list(DEFAULT_STATUSES)
+    if requested is None:
+        return access
+    return [status for status in requested if status in access] or access
+
+
+def load_user_scopes(connection, requested_statuses=None):
+    """Active users with the locations and statuses they may see
+
+    `requested_statuses` is the route's optional statuses parameter.
+    Returns a DataFrame indexed by user id with username, role,
+    location_ids (None for admins: every location) and statuses (None:
+    every status).
+    """
+    try:
+        users = pd.read_sql_query(USERS_SQL, connection, index_col='id')
+    except pd.errors.DatabaseError as error:
+        raise ValueError("This mirror has no users table; rebuild it with the access dumps") from error
+    locations = connection.execute("SELECT user_id, location_id FROM user_location_access").fetchall()
+    statuses = connection.execute("SELECT user_id, status FROM user_status_access").fetchall()
+
+    location_ids = {user_id: [] for user_id in users.index}
+    for user_id, location_id in locations:
+        location_ids.setdefault(user_id, []).append(location_id)
+    user_statuses = {user_id: [] for user_id in users.index}
+    for user_id, status in statuses:
+        user_statuses.setdefault(user_id, []).append(status)
+
+    users['location_ids'] = [None if role == 'admin' else location_ids[user_id]
+                             for user_id, role in users['role'].items()]
+    users['statuses'] = [allowed_statuses(role, user_statuses[user_id], requested_statuses)
+                         for user_id, role in users['role'].items()]
+    return users
+
+
+def load_scoped_orders(connection, start_date=None, end_date=None):
+    """location_id, status and amount_cents of the mirror's orders, optionally for whole days"""
+    query, params = ORDERS_SQL, []
+    if start_date and end_date:
+        query += " WHERE order_date >= ? AND order_date <= ?"
+        params = [f"{start_date} 00:00:00", f"{end_date} 23:59:59"]
+    return pd.read_sql_query(query, connection, params=params)
+
+
+def route_figures(sale_cents, sale_orders, refund_cents, orders):
+    """Summary-route figures from non-refunded sums, refunded cents and the order count (scalars or arrays)"""
+    sale_cents = np.asarray(sale_cents, dtype='int64')
+    sale_orders = np.asarray(sale_orders, dtype='int64')
+    figures = summarize_totals(sale_cents, sale_orders, np.zeros_like(sale_cents), sale_cents, sale_orders)
+    figures['totalRefunds'] = np.asarray(refund_cents, dtype='int64')
+    figures['totalOrders'] = np.asarray(orders, dtype='int64')
+    return figures
+
+
+class OrderBitmaps:
+    """Packed per-location and per-status bitmaps over an order table"""
+
+    def __init__(self, location_ids, statuses, cents):
+        self.cents = np.asarray(cents, dtype='int64')
+        self.size = len(self.cents)
+        location_codes, self.location_ids = pd.factorize(pd.Series(location_ids).to_numpy())
+        status_codes, self.statuses = pd.factorize(pd.Series(statuses).astype(object).to_numpy())
+        self.location_bitmaps = self._bitmaps(location_codes, len(self.location_ids))
+        self.status_bitmaps = self._bitmaps(status_codes, len(self.statuses))
+        self.refunded = self.status_bitmap([REFUNDED])
+
+    @classmethod
+    @profiled('build_bitmaps')
+    def from_orders(cls, orders):
+        """Index a frame with location_id, status and amount_cents columns"""
+        return cls(orders['location_id'], orders['status'], orders['amount_cents'])
+
+    @staticmethod
+    def _bitmaps(codes, count):
+        return np.stack([np.packbits(codes == code) for code in range(count)]) if count else \
+            np.zeros((0, 0), dtype='uint8')
+
+    def _union(self, bitmaps, index, values):
+        positions = index.get_indexer(list(values))
+        positions = positions[positions >= 0]
+        if not len(positions):
+            return np.zeros((self.size + 7) // 8, dtype='uint8')
+        return np.bitwise_or.reduce(bitmaps[positions], axis=0)
+
+    def location_bitmap(self, location_ids=None):
+        """Rows at any of `location_ids` (None: every row)"""
+        if location_ids is None:
+            return np.packbits(np.ones(self.size, dtype=bool))
+        return self._union(self.location_bitmaps, pd.Index(self.location_ids), location_ids)
+
+    def status_bitmap(self, statuses=None):
+        """Rows with any of `statuses` (exact match, as the route's IN list; None: every row)"""
+        if statuses is None:
+            return np.packbits(np.ones(self.size, dtype=bool))
+        return self._union(self.status_bitmaps, pd.Index(self.statuses), statuses)
+
+    def scope(self, location_ids, statuses):
+        """Packed bitmap of a user's rows: their locations AND their statuses (None: all of either)"""
+        return self.location_bitmap(location_ids) & self.status_bitmap(statuses)
+
+    def figures(self, location_ids, statuses):
+        """Summary-route figures (cents) of the rows in a user's scope"""
+        scope = self.scope(location_ids, statuses)
+        rows = np.unpackbits(scope, count=self.size).view(bool)
+        refunded = np.unpackbits(scope & self.refunded, count=self.size).view(bool)
+        sale = rows & ~refunded
+        figures = route_figures(self.cents[sale].sum(), int(sale.sum()), self.cents[refunded].sum(), int(rows.sum()))
+        return {name: int(figures[name]) for name in FIGURES}
+
+
+@profiled()
+def scoped_reports(orders, users):
+    """Summary-route figures for every user from one pass over `orders`
+
+    `orders` has location_id, status and amount_cents; `users` is
+    load_user_scopes() output. Returns (totals, by_location): a DataFrame
+    of FIGURES per user, and the same per (user, location).
+    """
+    location_codes, location_ids = pd.factorize(orders['location_id'].to_numpy(), sort=True)
+    status_codes, statuses = pd.factorize(orders['status'].astype(object).to_numpy())
+    shape = (len(location_ids), len(statuses))
+    flat = np.ravel_multi_index((location_codes, status_codes), shape) if len(orders) else \
+        np.zeros(0, dtype='int64')
+    size = int(np.prod(shape))
+    counts = np.bincount(flat, minlength=size).reshape(shape)
+    # bincount weights are float64: exact for integer sums below 2**53 cents
+    cents = np.rint(np.bincount(flat, weights=orders['amount_cents'].to_numpy(dtype='int64'),
+                                minlength=size)).astype('int64').reshape(shape)
+    is_refunded = np.asarray(statuses == REFUNDED)
+
+    # (users, locations) and (users, statuses) permission masks
+    location_index = pd.Index(location_ids)
+    status_index = pd.Index(statuses)
+    location_masks = np.zeros((len(users), len(location_ids)), dtype='int64')
+    status_masks = np.zeros((len(users), len(statuses)), dtype='int64')
+    for row, (allowed_locations, allowed) in enumerate(zip(users['location_ids'], users['statuses'])):
+        if allowed_locations is None:
+            location_masks[row] = 1
+        else:
+            positions = location_index.get_indexer(allowed_locations)
+            location_masks[row, positions[positions >= 0]] = 1
+        if allowed is None:
+            status_masks[row] = 1
+        else:
+            positions = status_index.get_indexer(allowed)
+            status_masks[row, positions[positions >= 0]] = 1
+
+    def per_location(cube):
+        return np.einsum('ul,ls,us->ul', location_masks, cube, status_masks)
+
+    sums = {
+        'sale_cents': per_location(cents * ~is_refunded),
+        'sale_orders': per_location(counts * ~is_refunded),
+        'refund_cents': per_location(cents * is_refunded),
+        'orders': per_location(counts),
+    }
+    index = pd.MultiIndex.from_product([users.index, location_ids], names=['user_id', 'location_id'])
+    by_location = pd.DataFrame(route_figures(**{name: values.ravel() for name, values in sums.items()}),
+                               index=index)[FIGURES]
+    # Totals come from the summed cents, rounded once, like the route's single query
+    totals = pd.DataFrame(route_figures(**{name: values.sum(axis=1) for name, values in sums.items()}),
+                          index=users.index)[FIGURES]
+    return totals, by_location
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Dashboard summary per user, scoped by their location/status access')
+    parser.add_argument('--mirror', default=DEFAULT_MIRROR, help='platform mirror with the users and access tables')
+    parser.add_argument('--start', help='first day (YYYY-MM-DD)')
+    parser.add_argument('--end', help='last day, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--user', type=int, action='append', help='only these user ids (repeatable)')
+    parser.add_argument('--status', action='append',
+                        help="the route's statuses parameter (repeatable; default: each user's own scope)")
+    parser.add_argument('--output', help='write the per-user, per-location figures to this CSV')
+    args = parser.parse_args()
+
+    with connect(args.mirror) as connection:
+        users = load_user_scopes(connection, args.status)
+        orders = load_scoped_orders(connection, args.start, args.end)
+    if args.user:
+        users = users.loc[users.index.isin(args.user)]
+
+    totals, by_location = scoped_reports(orders, users)
+
+    print(f"=== PERMISSION-SCOPED SUMMARIES | {args.start or 'start'} to {args.end or 'end'} ===")
+    print(f"{len(users)} users | {len(orders)} orders\n")
+    money = ['totalSales', 'totalRefunds', 'platformFees', 'stripeFees', 'netDeposit']
+    report = totals.copy()
+    report[money] = report[money].map(format_cents)
+    report.insert(0, 'username', users['username'])
+    print(report.to_string())
+
+    if args.output:
+        by_location.to_csv(args.output)
+        print(f"\nPer-location figures written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Stage-level profiling for the reconciliation pipeline.
+
+Off by default. Enable it with the ORDER_PROFILE environment variable (a
+trace path, or 1 for the default path) or with --profile[=PATH] on any
+analysis script; ORDER_PROFILE_MEMORY=1 or --profile-memory also turns
+on tracemalloc. Code marks stages with
+
+    with stage('read_csv') as s:
+        df = pd.read_csv(...)
+        s.rows = len(df)
+
+Nested stages form a path (e.g. load/read_csv). At exit the trace is
+written as JSON: per-stage totals (calls, seconds, rows, RSS and
+tracemalloc snapshots) for diffing between runs, folded stacks for flame
+graph tools, and Chrome trace events (chrome://tracing, Perfetto,
+speedscope).
+"""
+
+import atexit
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+PROFILE_ENV = 'ORDER_PROFILE'
+PROFILE_MEMORY_ENV = 'ORDER_PROFILE_MEMORY'
+PROFILE_OWNER_ENV = 'ORDER_PROFILE_OWNER'  # pid of the process that owns the trace path
+DEFAULT_TRACE = 'order_profile.json'
+MAX_EVENTS = 100_000  # chunked runs can produce many short stages
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB
+
+    On Linux this is VmHWM, which starts fresh in a spawned process;
+    ru_maxrss would carry over the parent's peak across fork/exec.
+    """
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+class _NullStage:
+    """Stage used while profiling is off; accepts and ignores row counts"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """One timed occurrence of a named stage"""
+
+    def __init__(self, profiler, name, rows=None):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.profiler.stack.append(self.name)
+        self.path = '/'.join(self.profiler.stack)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.profiler.record(self, seconds)
+        self.profiler.stack.pop()
+        return False
+
+
+class Profiler:
+    """Collects stage timings, row counts and memory snapshots"""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.trace_path = None
+        self.stack = []
+        self.stages = {}
+        self.events = []
+        self.dropped_events = 0
+        self.origin = time.perf_counter()
+
+    def enable(self, trace_path=DEFAULT_TRACE, memory=False):
+        if not self.enabled:
+            atexit.register(self.write)
+        owner = os.environ.setdefault(PROFILE_OWNER_ENV, str(os.getpid()))
+        if owner != str(os.getpid()):
+            # Worker processes inherit the environment: give each its own trace
+            root, ext = os.path.splitext(trace_path)
+            trace_path = f"{root}.{os.getpid()}{ext}"
+        self.enabled = True
+        self.trace_path = trace_path
+        self.origin = time.perf_counter()
+        self.started = datetime.now(timezone.utc).isoformat()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.memory = memory
+
+    def stage(self, name, rows=None):
+        return Stage(self, name, rows) if self.enabled else NULL_STAGE
+
+    def totals(self, path):
+        return self.stages.setdefault(path, {
+            'calls': 0, 'seconds': 0.0, 'child_seconds': 0.0, 'rows': None,
+            'rss_mb': None, 'traced_mb': None, 'traced_peak_mb': None,
+        })
+
+    def record(self, stage, seconds):
+        totals = self.totals(stage.path)
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        if stage.rows is not None:
+            totals['rows'] = (totals['rows'] or 0) + int(stage.rows)
+        rss = rss_mb()
+        if rss is not None:
+            totals['rss_mb'] = max(totals['rss_mb'] or 0.0, rss)
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            totals['traced_mb'] = max(totals['traced_mb'] or 0.0, current / (1024 * 1024))
+            totals['traced_peak_mb'] = max(totals['traced_peak_mb'] or 0.0, peak / (1024 * 1024))
+        if len(self.stack) > 1:
+            self.totals('/'.join(self.stack[:-1]))['child_seconds'] += seconds
+
+        if len(self.events) < MAX_EVENTS:
+            self.events.append({
+                'name': stage.name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                'ts': round((stage.start - self.origin) * 1e6, 1), 'dur': round(seconds * 1e6, 1),
+                'args': {'path': stage.path, 'rows': stage.rows},
+            })
+        else:
+            self.dropped_events += 1
+
+    def trace(self):
+        """The trace as a JSON-serializable dict"""
+        folded = {}
+        for path, totals in self.stages.items():
+            self_seconds = max(totals['seconds'] - totals['child_seconds'], 0.0)
+            folded[path.replace('/', ';')] = round(self_seconds * 1e6)  # microseconds
+        return {
+            'command': sys.argv,
+            'started': getattr(self, 'started', None),
+            'total_seconds': time.perf_counter() - self.origin,
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.stages,
+            'folded': folded,
+            'traceEvents': self.events,
+            'dropped_events': self.dropped_events,
+        }
+
+    def write(self, path=None):
+        """Write the JSON trace (called automatically at exit when enabled)"""
+        path = path or self.trace_path
+        if not self.enabled or not path:
+            return None
+        with open(path, 'w') as handle:
+            json.dump(self.trace(), handle, indent=2)
+        print(f"Profile trace written to {path}", file=sys.stderr)
+        return path
+
+
+PROFILER = Profiler()
+
+
+def stage(name, rows=None):
+    """Context manager timing one stage (a no-op unless profiling is enabled)"""
+    return PROFILER.stage(name, rows)
+
+
+def profiled(name=None):
+    """Decorator timing every call of a function as a stage"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(trace_path=DEFAULT_TRACE, memory=False):
+    PROFILER.enable(trace_path, memory=memory)
+
+
+def enable_from_argv(argv=None):
+    """Turn profiling on from --profile[=PATH] / --profile-memory (removed from argv)
+
+    Call this at the start of a script, before its own argument handling.
+    """
+    argv = sys.argv if argv is None else argv
+    trace_path = None
+    memory = False
+    for arg in list(argv[1:]):
+        if arg == '--profile' or arg.startswith('--profile='):
+            trace_path = arg.partition('=')[2] or DEFAULT_TRACE
+            argv.remove(arg)
+        elif arg == '--profile-memory':
+            memory = True
+            argv.remove(arg)
+    if memory and trace_path is None:
+        trace_path = DEFAULT_TRACE
+    if trace_path:
+        enable(trace_path, memory=memory)
+
+
+def _enable_from_env():
+    value = os.environ.get(PROFILE_ENV, '')
+    if value and value.lower() not in ('0', 'false', 'no'):
+        trace_path = DEFAULT_TRACE if value.lower() in ('1', 'true', 'yes') else value
+        enable(trace_path, memory=os.environ.get(PROFILE_MEMORY_ENV, '') not in ('', '0'))
+
+
+_enable_from_env()
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(f"usage: {sys.argv[0]} TRACE.json  (print a trace's per-stage totals)")
+        sys.exit(1)
+    with open(sys.argv[1]) as handle:
+        trace = json.load(handle)
+
+    print(f"=== PROFILE: {' '.join(trace['command'])} ===")
+    print(f"Total: {trace['total_seconds']:.3f}s | Peak RSS: {trace['peak_rss_mb'] or 0:.1f} MB\n")
+    print(f"{'Stage':50s} {'Calls':>6s} {'Seconds':>9s} {'Self':>9s} {'Rows':>11s} {'RSS MB':>8s}")
+    for path, totals in sorted(trace['stages'].items()):
+        self_seconds = totals['seconds'] - totals['child_seconds']
+        rows = '' if totals['rows'] is None else f"{totals['rows']:,}"
+        rss = '' if totals['rss_mb'] is None else f"{totals['rss_mb']:.1f}"
+        print(f"{path:50s} {totals['calls']:6d} {totals['seconds']:9.3f} {self_seconds:9.3f} {rows:>11s} {rss:>8s}")
+
+
+if __name__ == "__main__":
+    main()
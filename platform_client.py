@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Client for the platform's dashboard API.
+
+Fetches /api/dashboard/summary, /api/dashboard/export and
+/api/dashboard/monthly-breakdown for many locations and months at once.
+Requests share one keep-alive session (pooled connections, automatic
+retries with backoff) and run concurrently on a thread pool; responses
+are cached per (endpoint, parameters) so repeated comparisons do not hit
+the server again.
+
+Authentication uses either a curl/Netscape cookie jar (e.g. cookies.txt)
+or PLATFORM_USERNAME / PLATFORM_PASSWORD for /api/auth/login.
+"""
+
+import argparse
+import calendar
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import MozillaCookieJar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = os.environ.get('PLATFORM_URL', 'http://localhost:5000')
+DEFAULT_WORKERS = 16
+DEFAULT_TIMEOUT = 30
+
+
+class PlatformClient:
+    """Pooled, cached, concurrent access to the dashboard endpoints"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, cookies=None, workers=DEFAULT_WORKERS,
+                 retries=3, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=['GET'])
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if cookies:
+            jar = MozillaCookieJar(cookies)
+            jar.load(ignore_discard=True, ignore_expires=True)
+            self.session.cookies.update(jar)
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def login(self, username, password):
+        """Start an authenticated session via /api/auth/login"""
+        response = self.session.post(f"{self.base_url}/api/auth/login",
+                                     json={'username': username, 'password': password}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, path, **params):
+        """GET a JSON endpoint, served from the response cache when possible"""
+        params = {key: value for key, value in params.items() if value is not None}
+        key = (path, json.dumps(params, sort_keys=True))
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        with self.lock:
+            self.cache[key] = data
+        return data
+
+    def locations(self):
+        return self.get('/api/locations')
+
+    def summary(self, location_id=None, month=None, **params):
+        return self.get('/api/dashboard/summary', locationId=location_id, month=month, **params)
+
+    def export(self, location_id=None, start_date=None, end_date=None, **params):
+        return self.get('/api/dashboard/export', locationId=location_id,
+                        startDate=start_date, endDate=end_date, **params)
+
+    def monthly_breakdown(self, location_id=None, year=None, **params):
+        return self.get('/api/dashboard/monthly-breakdown', locationId=location_id, year=year, **params)
+
+    def fetch_many(self, requests_by_key):
+        """Run {key: (method_name, kwargs)} concurrently and return {key: result}"""
+        def _fetch(item):
+            key, (method, kwargs) = item
+            return key, getattr(self, method)(**kwargs)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(pool.map(_fetch, requests_by_key.items()))
+
+    def fetch_all(self, location_ids, months):
+        """Summary, export and monthly breakdown for every location x month
+
+        Returns {'summary': {(location_id, month): ...},
+                 'export': {month: rows for all locations},
+                 'monthly_breakdown': {(location_id, year): ...}}.
+        """
+        planned = {}
+        for month in months:
+            year, month_num = (int(part) for part in month.split('-'))
+            last_day = calendar.monthrange(year, month_num)[1]
+            planned[('export', month)] = ('export', {
+                'start_date': f"{month}-01", 'end_date': f"{month}-{last_day:02d}",
+            })
+            for location_id in location_ids:
+                planned[('summary', (location_id, month))] = ('summary', {
+                    'location_id': location_id, 'month': month,
+                })
+        for year in sorted({month.split('-')[0] for month in months}):
+            for location_id in location_ids:
+                planned[('monthly_breakdown', (location_id, year))] = ('monthly_breakdown', {
+                    'location_id': location_id, 'year': year,
+                })
+
+        results = {'summary': {}, 'export': {}, 'monthly_breakdown': {}}
+        for (kind, key), data in self.fetch_many(planned).items():
+            results[kind][key] = data
+        return results
+
+
+def client_from_env(base_url=DEFAULT_BASE_URL, cookies=None, workers=DEFAULT_WORKERS):
+    """Client authenticated from a cookie jar or PLATFORM_USERNAME/PLATFORM_PASSWORD"""
+    client = PlatformClient(base_url, cookies=cookies, workers=workers)
+    username = os.environ.get('PLATFORM_USERNAME')
+    password = os.environ.get('PLATFORM_PASSWORD')
+    if not cookies and username and password:
+        client.login(username, password)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch platform dashboard data for many locations and months')
+    parser.add_argument('months', nargs='+', help='months as YYYY-MM')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL)
+    parser.add_argument('--cookies', help='curl/Netscape cookie jar with a logged-in session')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--output', help='write all responses to this JSON file')
+    args = parser.parse_args()
+
+    client = client_from_env(args.base_url, cookies=args.cookies, workers=args.workers)
+    locations = {location['id']: location['name'] for location in client.locations()}
+    results = client.fetch_all(sorted(locations), args.months)
+
+    print("=== PLATFORM SUMMARY BY LOCATION AND MONTH ===")
+    for (location_id, month), summary in sorted(results['summary'].items()):
+        print(f"{month} | {locations[location_id]:50s} | "
+              f"Sales: ${float(summary.get('totalSales', 0)):10.2f} | "
+              f"Orders: {int(summary.get('totalOrders', 0)):5d} | "
+              f"Refunds: ${float(summary.get('totalRefunds', 0)):8.2f} | "
+              f"Net: ${float(summary.get('netDeposit', 0)):10.2f}")
+
+    if args.output:
+        serializable = {kind: {str(key): value for key, value in data.items()} for kind, data in results.items()}
+        with open(args.output, 'w') as handle:
+            json.dump(serializable, handle, indent=2)
+        print(f"\nResponses written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of the platform's woo_orders and locations tables
+(plus users and their location/status access, for permission-scoped
+reports).
+
+A dump of the Postgres tables (pg_dump plain SQL with COPY blocks, or one
+CSV per table from `\\copy ... TO ... CSV HEADER`) is bulk-loaded into
+an embedded database with the columns of shared/schema.ts, indexed on
+(location_id, order_date, status). The aggregate SQL behind
+getDashboardSummary() and /api/dashboard/export then runs locally, so
+platform-vs-CSV comparisons are reproducible offline.
+
+Amounts are also stored as integer cents (amount_cents) and the queries
+sum those; fees are applied to the sums with money.summarize_totals, which
+matches the platform's DECIMAL arithmetic exactly. order_date is stored
+as 'YYYY-MM-DD HH:MM:SS' text, so date filters compare like Postgres
+timestamps against date strings: getDashboardSummary()'s
+`order_date <= 'YYYY-MM-31'` still excludes the last day after midnight.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from money import REFUND_STATUSES, SALE_STATUSES, format_cents, summarize_totals, to_cents
+from pipeline_profile import enable_from_argv, profiled, stage
+
+DEFAULT_MIRROR = os.path.join('.order_cache', 'platform_mirror.db')
+LOAD_CHUNKSIZE = 100_000
+EXPORT_STATUSES = ('completed', 'processing', 'refunded')  # /api/dashboard/export default for admins
+
+LOCATION_COLUMNS = ['id', 'name', 'code', 'is_active', 'created_at']
+WOO_ORDER_COLUMNS = [
+    'id', 'order_id', 'location_id', 'customer_name', 'customer_email', 'amount', 'refund_amount', 'status',
+    'order_date', 'payment_method', 'shipping_total', 'tax_total', 'subtotal', 'discount_total', 'currency',
+    'billing_first_name', 'billing_last_name', 'billing_address_1', 'shipping_first_name',
+    'shipping_last_name', 'shipping_address_1', 'created_at', 'updated_at',
+]
+USER_COLUMNS = ['id', 'username', 'role', 'is_active']  # no password hashes in the mirror
+USER_LOCATION_ACCESS_COLUMNS = ['id', 'user_id', 'location_id']
+USER_STATUS_ACCESS_COLUMNS = ['id', 'user_id', 'status']
+TABLE_COLUMNS = {
+    'locations': LOCATION_COLUMNS,
+    'woo_orders': WOO_ORDER_COLUMNS,
+    'users': USER_COLUMNS,
+    'user_location_access': USER_LOCATION_ACCESS_COLUMNS,
+    'user_status_access': USER_STATUS_ACCESS_COLUMNS,
+}
+ACCESS_TABLES = ('users', 'user_location_access', 'user_status_access')
+INTEGER_COLUMNS = {'id', 'location_id', 'user_id'}
+BOOLEAN_VALUES = {'t': 1, 'true': 1, '1': 1, 'f': 0, 'false': 0, '0': 0}
+
+SCHEMA = """
+CREATE TABLE locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    code TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT
+);
+CREATE TABLE woo_orders (
+    id INTEGER PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    location_id INTEGER NOT NULL,
+    customer_name TEXT, customer_email TEXT,
+    amount TEXT, refund_amount TEXT,
+    status TEXT NOT NULL,
+    order_date TEXT,
+    payment_method TEXT, shipping_total TEXT, tax_total TEXT, subtotal TEXT, discount_total TEXT, currency TEXT,
+    billing_first_name TEXT, billing_last_name TEXT, billing_address_1 TEXT,
+    shipping_first_name TEXT, shipping_last_name TEXT, shipping_address_1 TEXT,
+    created_at TEXT, updated_at TEXT,
+    amount_cents INTEGER NOT NULL DEFAULT 0,
+    refund_amount_cents INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user',
+    is_active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE user_location_access (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, location_id INTEGER NOT NULL);
+CREATE TABLE user_status_access (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, status TEXT NOT NULL);
+"""
+# Built after the bulk load, which is faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX woo_orders_location_date_status ON woo_orders (location_id, order_date, status);
+CREATE INDEX woo_orders_date_status ON woo_orders (order_date, status);
+ANALYZE;
+"""
+
+SALE_IN = ', '.join(f"'{status}'" for status in SALE_STATUSES)
+REFUND_IN = ', '.join(f"'{status}'" for status in REFUND_STATUSES)
+
+# getDashboardSummary(): one row of sums over the filtered orders
+SUMMARY_SQL = f"""
+    SELECT
+        COALESCE(SUM(CASE WHEN status IN ({SALE_IN}) THEN amount_cents ELSE 0 END), 0) AS sale_cents,
+        COUNT(CASE WHEN status IN ({SALE_IN}) THEN 1 END) AS sale_orders,
+        COALESCE(SUM(CASE WHEN status IN ({REFUND_IN}) THEN amount_cents ELSE 0 END), 0) AS refund_cents,
+        COALESCE(SUM(amount_cents), 0) AS all_cents,
+        COUNT(*) AS all_orders
+    FROM woo_orders
+    WHERE {{where}}
+"""
+
+# /api/dashboard/export: every location, with the filters in the join
+EXPORT_SQL = """
+    SELECT
+        l.id AS location_id,
+        l.name AS location,
+        COALESCE(SUM(CASE WHEN wo.status != 'refunded' THEN wo.amount_cents ELSE 0 END), 0) AS sale_cents,
+        COUNT(CASE WHEN wo.status != 'refunded' THEN 1 END) AS orders,
+        COALESCE(SUM(CASE WHEN wo.status = 'refunded' THEN wo.amount_cents ELSE 0 END), 0) AS refund_cents
+    FROM locations l
+    LEFT JOIN woo_orders wo ON l.id = wo.location_id AND ({where})
+    GROUP BY l.id, l.name
+    ORDER BY l.name
+"""
+
+# The per-location figures platform_vs_csv_comparison.py compares against
+COMPARISON_SQL = """
+    SELECT
+        l.name AS location,
+        COUNT(wo.id) AS orders,
+        COUNT(CASE WHEN wo.status = 'processing' THEN 1 END) AS processing,
+        COUNT(CASE WHEN wo.status = 'refunded' THEN 1 END) AS refunded,
+        COALESCE(SUM(CASE WHEN wo.status = 'processing' THEN wo.amount_cents ELSE 0 END), 0) AS processing_cents,
+        COALESCE(SUM(CASE WHEN wo.status = 'refunded' THEN wo.amount_cents ELSE 0 END), 0) AS refund_cents
+    FROM locations l
+    JOIN woo_orders wo ON l.id = wo.location_id AND ({where})
+    GROUP BY l.id, l.name
+    ORDER BY orders DESC, l.name
+"""
+
+
+def _copy_unescape(value):
+    """Field of a COPY text-format row: \\N is NULL, backslash escapes are decoded"""
+    if value == '\\N':
+        return None
+    if '\\' not in value:
+        return value
+    return value.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+
+
+def iter_copy_blocks(path, chunksize=LOAD_CHUNKSIZE):
+    """Yield (table, columns, rows) from the COPY ... FROM stdin blocks of a pg_dump file
+
+    Only the TABLE_COLUMNS tables are read (locations, woo_orders, users,
+    user_location_access and user_status_access); rows come in lists of at
+    most `chunksize`.
+    """
+    with open(path, encoding='utf-8') as handle:
+        table = columns = None
+        rows = []
+        for line in handle:
+            if table is None:
+                if line.startswith('COPY '):
+                    name, _, rest = line[5:].partition(' (')
+                    name = name.split('.')[-1].strip('"')
+                    if name in TABLE_COLUMNS:
+                        table = name
+                        columns = [column.strip().strip('"') for column in rest.split(')')[0].split(',')]
+                continue
+            if line.rstrip('\n') == '\\.':
+                if rows:
+                    yield table, columns, rows
+                table, columns, rows = None, None, []
+                continue
+            rows.append([_copy_unescape(value) for value in line.rstrip('\n').split('\t')])
+            if len(rows) >= chunksize:
+                yield table, columns, rows
+                rows = []
+
+
+def _prepare(table, frame):
+    """Dump rows as INSERT tuples: known columns only, normalized dates, cents for woo_orders"""
+    frame = frame[[column for column in TABLE_COLUMNS[table] if column in frame]].copy()
+    for column in INTEGER_COLUMNS & set(frame):
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('Int64')
+    if 'is_active' in frame:
+        frame['is_active'] = frame['is_active'].astype('string').str.lower().map(BOOLEAN_VALUES).fillna(1)
+    if table == 'woo_orders':
+        if 'order_date' in frame:
+            dates = pd.to_datetime(frame['order_date'], errors='coerce', format='mixed')
+            frame['order_date'] = dates.dt.strftime('%Y-%m-%d %H:%M:%S')
+        missing = pd.Series(None, index=frame.index, dtype=object)
+        frame['amount_cents'] = to_cents(frame.get('amount', missing))
+        frame['refund_amount_cents'] = to_cents(frame.get('refund_amount', missing))
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.columns), frame.itertuples(index=False, name=None)
+
+
+def _insert(connection, table, frame):
+    columns, rows = _prepare(table, frame)
+    placeholders = ', '.join('?' for _ in columns)
+    connection.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return len(frame)
+
+
+@profiled('build_mirror')
+def build_mirror(orders_dump, locations_dump=None, mirror=DEFAULT_MIRROR, access_dumps=None):
+    """Bulk-load a dump into a fresh mirror; returns {table: rows loaded}
+
+    `orders_dump` is a pg_dump .sql file (every table is taken from its
+    COPY blocks) or a woo_orders CSV; `locations_dump` is the locations
+    CSV in the latter case, and `access_dumps` maps ACCESS_TABLES to
+    their CSVs.
+    """
+    os.makedirs(os.path.dirname(mirror) or '.', exist_ok=True)
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        if os.path.exists(mirror + suffix):
+            os.remove(mirror + suffix)
+
+    loaded = dict.fromkeys(TABLE_COLUMNS, 0)
+    connection = sqlite3.connect(mirror)
+    try:
+        # A mirror is rebuilt from the dump, never updated: skip the journal
+        connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+        with connection:
+            if orders_dump.endswith('.sql'):
+                for table, columns, rows in iter_copy_blocks(orders_dump):
+                    with stage(f'load_{table}', rows=len(rows)):
+                        loaded[table] += _insert(connection, table, pd.DataFrame(rows, columns=columns))
+            else:
+                sources = [('locations', locations_dump), ('woo_orders', orders_dump)]
+                sources += sorted((access_dumps or {}).items())
+                for table, path in sources:
+                    if path is None:
+                        continue
+                    for chunk in pd.read_csv(path, dtype=str, chunksize=LOAD_CHUNKSIZE):
+                        with stage(f'load_{table}', rows=len(chunk)):
+                            loaded[table] += _insert(connection, table, chunk)
+        with stage('index'):
+            connection.executescript(INDEXES)
+    finally:
+        connection.close()
+    return loaded
+
+
+def connect(mirror=DEFAULT_MIRROR):
+    """Open an existing mirror read-only"""
+    if not os.path.exists(mirror):
+        raise FileNotFoundError(f"No platform mirror at {mirror}; build one with `platform_mirror.py build`")
+    return sqlite3.connect(f"file:{mirror}?mode=ro", uri=True)
+
+
+def _filters(location_id=None, start=None, end=None, statuses=None, alias=''):
+    """SQL condition and parameters for the platform's location/date/status filters"""
+    conditions, params = ['1=1'], []
+    if location_id is not None:
+        conditions.append(f"{alias}location_id = ?")
+        params.append(int(location_id))
+    if start is not None:
+        conditions.append(f"{alias}order_date >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{alias}order_date <= ?")
+        params.append(end)
+    if statuses:
+        conditions.append(f"{alias}status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    return ' AND '.join(conditions), params
+
+
+def month_bounds(month):
+    """getDashboardSummary()'s bounds for 'YYYY-MM': first and last day as bare dates"""
+    period = pd.Period(month, freq='M')
+    return str(period.start_time.date()), str(period.end_time.date())
+
+
+@profiled('mirror_summary')
+def dashboard_summary(connection, location_id=None, month=None):
+    """getDashboardSummary(locationId, month) from the mirror, as a dict of cents"""
+    start, end = month_bounds(month) if month else (None, None)
+    where, params = _filters(location_id, start, end)
+    row = connection.execute(SUMMARY_SQL.format(where=where), params).fetchone()
+    figures = summarize_totals(*row)
+    return {name: int(value) for name, value in figures.items()}
+
+
+@profiled('mirror_export')
+def dashboard_export(connection, start_date=None, end_date=None, location_id=None, statuses=EXPORT_STATUSES):
+    """/api/dashboard/export rows from the mirror, one per location, money in cents
+
+    As on the platform, dates are whole days (start 00:00:00 to end
+    23:59:59) and fees only cover non-refunded orders.
+    """
+    start = f"{start_date} 00:00:00" if start_date and end_date else None
+    end = f"{end_date} 23:59:59" if start_date and end_date else None
+    where, params = _filters(location_id, start, end, statuses, alias='wo.')
+    rows = pd.read_sql_query(EXPORT_SQL.format(where=where), connection, params=params)
+    sale_cents = rows.pop('sale_cents').to_numpy(dtype='int64')
+    orders = rows['orders'].to_numpy(dtype='int64')
+    # Non-refunded orders only: platform fee on sales, Stripe fee per order
+    figures = summarize_totals(sale_cents, orders, np.zeros_like(sale_cents), sale_cents, orders)
+    rows['sales'] = figures['totalSales']
+    rows['platform_fees'] = figures['platformFees']
+    rows['stripe_fees'] = figures['stripeFees']
+    rows['refunds'] = rows.pop('refund_cents').to_numpy(dtype='int64')
+    rows['net_deposit'] = figures['netDeposit']
+    return rows
+
+
+def location_comparison(connection, start_date, end_date):
+    """Per-location order counts and amounts for platform_vs_csv_comparison.py
+
+    Returns {location: {'orders', 'processing', 'refunded',
+    'processing_sales', 'refund_amount'}} with amounts in dollars.
+    """
+    where, params = _filters(start=f"{start_date} 00:00:00", end=f"{end_date} 23:59:59", alias='wo.')
+    rows = connection.execute(COMPARISON_SQL.format(where=where), params).fetchall()
+    return {
+        location: {
+            'orders': orders, 'processing': processing, 'refunded': refunded,
+            'processing_sales': processing_cents / 100, 'refund_amount': refund_cents / 100,
+        }
+        for location, orders, processing, refunded, processing_cents, refund_cents in rows
+    }
+
+
+def main():
+    enable_from_argv()
+    parser = argparse.ArgumentParser(description='Build and query a local SQLite mirror of woo_orders')
+    parser.add_argument('--mirror', default=DEFAULT_MIRROR, help='mirror database file')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    build = subcommands.add_parser('build', help='bulk-load a pg_dump .sql file or CSV dumps')
+    build.add_argument('orders', help='pg_dump file with COPY blocks, or a woo_orders CSV')
+    build.add_argument('--locations', help='locations CSV (with a woo_orders CSV)')
+    build.add_argument('--users', help='users CSV (with a woo_orders CSV)')
+    build.add_argument('--location-access', help='user_location_access CSV (with a woo_orders CSV)')
+    build.add_argument('--status-access', help='user_status_access CSV (with a woo_orders CSV)')
+    summary = subcommands.add_parser('summary', help='getDashboardSummary() per location')
+    summary.add_argument('--month', help='YYYY-MM')
+    export = subcommands.add_parser('export', help='/api/dashboard/export rows')
+    export.add_argument('--start', help='first day (YYYY-MM-DD)')
+    export.add_argument('--end', help='last day, inclusive (YYYY-MM-DD)')
+    export.add_argument('--status', action='append', help='statuses to include (repeatable)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        access_dumps = {table: path for table, path in [('users', args.users),
+                                                        ('user_location_access', args.location_access),
+                                                        ('user_status_access', args.status_access)] if path}
+        loaded = build_mirror(args.orders, args.locations, args.mirror, access_dumps)
+        print(f"Loaded {loaded['woo_orders']} orders, {loaded['locations']} locations and {loaded['users']} users "
+              f"into {args.mirror} in {time.perf_counter() - start:.2f}s")
+        return
+
+    with connect(args.mirror) as connection:
+        if args.command == 'summary':
+            locations = connection.execute("SELECT id, name FROM locations ORDER BY name").fetchall()
+            print(f"=== DASHBOARD SUMMARY (mirror) | {args.month or 'all months'} ===")
+            for location_id, name in [(None, 'All locations')] + locations:
+                figures = dashboard_summary(connection, location_id, args.month)
+                print(f"{name:50s} | Sales: {format_cents(figures['totalSales']):>12s} | "
+                      f"Orders: {figures['totalOrders']:5d} | Refunds: {format_cents(figures['totalRefunds']):>10s} | "
+                      f"Net: {format_cents(figures['netDeposit']):>12s}")
+        else:
+            rows = dashboard_export(connection, args.start, args.end, statuses=args.status or EXPORT_STATUSES)
+            money_columns = ['sales', 'platform_fees', 'stripe_fees', 'refunds', 'net_deposit']
+            print(f"=== DASHBOARD EXPORT (mirror) | {args.start or 'start'} to {args.end or 'end'} ===")
+            totals = rows[money_columns + ['orders']].sum()
+            rows[money_columns] = rows[money_columns].map(format_cents)
+            print(rows.drop(columns='location_id').to_string(index=False))
+            print(f"\nTOTAL Net Deposit: {format_cents(totals['net_deposit'])} ({totals['orders']} orders)")
+
+
+if __name__ == "__main__":
+    main()
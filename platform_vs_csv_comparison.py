@@ -2,9 +2,17 @@
 """
 Comprehensive comparison between CSV data and Platform database data
 Analyzes discrepancies in May 2025 order data across all locations
+
+With --mirror the platform side is queried from a local woo_orders
+mirror (see platform_mirror.py) instead of the figures copied below.
 """
 
-def main():
+import argparse
+
+from location_normalization import LocationIndex
+
+def compare(mirror=None, start='2025-05-01', end='2025-05-31'):
+    """Print the location-by-location CSV vs platform comparison"""
     print("=== PLATFORM vs CSV COMPARISON ANALYSIS ===")
     print()
     
@@ -37,19 +45,23 @@ def main():
         "3301 Market St, Philadelphia, PA": {"orders": 11, "processing": 11, "refunded": 0, "processing_sales": 164.86, "refund_amount": 0.00},
         "Drexel University 3301 Market St, Philadelphia": {"orders": 5, "processing": 5, "refunded": 0, "processing_sales": 92.92, "refund_amount": 0.00}
     }
+    if mirror:
+        from platform_mirror import connect, location_comparison
+
+        with connect(mirror) as connection:
+            platform_data = location_comparison(connection, start, end)
+        print(f"Platform figures from {mirror} ({start} to {end})")
+        print()
     
-    # Create location mapping for better comparison
-    location_mapping = {
-        "7 Court St, Binghamton, NY": "7 Court St, Binghamton, NY",
-        "7434 Ogontz Ave, Philadelphia, PA": "7434 Ogontz Ave, Philadelphia, PA", 
-        "314 S High St, West Chester, PA": "314 S High St, West Chester, PA",
-        "2210 Cottman Ave, Philadelphia, PA": "2210 Cottman Ave, Philadelphia, PA",
-        "6151 Ridge Ave, Philadelphia, PA": "6151 Ridge Ave, Philadelphia, PA",
-        "1947 Street Rd, Bensalem, PA": "1947 Street Rd, Bensalem, PA",
+    # Explicit overrides; every other CSV location is resolved through the
+    # shared canonicalization rules (normalizeLocationName + fuzzy index)
+    location_overrides = {
         "Unknown Location": "4407 Chestnut St, Philadelphia, PA",  # CSV unknown maps to platform main store
-        "Drexel University 3301 Market St, Philadelphia": "Drexel University 3301 Market St, Philadelphia",
-        "4501 N Broad St, Philadelphia, PA": "4501 N Broad St, Philadelphia, PA",
-        "2100 Mt Ephraim Ave, Oaklyn, NJ": "2100 Mt Ephraim Ave, Oaklyn, NJ"
+    }
+    platform_locations = LocationIndex(platform_data.keys())
+    location_mapping = {
+        csv_location: location_overrides.get(csv_location) or platform_locations.match(csv_location) or csv_location
+        for csv_location in csv_data
     }
     
     print("=== LOCATION BY LOCATION COMPARISON ===")
@@ -152,5 +164,13 @@ def main():
     print("4. Processing sales amounts match perfectly where locations align")
     print("5. Refund amounts differ due to platform having actual refund values vs CSV showing $0")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare CSV export figures with the platform database')
+    parser.add_argument('--mirror', help='query platform figures from this platform_mirror.py database')
+    parser.add_argument('--start', default='2025-05-01', help='first day for --mirror (YYYY-MM-DD)')
+    parser.add_argument('--end', default='2025-05-31', help='last day for --mirror, inclusive (YYYY-MM-DD)')
+    args = parser.parse_args(argv)
+    compare(args.mirror, args.start, args.end)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
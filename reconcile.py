@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+One command for the CSV vs platform reconciliation scripts.
+
+    reconcile.py summary   [EXPORT]            per-location metrics of an export
+                           [--approximate]     ... or a one-pass, fixed-memory quick look
+                                               with error bounds (order_sketches.py)
+    reconcile.py locations [EXPORT]            cleaned export vs platform, per location
+    reconcile.py ids       [PLATFORM] [--export EXPORT]
+                                               order-ID diff against the platform
+    reconcile.py compare   [--mirror DB]       platform vs CSV comparison
+
+Only the standard library is imported up front; pandas, numpy and
+requests are pulled in by the subcommand that needs them, so --help and
+argument errors return immediately. --profile[=PATH] works as on the
+individual scripts.
+"""
+
+import argparse
+import sys
+
+DEFAULT_EXPORT = 'attached_assets/Mayorders-2025-06-03-17-44-11.csv'  # order_reader.DEFAULT_EXPORT
+CLEANED_EXPORT = 'attached_assets/cleaned-Mayorders-2025-06-03-17-44-11.csv'
+
+
+def run_summary(args):
+    if args.approximate:
+        from order_sketches import print_quick_look, quick_look
+        print_quick_look(args.export, quick_look(args.export))
+        return
+    from comprehensive_analysis import analyze_locations
+    analyze_locations(args.export)
+
+
+def run_locations(args):
+    from cleaned_csv_analysis import analyze_cleaned_csv
+    analyze_cleaned_csv(args.export)
+
+
+def run_ids(args):
+    from csv_analysis import analyze_cottman
+    analyze_cottman(args.export, args.platform)
+
+
+def run_compare(args):
+    from platform_vs_csv_comparison import compare
+    compare(args.mirror, args.start, args.end)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='reconcile', description='Reconcile WooCommerce exports with the platform')
+    subcommands = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+
+    summary = subcommands.add_parser('summary', help='per-location orders, sales and refunds of an export')
+    summary.add_argument('export', nargs='?', default=DEFAULT_EXPORT, help='order export (CSV or .xlsx)')
+    summary.add_argument('--approximate', action='store_true',
+                         help='quick look for huge exports: one streaming pass, sketch estimates with error bounds')
+    summary.set_defaults(run=run_summary)
+
+    locations = subcommands.add_parser('locations', help='cleaned export vs platform figures, per location')
+    locations.add_argument('export', nargs='?', default=CLEANED_EXPORT, help='cleaned order export (CSV or .xlsx)')
+    locations.set_defaults(run=run_locations)
+
+    ids = subcommands.add_parser('ids', help='order-ID diff between the export and the platform')
+    ids.add_argument('platform', nargs='?', help='platform woo_orders source (CSV dump or database)')
+    ids.add_argument('--export', default=DEFAULT_EXPORT, help='order export (CSV or .xlsx)')
+    ids.set_defaults(run=run_ids)
+
+    compare = subcommands.add_parser('compare', help='platform vs CSV comparison by location')
+    compare.add_argument('--mirror', help='query platform figures from this platform_mirror.py database')
+    compare.add_argument('--start', default='2025-05-01', help='first day for --mirror (YYYY-MM-DD)')
+    compare.add_argument('--end', default='2025-05-31', help='last day for --mirror, inclusive (YYYY-MM-DD)')
+    compare.set_defaults(run=run_compare)
+    return parser
+
+
+def main(argv=None):
+    from pipeline_profile import enable_from_argv
+
+    argv = sys.argv if argv is None else [sys.argv[0]] + list(argv)
+    enable_from_argv(argv)
+    args = build_parser().parse_args(argv[1:])
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()